@@ -0,0 +1,219 @@
+"""
+Request Accounting
+Per-request LLM token usage, throughput, cost and GitHub API calls, with
+process-wide totals for /stats
+
+A RequestUsage is bound to the handling context with track(); LLM calls
+(including best-of-N candidate threads, which copy the context) and
+GitHub requests made inside it are added to it. GitHub calls are counted
+from the cassette HTTP hook and from git mirror network commands.
+"""
+from config import Config
+from contextlib import contextmanager
+import cassette
+import contextvars
+import threading
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
+
+GITHUB_API_HOST = 'api.github.com'
+
+_current = contextvars.ContextVar('request_usage', default=None)
+
+
+def parse_pricing(spec):
+    """
+    Parse LLM_PRICING: comma-separated `model=input:output[:cached]` USD per million tokens
+
+    Returns:
+        dict of model -> (input, output, cached) prices
+    """
+    pricing = {}
+    for entry in (spec or '').split(','):
+        if not entry.strip():
+            continue
+        try:
+            model, prices = entry.strip().rsplit('=', 1)
+            values = [float(value) for value in prices.split(':')]
+            input_price, output_price = values[0], values[1]
+            cached_price = values[2] if len(values) > 2 else input_price
+        except (ValueError, IndexError):
+            raise ValueError(f"Invalid LLM_PRICING entry: {entry.strip()}")
+        pricing[model.strip()] = (input_price, output_price, cached_price)
+    return pricing
+
+
+def parse_budgets(spec):
+    """
+    Parse STAGE_BUDGETS: comma-separated `stage=seconds`
+
+    Returns:
+        dict of stage -> seconds
+    """
+    budgets = {}
+    for entry in (spec or '').split(','):
+        if not entry.strip():
+            continue
+        try:
+            stage, seconds = entry.strip().split('=', 1)
+            budgets[stage.strip()] = float(seconds)
+        except ValueError:
+            raise ValueError(f"Invalid STAGE_BUDGETS entry: {entry.strip()}")
+    return budgets
+
+
+PRICING = parse_pricing(Config.LLM_PRICING)
+BUDGETS = parse_budgets(Config.STAGE_BUDGETS)
+
+
+def call_cost(model, usage):
+    """USD cost of one call from LLM_PRICING, or None if the model has no price"""
+    prices = PRICING.get(model)
+    if prices is None:
+        return None
+    input_price, output_price, cached_price = prices
+    cached = usage.cached_tokens or 0
+    uncached = max(0, (usage.input_tokens or 0) - cached)
+    return (uncached * input_price + cached * cached_price + (usage.output_tokens or 0) * output_price) / 1_000_000
+
+
+class RequestUsage:
+    """LLM calls and GitHub API calls made while handling one request"""
+
+    def __init__(self):
+        self.llm_calls = []
+        self.github_calls = 0
+        self._lock = threading.Lock()
+
+    def add_llm(self, result):
+        with self._lock:
+            self.llm_calls.append(result)
+
+    def add_github_call(self):
+        with self._lock:
+            self.github_calls += 1
+
+    def summary(self, timings=None):
+        """
+        Totals for the response body
+
+        Args:
+            timings: StageTimer.summary() of the request, checked against STAGE_BUDGETS
+
+        Returns:
+            dict with token counts, output tokens/sec, cost, GitHub calls and
+            any stages over budget
+        """
+        with self._lock:
+            calls = list(self.llm_calls)
+            github_calls = self.github_calls
+
+        input_tokens = sum(call.usage.input_tokens or 0 for call in calls)
+        output_tokens = sum(call.usage.output_tokens or 0 for call in calls)
+        llm_seconds = sum(call.latency for call in calls)
+        costs = [call_cost(call.model, call.usage) for call in calls]
+        priced = [cost for cost in costs if cost is not None]
+
+        return {
+            'llm_calls': len(calls),
+            'models': sorted({f"{call.provider}/{call.model}" for call in calls}),
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'cached_tokens': sum(call.usage.cached_tokens or 0 for call in calls),
+            'llm_seconds': round(llm_seconds, 3),
+            'output_tokens_per_second': round(output_tokens / llm_seconds, 1) if llm_seconds and output_tokens else None,
+            'cost_usd': round(sum(priced), 6) if priced else None,
+            'unpriced_calls': len(costs) - len(priced),
+            'estimated_calls': sum(1 for call in calls if call.usage.estimated),
+            'github_calls': github_calls,
+            'over_budget': over_budget(timings or {})
+        }
+
+
+def over_budget(timings):
+    """Stages (and total) that took longer than their STAGE_BUDGETS entry"""
+    return {
+        stage: {'seconds': timings[stage], 'budget': budget}
+        for stage, budget in BUDGETS.items()
+        if stage in timings and timings[stage] > budget
+    }
+
+
+class UsageTotals:
+    """Process-wide accumulation of request summaries"""
+
+    def __init__(self):
+        self.requests = 0
+        self.totals = {key: 0 for key in ('llm_calls', 'estimated_calls', 'input_tokens', 'output_tokens', 'cached_tokens', 'llm_seconds', 'github_calls')}
+        self.cost_usd = 0.0
+        self.stage_seconds = {}
+        self.over_budget = {}
+        self._lock = threading.Lock()
+
+    def add(self, summary, timings=None):
+        with self._lock:
+            self.requests += 1
+            for key in self.totals:
+                self.totals[key] += summary[key]
+            self.cost_usd += summary['cost_usd'] or 0
+            for stage, seconds in (timings or {}).items():
+                self.stage_seconds[stage] = self.stage_seconds.get(stage, 0) + seconds
+            for stage in summary['over_budget']:
+                self.over_budget[stage] = self.over_budget.get(stage, 0) + 1
+
+    def stats(self):
+        """Totals, per-request averages and over-budget counts for this process"""
+        with self._lock:
+            requests = self.requests
+            llm_seconds = self.totals['llm_seconds']
+            return {
+                'requests': requests,
+                **{key: round(value, 3) for key, value in self.totals.items()},
+                'cost_usd': round(self.cost_usd, 6) if PRICING else None,
+                'output_tokens_per_second': round(self.totals['output_tokens'] / llm_seconds, 1) if llm_seconds else None,
+                'avg_stage_seconds': {
+                    stage: round(seconds / requests, 3) for stage, seconds in self.stage_seconds.items()
+                } if requests else {},
+                'over_budget': dict(self.over_budget),
+                'budgets': BUDGETS
+            }
+
+
+totals = UsageTotals()
+
+
+@contextmanager
+def track():
+    """Account LLM and GitHub calls made inside the block to a new RequestUsage"""
+    usage = RequestUsage()
+    token = _current.set(usage)
+    try:
+        yield usage
+    finally:
+        _current.reset(token)
+
+
+def record_llm(result):
+    """Add an LLMResult to the current request, if one is being tracked"""
+    usage = _current.get()
+    if usage is not None:
+        usage.add_llm(result)
+
+
+def record_github_call():
+    """Count one GitHub API (or git network) call for the current request"""
+    usage = _current.get()
+    if usage is not None:
+        usage.add_github_call()
+
+
+def _observe_http(exchange):
+    if exchange['host'] == GITHUB_API_HOST:
+        record_github_call()
+
+
+def install():
+    """Start counting GitHub requests made through requests sessions (idempotent)"""
+    cassette.remove_observer(_observe_http)
+    cassette.add_observer(_observe_http)
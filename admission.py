@@ -0,0 +1,168 @@
+"""
+Admission Control
+Rejects work early, with a Retry-After, when it could not finish inside
+the evaluation window
+
+Each worker process estimates how long an accepted task would take from
+an EWMA of recent task durations and the number of tasks already in
+flight, and checks GitHub API and LLM provider headroom before accepting
+new work. GitHub quota is read from the rate limit headers of the last
+API response, so a check never makes a request of its own.
+"""
+from config import Config
+from contextlib import contextmanager
+import cassette
+import math
+import threading
+import time
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; carries the HTTP status and Retry-After (None when retrying can't help)"""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = max(1, int(math.ceil(retry_after))) if retry_after is not None else None
+
+
+class AdmissionController:
+    """Tracks in-flight tasks and decides whether to accept more"""
+
+    def __init__(self, llm_retry_after=None, capacity=None, window=None):
+        """
+        Args:
+            llm_retry_after: Callable returning seconds until an LLM backend
+                is out of cooldown, 0 when one is available (optional)
+            capacity: Tasks that run concurrently without queueing
+            window: Seconds a task may take before the evaluator gives up
+        """
+        self.llm_retry_after = llm_retry_after
+        self.capacity = capacity or Config.ADMISSION_MAX_IN_FLIGHT
+        self.window = window or Config.EVALUATION_TIMEOUT
+        self.alpha = Config.ADMISSION_EWMA_ALPHA
+        self.estimate = Config.ADMISSION_INITIAL_ESTIMATE  # Seconds per task (EWMA)
+        self.in_flight = 0
+        self.rejected = 0
+        self.github_remaining = None  # From the last api.github.com response (None until one is seen)
+        self.github_reset = 0
+        self._lock = threading.Lock()
+        cassette.add_observer(self._observe_github)
+
+    def _observe_github(self, exchange):
+        if exchange['host'] != 'api.github.com':
+            return
+        remaining = exchange['headers'].get('X-RateLimit-Remaining')
+        if remaining is not None and remaining.isdigit():
+            self.github_reset = float(exchange['headers'].get('X-RateLimit-Reset') or 0)
+            self.github_remaining = int(remaining)
+
+    def predicted_completion(self, extra=1, in_flight=None):
+        """Seconds until `extra` more tasks would finish, queueing behind the in-flight ones"""
+        in_flight = self.in_flight if in_flight is None else in_flight
+        waves = math.ceil((in_flight + extra) / self.capacity)
+        return waves * self.estimate
+
+    def max_batch(self):
+        """Largest batch that fits inside the window on an idle worker"""
+        return max(1, self.capacity * int(self.window // self.estimate))
+
+    def check_headroom(self, tasks=1):
+        """
+        Check GitHub and LLM headroom for `tasks` more tasks
+
+        Raises:
+            AdmissionRejected: 429 when GitHub quota would run out, 503 when
+                every LLM backend is cooling down after rate limiting
+        """
+        if self.llm_retry_after:
+            wait = self.llm_retry_after()
+            if wait > 0:
+                raise AdmissionRejected(503, 'All LLM providers are rate limited', wait)
+
+        remaining = self.github_remaining
+        needed = (self.in_flight + tasks) * Config.GITHUB_CALLS_PER_TASK
+        # Past the reset time the snapshot is stale: the quota has been refilled
+        if remaining is not None and remaining < needed and time.time() < self.github_reset:
+            reset_in = self.github_reset - time.time()
+            raise AdmissionRejected(429, f'GitHub API quota too low ({remaining} calls left)', reset_in)
+
+    def check(self, tasks=1):
+        """
+        Decide whether `tasks` more tasks can finish inside the evaluation window
+
+        Raises:
+            AdmissionRejected
+        """
+        try:
+            self.check_headroom(tasks)
+            if tasks > 1 and self.predicted_completion(tasks, in_flight=0) > self.window:
+                # Waiting won't help: split the batch instead
+                raise AdmissionRejected(
+                    413, f'Batch of {tasks} tasks cannot finish inside the {self.window}s window '
+                         f'(~{self.estimate:.0f}s per task); send at most {self.max_batch()} tasks per batch'
+                )
+            predicted = self.predicted_completion(tasks)
+            if predicted > self.window:
+                # A slot frees up roughly every estimate / capacity seconds
+                wait = (predicted - self.window) + self.estimate / self.capacity
+                raise AdmissionRejected(
+                    503, f'Server busy: {self.in_flight} tasks in flight, ~{predicted:.0f}s to complete', wait
+                )
+        except AdmissionRejected:
+            self.rejected += 1
+            raise
+
+    @contextmanager
+    def admit(self):
+        """
+        Reserve a slot for one task until the block exits
+
+        Raises:
+            AdmissionRejected: before the block runs, if the task is shed
+        """
+        with self._lock:
+            self.check()
+            self.in_flight += 1
+        with self.track(reserved=True):
+            yield
+
+    def reserve(self, tasks):
+        """
+        Admit a batch, counting all of its tasks as in flight while they wait in the queue
+
+        Each task then runs inside track(reserved=True), which releases its slot.
+
+        Raises:
+            AdmissionRejected
+        """
+        with self._lock:
+            self.check(tasks)
+            self.in_flight += tasks
+
+    @contextmanager
+    def track(self, reserved=False):
+        """Count a task as in flight for the duration of the block"""
+        if not reserved:
+            with self._lock:
+                self.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def observe(self, duration):
+        """Feed the duration of a processed task into the estimate"""
+        with self._lock:
+            self.estimate = self.alpha * duration + (1 - self.alpha) * self.estimate
+
+    def stats(self):
+        """Current load and estimate"""
+        return {
+            'in_flight': self.in_flight,
+            'capacity': self.capacity,
+            'estimated_task_seconds': round(self.estimate, 1),
+            'rejected': self.rejected,
+            'github_remaining': self.github_remaining
+        }
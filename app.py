@@ -2,24 +2,79 @@
 Main Flask Application
 API endpoint that receives requests, generates code, and deploys to GitHub
 """
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from config import Config
 from llm_generator import LLMGenerator
 from github_manager import GitHubManager
+from metrics import StageTimer
+from request_ingest import IngestError, close_attachments, ingest_batch_payload, ingest_task_payload
+from admission import AdmissionController, AdmissionRejected
+from round2_prep import Round2Preparer
+from shared_state import SharedDict
+import shared_state
+import cassette
+import accounting
+import html_postprocess
+import response_parser
+import prompt_cache
+import profiler
+import hmac
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from requests.adapters import HTTPAdapter
 import requests
+import atexit
+import json
 import time
 from datetime import datetime
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
 
 app = Flask(__name__)
+# Backstop for any body read in full; the API routes stream with their own tighter limits
+app.config['MAX_CONTENT_LENGTH'] = max(Config.MAX_REQUEST_BYTES, Config.MAX_BATCH_REQUEST_BYTES)
 CORS(app)  # Enable CORS for all routes
 
+# Record or replay outbound traffic before any client connects
+cassette.start()
+accounting.install()
+
 # Initialize components
 llm_generator = LLMGenerator()
-github_manager = GitHubManager()
+if Config.GITHUB_BACKEND == 'git':
+    from git_mirror import GitMirrorManager
+    github_manager = GitMirrorManager()
+else:
+    github_manager = GitHubManager()
+
+# Load shedding for work that could not finish inside the evaluation window
+admission_controller = AdmissionController(
+    llm_retry_after=llm_generator.llm_retry_after
+) if Config.ADMISSION_ENABLED else None
+
+# Background preparation of round 2 after each deploy
+round2_preparer = Round2Preparer(github_manager, llm_generator) if Config.ROUND2_PREP_ENABLED else None
 
-# Store processed tasks to handle Round 2
-processed_tasks = {}
+# Store processed tasks to handle Round 2 (shared by all worker processes)
+processed_tasks = SharedDict(shared_state.store, 'processed_tasks')
+
+# Evaluation notifications that failed every retry, flushed again on shutdown
+notification_outbox = SharedDict(shared_state.store, 'notification_outbox')
+
+# Bounded worker pool for batch submissions
+batch_executor = ThreadPoolExecutor(
+    max_workers=Config.BATCH_MAX_WORKERS,
+    thread_name_prefix='batch'
+)
+
+# Shared connection pool for evaluation API callbacks
+http_session = requests.Session()
+http_session.mount('https://', HTTPAdapter(pool_maxsize=Config.BATCH_MAX_WORKERS))
+http_session.mount('http://', HTTPAdapter(pool_maxsize=Config.BATCH_MAX_WORKERS))
 
 @app.route('/', methods=['GET'])
 def home():
@@ -30,6 +85,96 @@ def home():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/stats', methods=['GET'])
+def stats():
+    """Runtime statistics: per-tier routing outcomes and latency"""
+    return jsonify({
+        'routing': llm_generator.router.stats() if llm_generator.router else None,
+        'admission': admission_controller.stats() if admission_controller else None,
+        'prompt_cache': prompt_cache.registry.stats(),
+        'round2_prep': round2_preparer.stats() if round2_preparer else None,
+        'usage': accounting.totals.stats(),
+        'timestamp': datetime.now().isoformat()
+    })
+
+def admin_authorized():
+    """Admin endpoints need ADMIN_TOKEN as a bearer token (disabled when unset)"""
+    if not Config.ADMIN_TOKEN:
+        return False
+    provided = request.headers.get('Authorization', '').removeprefix('Bearer ').strip()
+    return hmac.compare_digest(provided.encode(), Config.ADMIN_TOKEN.encode())
+
+def int_arg(name, default, low, high):
+    """Integer query parameter clamped to [low, high], or None if it isn't an integer"""
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        return None
+    return min(max(value, low), high)
+
+@app.route('/admin/profile/start', methods=['POST'])
+def admin_profile_start():
+    """Start the sampling profiler on this worker"""
+    if not admin_authorized():
+        return jsonify({'error': 'Not found'}), 404
+    try:
+        interval = float(request.args.get('interval', Config.PROFILER_INTERVAL))
+        duration = float(request.args.get('duration', Config.PROFILER_MAX_DURATION))
+    except ValueError:
+        return jsonify({'error': 'interval and duration must be numbers of seconds'}), 400
+    if not (math.isfinite(interval) and math.isfinite(duration)) or interval <= 0 or duration <= 0:
+        return jsonify({'error': 'interval and duration must be positive'}), 400
+    interval = max(interval, profiler.MIN_INTERVAL)
+    duration = min(duration, Config.PROFILER_MAX_DURATION)
+    if not profiler.cpu.start(interval=interval, duration=duration):
+        return jsonify({'error': 'Profiler already running', 'pid': os.getpid()}), 409
+    logger.info(f"🔬 Sampling profiler started (every {interval * 1000:.0f}ms, up to {duration:.0f}s)")
+    return jsonify({'status': 'started', 'pid': os.getpid(), 'interval': interval, 'duration': duration})
+
+@app.route('/admin/profile/stop', methods=['POST'])
+def admin_profile_stop():
+    """Stop the profiler and return folded stacks (flamegraph.pl / speedscope input)"""
+    if not admin_authorized():
+        return jsonify({'error': 'Not found'}), 404
+    folded = profiler.cpu.stop()
+    logger.info(f"🔬 Sampling profiler stopped ({profiler.cpu.samples} samples)")
+    return Response(folded, mimetype='text/plain', headers={
+        'X-Profile-Samples': str(profiler.cpu.samples),
+        'X-Worker-Pid': str(os.getpid())
+    })
+
+@app.route('/admin/memory/start', methods=['POST'])
+def admin_memory_start():
+    """Start tracemalloc; pipeline stages then report their memory growth"""
+    if not admin_authorized():
+        return jsonify({'error': 'Not found'}), 404
+    frames = int_arg('frames', 10, 1, profiler.MAX_TRACE_FRAMES)
+    if frames is None:
+        return jsonify({'error': 'frames must be an integer'}), 400
+    profiler.memory.start(frames=frames)
+    return jsonify({'status': 'tracing', 'pid': os.getpid()})
+
+@app.route('/admin/memory/snapshot', methods=['GET'])
+def admin_memory_snapshot():
+    """Heap growth since the previous snapshot, plus recent per-stage diffs"""
+    if not admin_authorized():
+        return jsonify({'error': 'Not found'}), 404
+    limit = int_arg('limit', 25, 1, profiler.MAX_SNAPSHOT_LIMIT)
+    if limit is None:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    snapshot = profiler.memory.snapshot(limit=limit)
+    if snapshot is None:
+        return jsonify({'error': 'Memory tracing is not running', 'pid': os.getpid()}), 409
+    return jsonify({'pid': os.getpid(), **snapshot})
+
+@app.route('/admin/memory/stop', methods=['POST'])
+def admin_memory_stop():
+    """Stop tracemalloc and free its bookkeeping"""
+    if not admin_authorized():
+        return jsonify({'error': 'Not found'}), 404
+    profiler.memory.stop()
+    return jsonify({'status': 'stopped', 'pid': os.getpid()})
+
 @app.route('/api-endpoint', methods=['POST'])
 def api_endpoint():
     """
@@ -48,45 +193,143 @@ def api_endpoint():
         "attachments": [{"name": "file.csv", "url": "data:..."}]
     }
     """
+    data = None
     try:
-        # Get JSON payload
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'No JSON payload provided'}), 400
-        
-        print(f"\n{'='*60}")
-        print(f"📨 Received request at {datetime.now().isoformat()}")
-        print(f"{'='*60}")
-        
-        # Step 1: Verify secret
-        if not verify_secret(data.get('secret')):
-            print("✗ Secret verification failed")
-            return jsonify({'error': 'Invalid secret'}), 403
-        
-        print("✓ Secret verified")
-        
-        # Step 2: Extract request data
-        email = data.get('email')
-        task_id = data.get('task')
-        round_num = data.get('round', 1)
-        nonce = data.get('nonce')
-        brief = data.get('brief')
-        checks = data.get('checks', [])
-        evaluation_url = data.get('evaluation_url')
-        attachments = data.get('attachments', [])
-        
-        # Validate required fields
-        required_fields = ['email', 'task', 'nonce', 'brief', 'evaluation_url']
-        missing = [f for f in required_fields if not data.get(f)]
-        if missing:
-            return jsonify({'error': f'Missing required fields: {", ".join(missing)}'}), 400
-        
-        print(f"📧 Email: {email}")
-        print(f"🎯 Task: {task_id}")
-        print(f"🔄 Round: {round_num}")
-        print(f"🎲 Nonce: {nonce}")
-        
+        # Shed load before reading the body
+        with admitted():
+            # Stream-parse the payload: size limit and secret are enforced
+            # before any attachment is fully read
+            try:
+                data = ingest_task_payload(request.stream, request.content_length, verify_secret)
+            except IngestError as e:
+                logger.warning(f"✗ Rejected request: {e}")
+                return jsonify({'error': str(e)}), e.status
+            
+            body, status = handle_task(data)
+            return jsonify(body), status
+    
+    except AdmissionRejected as e:
+        logger.info(f"⏳ Shedding request ({e.status}): {e}")
+        return shed_response(e)
+            
+    except Exception as e:
+        logger.exception(f"💥 Unexpected error: {str(e)}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Internal error: {str(e)}'
+        }), 500
+    finally:
+        close_attachments(data)
+
+@app.route('/api-endpoint/batch', methods=['POST'])
+def api_endpoint_batch():
+    """
+    Batch endpoint that accepts many task payloads in one request
+    
+    The body is either a JSON array of task payloads or NDJSON (one
+    payload per line, the requests.jsonl format). Tasks are fanned out
+    over a bounded worker pool and results are streamed back as NDJSON,
+    one line per task, in completion order.
+    """
+    try:
+        # Bounded streaming read (chunked bodies included); stops at the first bad secret
+        tasks = ingest_batch_payload(
+            request.stream, request.content_length, verify_secret, Config.BATCH_MAX_TASKS
+        )
+    except IngestError as e:
+        logger.warning(f"✗ Rejected batch: {e}")
+        return jsonify({'error': str(e)}), e.status
+    
+    if not tasks:
+        return jsonify({'error': 'No task payloads provided'}), 400
+    
+    if admission_controller:
+        try:
+            # Queued tasks count as in flight, so concurrent batches can't over-admit
+            admission_controller.reserve(len(tasks))
+        except AdmissionRejected as e:
+            logger.info(f"⏳ Shedding batch of {len(tasks)} ({e.status}): {e}")
+            for data in tasks:
+                close_attachments(data)
+            return shed_response(e)
+    
+    logger.info(f"📦 Received batch of {len(tasks)} tasks")
+    futures = {batch_executor.submit(handle_tracked_task, data): index for index, data in enumerate(tasks)}
+    
+    def stream_results():
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                body, status = future.result()
+            except Exception as e:
+                body, status = {'status': 'error', 'message': f'Internal error: {str(e)}'}, 500
+            task = tasks[index].get('task') if isinstance(tasks[index], dict) else None
+            yield json.dumps({'index': index, 'task': task, 'http_status': status, **body}) + "\n"
+    
+    return Response(stream_results(), mimetype='application/x-ndjson')
+
+def shed_response(rejection):
+    """Error response for a shed request, with Retry-After when retrying can help"""
+    if rejection.retry_after is None:
+        return jsonify({'error': str(rejection)}), rejection.status
+    return (
+        jsonify({'error': str(rejection), 'retry_after': rejection.retry_after}),
+        rejection.status,
+        {'Retry-After': str(rejection.retry_after)}
+    )
+
+def admitted():
+    """Admission slot for one request (no-op when admission control is off)"""
+    return admission_controller.admit() if admission_controller else nullcontext()
+
+def handle_tracked_task(data):
+    """handle_task for a batch task whose in-flight slot was reserved on admission"""
+    try:
+        with admission_controller.track(reserved=True) if admission_controller else nullcontext():
+            return handle_task(data)
+    finally:
+        close_attachments(data)
+
+def handle_task(data):
+    """
+    Verify, validate and process a single task payload
+    
+    Returns:
+        (response body dict, HTTP status code)
+    """
+    if not isinstance(data, dict):
+        return {'error': 'Task payload must be a JSON object'}, 400
+    
+    logger.info(f"📨 Received request at {datetime.now().isoformat()}")
+    
+    # Step 1: Verify secret
+    if not verify_secret(data.get('secret')):
+        logger.error("✗ Secret verification failed")
+        return {'error': 'Invalid secret'}, 403
+    
+    logger.info("✓ Secret verified")
+    
+    # Step 2: Extract request data
+    email = data.get('email')
+    task_id = data.get('task')
+    round_num = data.get('round', 1)
+    nonce = data.get('nonce')
+    brief = data.get('brief')
+    checks = data.get('checks', [])
+    evaluation_url = data.get('evaluation_url')
+    attachments = data.get('attachments', [])
+    
+    # Validate required fields
+    required_fields = ['email', 'task', 'nonce', 'brief', 'evaluation_url']
+    missing = [f for f in required_fields if not data.get(f)]
+    if missing:
+        return {'error': f'Missing required fields: {", ".join(missing)}'}, 400
+    
+    logger.info(f"🎯 Task {task_id}, round {round_num}, nonce {nonce}")
+    logger.debug(f"📧 Email: {email}")
+    
+    # Every record logged while processing is tagged with task/nonce/round
+    with structured_logging.bind(task=task_id, nonce=nonce, round=round_num), accounting.track() as usage:
         # Step 3: Process based on round
         if round_num == 1:
             result = process_round_1(
@@ -98,34 +341,37 @@ def api_endpoint():
                 email, task_id, round_num, nonce, brief,
                 checks, evaluation_url, attachments
             )
+    
+        # Only processed tasks feed the duration estimate; rejections are instant
+        if admission_controller and result.get('timings'):
+            admission_controller.observe(result['timings']['total'])
+        if result.get('memory'):
+            profiler.memory.record_stages(task_id, round_num, result['memory'])
         
+        usage_summary = usage.summary(result.get('timings'))
+        accounting.totals.add(usage_summary, result.get('timings'))
+        if usage_summary['over_budget']:
+            logger.warning(f"⏱ Over latency budget: {', '.join(usage_summary['over_budget'])}")
+    
         if result.get('success'):
-            print(f"\n✅ Request processed successfully!")
-            print(f"{'='*60}\n")
-            return jsonify({
+            logger.info(f"✅ Request processed successfully!")
+            return {
                 'status': 'success',
                 'message': f'Round {round_num} completed',
                 'repo_url': result.get('repo_url'),
                 'pages_url': result.get('pages_url'),
-                'llm_provider': result.get('llm_provider', 'Unknown')  # Show which LLM was used
-            }), 200
+                'llm_provider': result.get('llm_provider', 'Unknown'),  # Show which LLM was used
+                'timings': result.get('timings'),
+                'usage': usage_summary
+            }, 200
         else:
-            print(f"\n❌ Request failed: {result.get('error')}")
-            print(f"{'='*60}\n")
-            return jsonify({
+            logger.error(f"❌ Request failed: {result.get('error')}")
+            return {
                 'status': 'error',
-                'message': result.get('error')
-            }), 500
-            
-    except Exception as e:
-        print(f"\n💥 Unexpected error: {str(e)}")
-        print(f"{'='*60}\n")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            'status': 'error',
-            'message': f'Internal error: {str(e)}'
-        }), 500
+                'message': result.get('error'),
+                'timings': result.get('timings'),
+                'usage': usage_summary
+            }, 500
 
 def verify_secret(provided_secret):
     """Verify the provided secret matches the configured secret"""
@@ -133,153 +379,217 @@ def verify_secret(provided_secret):
 
 def process_round_1(email, task_id, round_num, nonce, brief, checks, evaluation_url, attachments):
     """Process Round 1: Build and deploy new app"""
-    print(f"\n🚀 Starting Round 1 processing...")
+    logger.info(f"🚀 Starting Round 1 processing...")
+    timer = StageTimer()
     
     try:
         # Step 1: Generate code using LLM
-        print(f"\n[1/4] Generating code with Gemini Pro...")
-        generated_files = llm_generator.generate_app(
-            brief=brief,
-            checks=checks,
-            attachments=attachments,
-            task_id=task_id
-        )
+        logger.info(f"[1/4] Generating code with Gemini Pro...")
+        with timer.stage('generate'):
+            generated_files = llm_generator.generate_app(
+                brief=brief,
+                checks=checks,
+                attachments=attachments,
+                task_id=task_id
+            )
         
         # Step 2: Create GitHub repo and deploy
-        print(f"\n[2/4] Creating GitHub repository...")
-        repo_info = github_manager.create_and_deploy_repo(
-            task_id=task_id,
-            files=generated_files
-        )
+        logger.info(f"[2/4] Creating GitHub repository...")
+        with timer.stage('deploy'):
+            repo_info = github_manager.create_and_deploy_repo(
+                task_id=task_id,
+                files=generated_files
+            )
         
         # Step 3: Store for Round 2
+        llm_generator.remember_success(brief, checks, generated_files, task_id)
         repo_name = github_manager._generate_repo_name(task_id)
         processed_tasks[task_id] = {
             'repo_name': repo_name,
             'round_1_completed': True
         }
+        if round2_preparer:
+            round2_preparer.schedule(repo_name, generated_files, repo_info['commit_sha'])
         
         # Step 4: Notify evaluation API
-        print(f"\n[3/4] Notifying evaluation API...")
-        notification_success = notify_evaluation_api(
-            evaluation_url=evaluation_url,
-            email=email,
-            task=task_id,
-            round_num=round_num,
-            nonce=nonce,
-            repo_url=repo_info['repo_url'],
-            commit_sha=repo_info['commit_sha'],
-            pages_url=repo_info['pages_url']
-        )
+        logger.info(f"[3/4] Notifying evaluation API...")
+        with timer.stage('notify'):
+            notification_success = notify_evaluation_api(
+                evaluation_url=evaluation_url,
+                email=email,
+                task=task_id,
+                round_num=round_num,
+                nonce=nonce,
+                repo_url=repo_info['repo_url'],
+                commit_sha=repo_info['commit_sha'],
+                pages_url=repo_info['pages_url']
+            )
         
         if not notification_success:
-            print("⚠ Warning: Evaluation API notification failed (but repo was created)")
+            logger.warning("⚠ Warning: Evaluation API notification failed (but repo was created)")
         
-        print(f"\n[4/4] Round 1 complete! ✓")
+        logger.info(f"[4/4] Round 1 complete! ✓")
         
         # Get which provider was used
         provider_used = llm_generator.last_provider_used or "Unknown"
-        print(f"🔧 Generated using: {provider_used}")
+        logger.info(f"🔧 Generated using: {provider_used}")
         
         return {
             'success': True,
             'repo_url': repo_info['repo_url'],
             'commit_sha': repo_info['commit_sha'],
             'pages_url': repo_info['pages_url'],
-            'llm_provider': provider_used  # Include in response
+            'llm_provider': provider_used,  # Include in response
+            'notified': notification_success,
+            'timings': timer.summary(),
+            'memory': timer.memory
         }
         
     except Exception as e:
         return {
             'success': False,
-            'error': str(e)
+            'error': str(e),
+            'timings': timer.summary(),
+            'memory': timer.memory
         }
 
 def process_round_2(email, task_id, round_num, nonce, brief, checks, evaluation_url, attachments):
     """Process Round 2: Update existing app"""
-    print(f"\n🔄 Starting Round 2 processing...")
+    logger.info(f"🔄 Starting Round 2 processing...")
+    timer = StageTimer()
     
     try:
         # Generate repo name from task_id (same logic as in github_manager)
         repo_name = github_manager._generate_repo_name(task_id)
         
-        # Check if the repo exists on GitHub
-        if not github_manager.repo_exists(repo_name):
-            return {
-                'success': False,
-                'error': f'Repository {repo_name} does not exist. Round 1 must be completed first or task name is incorrect.'
-            }
-        
-        # Step 1: Get existing code
-        print(f"\n[1/4] Retrieving existing code...")
-        existing_code = github_manager.get_repo_file_content(repo_name, 'index.html')
+        # Files saved right after the last deploy skip the lookup and fetch
+        existing_files = round2_preparer.take(repo_name) if round2_preparer else None
+        if existing_files:
+            logger.info(f"[1/4] ⚡ Using files prepared after the last deploy")
+        else:
+            # Check if the repo exists on GitHub
+            with timer.stage('lookup'):
+                repo_found = github_manager.repo_exists(repo_name)
+            if not repo_found:
+                return {
+                    'success': False,
+                    'error': f'Repository {repo_name} does not exist. Round 1 must be completed first or task name is incorrect.',
+                    'timings': timer.summary(),
+                    'memory': timer.memory
+                }
+            
+            # Step 1: Get existing code
+            logger.info(f"[1/4] Retrieving existing code...")
+            with timer.stage('fetch'):
+                existing_files = fetch_site_files(repo_name)
+        existing_code = existing_files.get('index.html')
         
         if not existing_code:
             return {
                 'success': False,
-                'error': 'Could not retrieve existing code'
+                'error': 'Could not retrieve existing code',
+                'timings': timer.summary(),
+                'memory': timer.memory
             }
         
         # Step 2: Update code using LLM
-        print(f"\n[2/4] Updating code with Gemini Pro...")
-        updated_files = llm_generator.update_app(
-            existing_code=existing_code,
-            brief=brief,
-            checks=checks,
-            attachments=attachments
-        )
-        
-        # Also update README
-        updated_files['README.md'] = llm_generator._generate_readme(
-            brief=f"[Updated] {brief}",
-            checks=checks,
-            task_id=task_id,
-            attachment_info=llm_generator._process_attachments(attachments)
-        )
+        logger.info(f"[2/4] Updating code with Gemini Pro...")
+        with timer.stage('generate'):
+            # Decode attachments once; both the prompt and README reuse the result
+            attachment_info = llm_generator._process_attachments(attachments)
+            
+            updated_files = llm_generator.update_app(
+                existing_code=existing_code,
+                brief=brief,
+                checks=checks,
+                attachment_info=attachment_info,
+                existing_files=existing_files
+            )
+            
+            # Also update README
+            updated_files['README.md'] = llm_generator._generate_readme(
+                brief=f"[Updated] {brief}",
+                checks=checks,
+                task_id=task_id,
+                attachment_info=attachment_info
+            )
         
         # Step 3: Update GitHub repo
-        print(f"\n[3/4] Updating GitHub repository...")
-        repo_info = github_manager.update_repo(
-            repo_name=repo_name,
-            files=updated_files
-        )
+        logger.info(f"[3/4] Updating GitHub repository...")
+        with timer.stage('deploy'):
+            repo_info = github_manager.update_repo(
+                repo_name=repo_name,
+                files=updated_files
+            )
+        if round2_preparer:
+            # Unchanged files of a multi-file app aren't in updated_files
+            round2_preparer.schedule(repo_name, {**existing_files, **updated_files}, repo_info['commit_sha'])
         
         # Step 4: Notify evaluation API
-        print(f"\n[4/4] Notifying evaluation API...")
-        notification_success = notify_evaluation_api(
-            evaluation_url=evaluation_url,
-            email=email,
-            task=task_id,
-            round_num=round_num,
-            nonce=nonce,
-            repo_url=repo_info['repo_url'],
-            commit_sha=repo_info['commit_sha'],
-            pages_url=repo_info['pages_url']
-        )
+        logger.info(f"[4/4] Notifying evaluation API...")
+        with timer.stage('notify'):
+            notification_success = notify_evaluation_api(
+                evaluation_url=evaluation_url,
+                email=email,
+                task=task_id,
+                round_num=round_num,
+                nonce=nonce,
+                repo_url=repo_info['repo_url'],
+                commit_sha=repo_info['commit_sha'],
+                pages_url=repo_info['pages_url']
+            )
         
         if not notification_success:
-            print("⚠ Warning: Evaluation API notification failed (but repo was updated)")
+            logger.warning("⚠ Warning: Evaluation API notification failed (but repo was updated)")
         
-        print(f"\n✓ Round 2 complete!")
+        logger.info(f"✓ Round 2 complete!")
         
         # Get which provider was used
         provider_used = llm_generator.last_provider_used or "Unknown"
-        print(f"🔧 Generated using: {provider_used}")
+        logger.info(f"🔧 Generated using: {provider_used}")
         
         return {
             'success': True,
             'repo_url': repo_info['repo_url'],
             'commit_sha': repo_info['commit_sha'],
             'pages_url': repo_info['pages_url'],
-            'llm_provider': provider_used  # Include in response
+            'llm_provider': provider_used,  # Include in response
+            'notified': notification_success,
+            'timings': timer.summary(),
+            'memory': timer.memory
         }
         
     except Exception as e:
         return {
             'success': False,
-            'error': str(e)
+            'error': str(e),
+            'timings': timer.summary(),
+            'memory': timer.memory
         }
 
+def fetch_site_files(repo_name):
+    """
+    Read the deployed site's source files for a round 2 edit
+    
+    Returns:
+        dict of path -> content: index.html (the readable copy when minified)
+        plus any split assets such as app.js or styles.css
+    """
+    paths = github_manager.list_repo_files(repo_name) or ['index.html']
+    files = {}
+    if Config.MINIFY_OUTPUT and html_postprocess.SOURCE_PATH in paths:
+        # Edit the readable source, not the minified page
+        files['index.html'] = github_manager.get_repo_file_content(repo_name, html_postprocess.SOURCE_PATH)
+    if not files.get('index.html'):
+        files['index.html'] = github_manager.get_repo_file_content(repo_name, 'index.html')
+    
+    for path in paths:
+        if path != 'index.html' and response_parser.safe_filename(path) == path:
+            content = github_manager.get_repo_file_content(repo_name, path)
+            if content is not None:
+                files[path] = content
+    return files
+
 def notify_evaluation_api(evaluation_url, email, task, round_num, nonce, repo_url, commit_sha, pages_url):
     """
     Notify the evaluation API with repo details
@@ -295,35 +605,92 @@ def notify_evaluation_api(evaluation_url, email, task, round_num, nonce, repo_ur
         'pages_url': pages_url
     }
     
-    print(f"📤 Posting to: {evaluation_url}")
+    logger.info(f"📤 Posting to: {evaluation_url}")
     
     # Try with exponential backoff
     for attempt, delay in enumerate([0] + Config.RETRY_DELAYS, 1):
         if delay > 0:
-            print(f"⏳ Waiting {delay}s before retry #{attempt}...")
+            logger.info(f"⏳ Waiting {delay}s before retry #{attempt}...")
             time.sleep(delay)
         
-        try:
-            response = requests.post(
-                evaluation_url,
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                print(f"✓ Evaluation API responded: 200 OK")
-                return True
-            else:
-                print(f"⚠ Evaluation API responded: {response.status_code}")
-                print(f"  Response: {response.text[:200]}")
-                
-        except requests.RequestException as e:
-            print(f"⚠ Request failed: {str(e)}")
+        if _post_notification(evaluation_url, payload):
+            return True
     
-    print(f"✗ All {len(Config.RETRY_DELAYS) + 1} attempts failed")
+    logger.error(f"✗ All {len(Config.RETRY_DELAYS) + 1} attempts failed")
+    # Keep it so a later flush (e.g. on shutdown) can try again
+    notification_outbox[f"{task}:{round_num}:{nonce}"] = {
+        'evaluation_url': evaluation_url,
+        'payload': payload
+    }
+    return False
+
+def _post_notification(evaluation_url, payload):
+    """Post a single notification attempt; True on 200 OK"""
+    try:
+        response = http_session.post(
+            evaluation_url,
+            json=payload,
+            headers={'Content-Type': 'application/json'},
+            timeout=30
+        )
+        
+        if response.status_code == 200:
+            logger.info(f"✓ Evaluation API responded: 200 OK")
+            return True
+        else:
+            logger.warning(f"⚠ Evaluation API responded: {response.status_code}")
+            logger.debug(f"Response: {response.text[:200]}")
+            
+    except requests.RequestException as e:
+        logger.warning(f"⚠ Request failed: {str(e)}")
     return False
 
+def flush_notifications():
+    """
+    Retry every queued notification once; delivered ones leave the outbox
+
+    Workers exiting together all flush the same shared outbox, so each
+    entry is claimed (removed) before it is posted and put back only if
+    the post fails; no notification is sent twice.
+    """
+    pending = notification_outbox.items()
+    if not pending:
+        return 0
+    logger.info(f"📤 Flushing {len(pending)} queued notifications...")
+    delivered = attempted = 0
+    for key, _ in pending:
+        entry = notification_outbox.pop(key)
+        if entry is None:
+            continue  # Claimed by another worker
+        attempted += 1
+        if _post_notification(entry['evaluation_url'], entry['payload']):
+            delivered += 1
+        else:
+            notification_outbox[key] = entry
+    logger.info(f"✓ Delivered {delivered}/{attempted} queued notifications")
+    return delivered
+
+def after_fork():
+    """Drop network connections inherited from a preloading master process"""
+    http_session.close()
+    structured_logging.after_fork()
+    cassette.after_fork()
+    github_manager.reconnect()
+    for backend in llm_generator.backends + llm_generator.fast_backends:
+        session = getattr(backend.provider, 'session', None)
+        if session is not None:
+            session.close()
+
+def shutdown():
+    """Graceful shutdown: let in-flight batch work finish, then flush the outbox"""
+    logger.info("🛑 Shutting down: waiting for in-flight tasks...")
+    batch_executor.shutdown(wait=True)
+    if round2_preparer:
+        round2_preparer.shutdown()
+    flush_notifications()
+    cassette.stop()
+    structured_logging.shutdown()
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("🚀 LLM Code Deployment API")
@@ -333,6 +700,8 @@ if __name__ == '__main__':
     print(f"👤 GitHub User: {Config.GITHUB_USERNAME}")
     print("="*60 + "\n")
     
+    # Development server; production uses gunicorn (see gunicorn.conf.py)
+    atexit.register(shutdown)
     app.run(
         host='0.0.0.0',
         port=Config.PORT,
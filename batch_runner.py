@@ -0,0 +1,178 @@
+"""
+Offline Batch Runner
+Replays a JSONL file of task payloads straight through the round 1 /
+round 2 pipelines, without going through the Flask server
+
+Usage:
+    python batch_runner.py requests.jsonl --output results.jsonl --workers 4
+    python batch_runner.py requests.jsonl --mode process --workers 8
+
+Progress is checkpointed after every task, so re-running the same
+command resumes where it left off.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import argparse
+import json
+import os
+import sys
+import time
+
+REQUIRED_FIELDS = ['email', 'task', 'nonce', 'brief', 'evaluation_url']
+
+# Pipeline module, imported lazily so each worker process builds its own clients
+_pipeline = None
+
+
+def _get_pipeline():
+    """Import the app module (and its LLM/GitHub clients) once per process"""
+    global _pipeline
+    if _pipeline is None:
+        import app as pipeline
+        _pipeline = pipeline
+    return _pipeline
+
+
+def task_key(data):
+    """Checkpoint key identifying one payload"""
+    return f"{data.get('task')}:{data.get('round', 1)}:{data.get('nonce')}"
+
+
+def load_payloads(path):
+    """Read task payloads from a JSONL file, skipping blank lines"""
+    payloads = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                payloads.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_num}: invalid JSON: {e}")
+    return payloads
+
+
+def load_checkpoint(path):
+    """Return the set of task keys already completed"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def run_task(data):
+    """
+    Run one payload through the matching pipeline
+
+    Returns:
+        dict result line for the results JSONL
+    """
+    start = time.perf_counter()
+    round_num = data.get('round', 1)
+    result_line = {
+        'key': task_key(data),
+        'task': data.get('task'),
+        'round': round_num,
+        'nonce': data.get('nonce')
+    }
+
+    missing = [f for f in REQUIRED_FIELDS if not data.get(f)]
+    if missing:
+        result_line.update({
+            'success': False,
+            'error': f"Missing required fields: {', '.join(missing)}",
+            'timings': {'total': 0.0}
+        })
+        return result_line
+
+    pipeline = _get_pipeline()
+    process = pipeline.process_round_1 if round_num == 1 else pipeline.process_round_2
+    try:
+        result = process(
+            data['email'], data['task'], round_num, data['nonce'], data['brief'],
+            data.get('checks', []), data['evaluation_url'], data.get('attachments', [])
+        )
+    except Exception as e:
+        result = {'success': False, 'error': str(e)}
+
+    result_line.update(result)
+    result_line.setdefault('timings', {})
+    result_line['timings']['wall'] = round(time.perf_counter() - start, 3)
+    return result_line
+
+
+def run_batch(payloads, output_path, checkpoint_path, workers=4, mode='thread'):
+    """
+    Run all payloads not yet checkpointed, appending results as they finish
+
+    Rounds run in order (every round 1 before any round 2) so updates
+    always find the repo created by their first round.
+
+    Returns:
+        (succeeded, failed, skipped) counts
+    """
+    done = load_checkpoint(checkpoint_path)
+    pending = [data for data in payloads if task_key(data) not in done]
+    skipped = len(payloads) - len(pending)
+    if skipped:
+        print(f"⏭ Resuming: {skipped} tasks already completed")
+
+    executor_class = ProcessPoolExecutor if mode == 'process' else ThreadPoolExecutor
+    succeeded = failed = 0
+
+    with open(output_path, 'a', encoding='utf-8') as results, \
+            open(checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+            executor_class(max_workers=workers, initializer=_get_pipeline) as executor:
+        for round_num in sorted({data.get('round', 1) for data in pending}):
+            batch = [data for data in pending if data.get('round', 1) == round_num]
+            print(f"\n🚀 Round {round_num}: {len(batch)} tasks on {workers} {mode} workers")
+
+            futures = [executor.submit(run_task, data) for data in batch]
+            for future in as_completed(futures):
+                result_line = future.result()
+                results.write(json.dumps(result_line) + "\n")
+                results.flush()
+
+                if result_line.get('success'):
+                    succeeded += 1
+                    checkpoint.write(result_line['key'] + "\n")
+                    checkpoint.flush()
+                    os.fsync(checkpoint.fileno())
+                    print(f"  ✓ {result_line['key']} ({result_line['timings'].get('wall')}s)")
+                else:
+                    failed += 1
+                    print(f"  ✗ {result_line['key']}: {result_line.get('error')}")
+
+    return succeeded, failed, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay task payloads through the deployment pipeline")
+    parser.add_argument('input', help="JSONL file of task payloads (requests.jsonl format)")
+    parser.add_argument('--output', default='results.jsonl', help="Results JSONL (appended to)")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument('--workers', type=int, default=4, help="Parallel workers")
+    parser.add_argument('--mode', choices=['thread', 'process'], default='thread',
+                        help="Run workers as threads or separate processes")
+    args = parser.parse_args(argv)
+
+    try:
+        payloads = load_payloads(args.input)
+    except (OSError, ValueError) as e:
+        print(f"✗ {e}")
+        return 2
+
+    checkpoint_path = args.checkpoint or f"{args.output}.checkpoint"
+    print(f"📄 Loaded {len(payloads)} payloads from {args.input}")
+
+    succeeded, failed, skipped = run_batch(
+        payloads, args.output, checkpoint_path,
+        workers=max(1, args.workers), mode=args.mode
+    )
+
+    print(f"\n✅ {succeeded} succeeded, ❌ {failed} failed, ⏭ {skipped} skipped")
+    print(f"📄 Results: {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Near-Duplicate Brief Cache
+Remembers briefs that were deployed successfully, together with their
+generated index.html, and finds the closest prior brief for a new one
+
+Briefs are compared with a 64-bit SimHash over word shingles of the
+normalised text, so task ids, numbers, titles and URLs don't stop two
+briefs for the same app shape from matching.
+"""
+from config import Config
+import shared_state
+import hashlib
+import re
+import time
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
+
+FINGERPRINT_BITS = 64
+
+_URL_PATTERN = re.compile(r'https?://\S+|data:\S+')
+# Single quotes count only with no letter outside them, so apostrophes
+# (don't, user's) are not taken for quotes
+_QUOTED_PATTERN = re.compile(r"""(["`]).*?\1|“.*?”|(?<!\w)'[^'\n]*?'(?!\w)""")
+_NUMBER_PATTERN = re.compile(r'\d+(?:[.,:/-]\d+)*')
+_WORD_PATTERN = re.compile(r'[a-z][a-z0-9_-]*')
+
+
+def normalise(text):
+    """Lowercase and replace the parts of a brief that vary between instances"""
+    text = _URL_PATTERN.sub(' url ', text.lower())
+    text = _QUOTED_PATTERN.sub(' str ', text)
+    text = _NUMBER_PATTERN.sub(' num ', text)
+    return _WORD_PATTERN.findall(text)
+
+
+def simhash(text, shingle=3):
+    """64-bit SimHash over word shingles of the normalised text"""
+    words = normalise(text)
+    if len(words) < shingle:
+        features = [' '.join(words)] if words else []
+    else:
+        features = [' '.join(words[i:i + shingle]) for i in range(len(words) - shingle + 1)]
+
+    weights = [0] * FINGERPRINT_BITS
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+
+    return sum(1 << bit for bit in range(FINGERPRINT_BITS) if weights[bit] > 0)
+
+
+def similarity(a, b):
+    """Fraction of matching fingerprint bits (1.0 = identical)"""
+    return 1 - bin(a ^ b).count('1') / FINGERPRINT_BITS
+
+
+class BriefCache:
+    """
+    Index of prior successful briefs and their generated index.html
+
+    Entries live in the shared state store, so every worker process sees
+    successes recorded by the others. Fingerprints and the generated HTML
+    are kept in separate namespaces so lookups only read the small index.
+    """
+
+    INDEX_NAMESPACE = 'brief_index'
+    HTML_NAMESPACE = 'brief_html'
+
+    def __init__(self, store=None, max_entries=None, threshold=None):
+        self.store = store or shared_state.store
+        self.max_entries = max_entries or Config.BRIEF_CACHE_MAX_ENTRIES
+        self.threshold = threshold if threshold is not None else Config.BRIEF_CACHE_THRESHOLD
+
+    @staticmethod
+    def _brief_text(brief, checks):
+        return brief + '\n' + '\n'.join(checks or [])
+
+    def add(self, brief, checks, html, task_id=None):
+        """Record a brief whose generated app was deployed successfully"""
+        # One entry per task: a later success for the same task replaces it
+        key = task_id or hashlib.sha1(brief.encode('utf-8')).hexdigest()
+        try:
+            self.store.set(self.HTML_NAMESPACE, key, html)
+            self.store.set(self.INDEX_NAMESPACE, key, {
+                'fingerprint': simhash(self._brief_text(brief, checks)),
+                'task_id': task_id,
+                'created': time.time()
+            })
+            self.store.trim(self.INDEX_NAMESPACE, self.max_entries)
+            self.store.trim(self.HTML_NAMESPACE, self.max_entries)
+        except Exception as e:
+            logger.warning(f"⚠ Warning: Could not save brief cache entry: {e}")
+
+    def find_similar(self, brief, checks):
+        """
+        Find the closest prior brief above the similarity threshold
+
+        Returns:
+            (entry dict with 'html', similarity) or (None, best similarity)
+        """
+        fingerprint = simhash(self._brief_text(brief, checks))
+        try:
+            entries = self.store.items(self.INDEX_NAMESPACE)
+        except Exception as e:
+            logger.warning(f"⚠ Warning: Could not read brief cache: {e}")
+            return None, 0.0
+
+        best_key, best, best_score = None, None, 0.0
+        # Entries come oldest first, so ties go to the most recent success
+        for key, entry in entries:
+            score = similarity(fingerprint, entry['fingerprint'])
+            if score >= best_score:
+                best_key, best, best_score = key, entry, score
+
+        if best is None or best_score < self.threshold:
+            return None, best_score
+        html = self.store.get(self.HTML_NAMESPACE, best_key)
+        if not html:
+            return None, best_score
+        return {**best, 'html': html}, best_score
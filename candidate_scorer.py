@@ -0,0 +1,167 @@
+"""
+Candidate Scorer
+Scores generated HTML locally against the evaluation checks so the best
+of several LLM candidates can be picked without deploying any of them
+"""
+from html.parser import HTMLParser
+import re
+
+# Elements that never have a closing tag
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr'
+}
+
+ID_PATTERN = re.compile(r"""id\s*=\s*["'`]?([A-Za-z][\w\-:.]*)""", re.IGNORECASE)
+HASH_ID_PATTERN = re.compile(r"#([A-Za-z][\w\-]*)")
+TITLE_PATTERN = re.compile(r"""title\b[^'"`]*["'`]([^"'`]+)["'`]""", re.IGNORECASE)
+QUOTED_PATTERN = re.compile(r"""["'`]([^"'`]{2,})["'`]""")
+
+
+class _StructureParser(HTMLParser):
+    """Collects ids, title and tag balance from an HTML document"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.ids = set()
+        self.tags = set()
+        self.title = ''
+        self.script_srcs = []
+        self.link_hrefs = []
+        self.unbalanced = 0
+        self._stack = []
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        self.tags.add(tag)
+        if attrs.get('id'):
+            self.ids.add(attrs['id'])
+        if tag == 'script' and attrs.get('src'):
+            self.script_srcs.append(attrs['src'])
+        if tag == 'link' and attrs.get('href'):
+            self.link_hrefs.append(attrs['href'])
+        if tag == 'title':
+            self._in_title = True
+        if tag not in VOID_ELEMENTS:
+            self._stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing form, e.g. <input ... />: record it but don't push
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_ELEMENTS and self._stack and self._stack[-1] == tag:
+            self._stack.pop()
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self._in_title = False
+        if tag in VOID_ELEMENTS:
+            return
+        if tag in self._stack:
+            # Pop up to the matching tag; anything skipped was left open
+            while self._stack:
+                top = self._stack.pop()
+                if top == tag:
+                    break
+                self.unbalanced += 1
+        else:
+            self.unbalanced += 1
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+
+    def close(self):
+        super().close()
+        self.unbalanced += len(self._stack)
+        self._stack = []
+
+
+def _check_passes(check, html, parser):
+    """
+    Heuristically decide whether a single check is satisfied
+
+    Returns True/False, or None if the check can't be verified statically
+    """
+    lowered = check.lower()
+    html_lower = html.lower()
+
+    if 'bootstrap' in lowered:
+        sources = ' '.join(parser.script_srcs + parser.link_hrefs).lower()
+        if 'bootstrap' not in sources:
+            return False
+        if '5' in lowered and 'bootstrap@4' in sources:
+            return False
+        return True
+
+    if 'page title' in lowered or lowered.startswith('title'):
+        match = TITLE_PATTERN.search(check)
+        if match:
+            return parser.title.strip() == match.group(1).strip()
+        return bool(parser.title.strip())
+
+    ids = ID_PATTERN.findall(check) or HASH_ID_PATTERN.findall(check)
+    if ids:
+        return all(element_id in parser.ids for element_id in ids)
+
+    if 'chart.js' in lowered or 'chartjs' in lowered:
+        return 'chart' in ' '.join(parser.script_srcs).lower()
+
+    quoted = QUOTED_PATTERN.findall(check)
+    if quoted:
+        return all(text.lower() in html_lower for text in quoted)
+
+    # Behavioural checks ("can add tasks", ...) can't be verified statically
+    return None
+
+
+def score_candidate(html, checks):
+    """
+    Score a generated index.html against the evaluation checks
+
+    Args:
+        html: The generated HTML document
+        checks: List of evaluation criteria
+
+    Returns:
+        dict with score (0-1), parse_ok, passed, failed, unknown, failed_checks
+    """
+    parser = _StructureParser()
+    try:
+        parser.feed(html or '')
+        parser.close()
+        parse_ok = (
+            bool(html and html.strip())
+            and 'html' in parser.tags
+            and 'body' in parser.tags
+            and parser.unbalanced <= 2
+        )
+    except Exception:
+        parse_ok = False
+
+    passed = 0
+    failed_checks = []
+    unknown = 0
+    for check in checks or []:
+        result = _check_passes(check, html or '', parser) if parse_ok else False
+        if result is True:
+            passed += 1
+        elif result is False:
+            failed_checks.append(check)
+        else:
+            unknown += 1
+
+    # Checks we can't verify count as half a pass so they never dominate
+    total = len(checks or [])
+    check_score = (passed + 0.5 * unknown) / total if total else 1.0
+    score = (0.7 * check_score + 0.3) if parse_ok else 0.0
+
+    return {
+        'score': round(score, 4),
+        'parse_ok': parse_ok,
+        'passed': passed,
+        'failed': len(failed_checks),
+        'unknown': unknown,
+        'failed_checks': failed_checks,
+        'all_passed': parse_ok and not failed_checks
+    }
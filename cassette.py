@@ -0,0 +1,338 @@
+"""
+HTTP Cassettes
+Records outbound exchanges (LLM calls, GitHub API, evaluation callbacks)
+with their timings, and replays them locally at real or scaled speed
+
+Every requests.Session in the process goes through one hooked send(), so
+AIpipe, local OpenAI-compatible servers, PyGithub, the GitHub cache and
+notify_evaluation_api are all covered. LLM providers are additionally
+recorded at the provider level (prompt in, text and usage out), which
+also covers the Gemini SDK on its gRPC transport.
+
+Cassettes are gzip-compressed JSON lines, one exchange per line.
+Observers registered with add_observer() see every exchange, live or
+replayed, even when no cassette is active.
+"""
+from config import Config
+from collections import defaultdict, deque
+from datetime import timedelta
+from requests.structures import CaseInsensitiveDict
+import base64
+import glob
+import gzip
+import hashlib
+import json
+import os
+import requests
+import threading
+import time
+from urllib.parse import urlparse
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
+
+MODES = ('off', 'record', 'replay')
+
+# Request headers never written to a cassette
+_SECRET_HEADERS = {'authorization', 'x-goog-api-key', 'cookie'}
+
+_observers = []
+_original_send = None
+_local = threading.local()
+active = None
+# Path given to start(), before '{pid}' is filled in, for after_fork()
+_path_template = None
+
+
+class CassetteMiss(requests.ConnectionError):
+    """A replayed request has no recorded exchange"""
+
+
+def add_observer(callback):
+    """
+    Call `callback(exchange)` after every outbound HTTP exchange
+
+    The exchange dict has method, url, host, status, elapsed (seconds) and
+    the response headers.
+    """
+    install()
+    _observers.append(callback)
+
+
+def remove_observer(callback):
+    if callback in _observers:
+        _observers.remove(callback)
+
+
+def _notify(exchange):
+    for callback in list(_observers):
+        try:
+            callback(exchange)
+        except Exception as e:
+            logger.warning(f"⚠ Warning: HTTP observer failed: {e}")
+
+
+def _body_hash(body):
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if not isinstance(body, bytes):
+        # Streaming bodies can't be hashed without consuming them
+        return None
+    return hashlib.sha1(body).hexdigest()
+
+
+def _encode(data):
+    try:
+        return {'text': data.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'b64': base64.b64encode(data).decode('ascii')}
+
+
+def _decode(entry):
+    if 'b64' in entry:
+        return base64.b64decode(entry['b64'])
+    return entry.get('text', '').encode('utf-8')
+
+
+def _hooked_send(session, prepared, **kwargs):
+    cassette = active
+    replaying = cassette is not None and cassette.mode == 'replay'
+    if replaying:
+        response = cassette.replay_http(prepared)
+        elapsed = response.elapsed.total_seconds()
+    else:
+        start = time.perf_counter()
+        response = _original_send(session, prepared, **kwargs)
+        elapsed = time.perf_counter() - start
+
+    exchange = {
+        'method': prepared.method,
+        'url': prepared.url,
+        'host': urlparse(prepared.url).hostname,
+        'status': response.status_code,
+        'elapsed': round(elapsed, 4),
+        'headers': response.headers
+    }
+    # Observers (request accounting, GitHub quota) see replayed exchanges too
+    _notify(exchange)
+    if not replaying and cassette and cassette.mode == 'record' and not getattr(_local, 'suppress', False):
+        cassette.record_http(prepared, response, elapsed)
+    return response
+
+
+def install():
+    """Hook requests.Session.send once per process (idempotent)"""
+    global _original_send
+    if _original_send is None:
+        _original_send = requests.Session.send
+        requests.Session.send = _hooked_send
+
+
+class Cassette:
+    """A recording or replay session backed by one gzip JSONL file"""
+
+    def __init__(self, path, mode='record', speed=1.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode '{mode}' (expected record or replay)")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self._lock = threading.Lock()
+        self._file = None
+        # (kind, key) -> recorded entries in order; a fallback index ignores bodies
+        self._exact = defaultdict(deque)
+        self._loose = defaultdict(deque)
+        if mode == 'record':
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = gzip.open(path, 'at', encoding='utf-8')
+        else:
+            self._load()
+
+    def _load(self):
+        # A '{pid}' path recorded by several workers replays all of their files
+        paths = sorted(glob.glob(self.path.replace('{pid}', '*'))) if '{pid}' in self.path else [self.path]
+        count = 0
+        for path in paths:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    self._exact[(entry['kind'], entry['key'], entry.get('body_hash'))].append(entry)
+                    self._loose[(entry['kind'], entry['key'])].append(entry)
+                    count += 1
+        logger.info(f"📼 Loaded {count} recorded exchanges from {len(paths)} cassette(s)")
+
+    def _write(self, entry):
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self._file.flush()
+
+    def _take(self, kind, key, body_hash):
+        with self._lock:
+            queue = self._exact.get((kind, key, body_hash))
+            if not queue:
+                queue = self._loose.get((kind, key))
+            if not queue:
+                return None
+            entry = queue.popleft()
+            # Keep both indexes in step
+            for other in (self._exact[(kind, key, entry.get('body_hash'))], self._loose[(kind, key)]):
+                if entry in other:
+                    other.remove(entry)
+            return entry
+
+    def _wait(self, elapsed):
+        if self.speed > 0 and elapsed:
+            time.sleep(elapsed / self.speed)
+
+    def record_http(self, prepared, response, elapsed):
+        """Append one live HTTP exchange to the cassette"""
+        self._write({
+            'kind': 'http',
+            'key': f"{prepared.method} {prepared.url}",
+            'body_hash': _body_hash(prepared.body),
+            'request_headers': {
+                k: v for k, v in prepared.headers.items() if k.lower() not in _SECRET_HEADERS
+            },
+            'status': response.status_code,
+            'headers': dict(response.headers),
+            'body': _encode(response.content),
+            'elapsed': round(elapsed, 4),
+            'recorded': time.time()
+        })
+
+    def replay_http(self, prepared):
+        """
+        Serve a recorded response for the request
+
+        Raises:
+            CassetteMiss: if nothing was recorded for it
+        """
+        entry = self._take('http', f"{prepared.method} {prepared.url}", _body_hash(prepared.body))
+        if entry is None:
+            raise CassetteMiss(f"No recorded exchange for {prepared.method} {prepared.url}", request=prepared)
+        self._wait(entry['elapsed'])
+
+        response = requests.Response()
+        response.status_code = entry['status']
+        # Recorded bodies are already decoded, so drop transfer encodings
+        response.headers = CaseInsensitiveDict({
+            k: v for k, v in entry['headers'].items()
+            if k.lower() not in ('content-encoding', 'transfer-encoding', 'content-length')
+        })
+        response._content = _decode(entry['body'])
+        response.url = prepared.url
+        response.request = prepared
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.elapsed = timedelta(seconds=entry['elapsed'])
+        response.reason = 'Replayed'
+        return response
+
+    @staticmethod
+    def _llm_key(provider, prompt, generation_config):
+        config = json.dumps(generation_config or {}, sort_keys=True, default=str)
+        return f"{provider.name} {provider.model}", _body_hash(prompt + '\n' + config)
+
+    def call_llm(self, provider, prompt, generation_config, call):
+        """
+        Record or replay one provider-level generation
+
+        Args:
+            provider: The LLMProvider being called
+            call: Zero-argument function doing the live call, returning (text, TokenUsage)
+
+        Returns:
+            (text, TokenUsage)
+        """
+        from llm_providers import TokenUsage
+        key, body_hash = self._llm_key(provider, prompt, generation_config)
+
+        if self.mode == 'replay':
+            entry = self._take('llm', key, body_hash)
+            if entry is None:
+                raise CassetteMiss(f"No recorded generation for {key}")
+            self._wait(entry['elapsed'])
+            if entry.get('error'):
+                raise RuntimeError(entry['error'])
+            return entry['text'], TokenUsage(**entry['usage'])
+
+        # The provider's own HTTP traffic is covered by this entry
+        _local.suppress = True
+        start = time.perf_counter()
+        try:
+            text, usage = call()
+        except Exception as e:
+            self._write({
+                'kind': 'llm', 'key': key, 'body_hash': body_hash,
+                'error': str(e), 'elapsed': round(time.perf_counter() - start, 4)
+            })
+            raise
+        finally:
+            _local.suppress = False
+        self._write({
+            'kind': 'llm', 'key': key, 'body_hash': body_hash,
+            'text': text,
+            'usage': {
+                'input_tokens': usage.input_tokens,
+                'output_tokens': usage.output_tokens,
+                'cached_tokens': usage.cached_tokens
+            },
+            'elapsed': round(time.perf_counter() - start, 4),
+            'recorded': time.time()
+        })
+        return text, usage
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def start(mode=None, path=None, speed=None):
+    """
+    Activate a cassette (defaults from CASSETTE_MODE / CASSETTE_PATH / CASSETTE_SPEED)
+
+    Returns:
+        The active Cassette, or None when mode is 'off'
+    """
+    global active, _path_template
+    mode = (mode or Config.CASSETTE_MODE).lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown CASSETTE_MODE '{mode}' (expected one of {', '.join(MODES)})")
+    stop()
+    if mode == 'off':
+        return None
+
+    install()
+    path = _path_template = path or Config.CASSETTE_PATH
+    if mode == 'record':
+        # One file per process, so pre-forked workers never share a gzip stream
+        path = path.replace('{pid}', str(os.getpid()))
+    active = Cassette(path, mode, Config.CASSETTE_SPEED if speed is None else speed)
+    logger.info(f"📼 Cassette {mode}: {path}" + (f" at {active.speed}x speed" if mode == 'replay' else ''))
+    return active
+
+
+def after_fork():
+    """Give a forked worker its own recording file"""
+    global active
+    if active is not None and active.mode == 'record':
+        # The parent still owns the inherited gzip stream; don't close it here
+        active._file = None
+        speed = active.speed
+        active = None
+        start('record', path=_path_template, speed=speed)
+
+
+def stop():
+    """Close and deactivate the current cassette"""
+    global active
+    if active is not None:
+        active.close()
+        active = None
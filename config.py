@@ -21,14 +21,123 @@ class Config:
     # Gemini API
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
     
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-pro')
+    
     # AIpipe API (alternative to Gemini)
     AIPIPE_TOKEN = os.getenv('AIPIPE_TOKEN')
     USE_AIPIPE = os.getenv('USE_AIPIPE', 'False').lower() == 'true'
+    AIPIPE_MODEL = os.getenv('AIPIPE_MODEL', 'google/gemini-2.0-flash-lite-001')
+    
+    # Local / generic OpenAI-compatible server (llama.cpp, vLLM, Ollama, ...)
+    LOCAL_LLM_BASE_URL = os.getenv('LOCAL_LLM_BASE_URL')  # e.g. http://localhost:8080/v1
+    LOCAL_LLM_MODEL = os.getenv('LOCAL_LLM_MODEL', 'local-model')
+    LOCAL_LLM_API_KEY = os.getenv('LOCAL_LLM_API_KEY')
+    LOCAL_LLM_TIMEOUT = int(os.getenv('LOCAL_LLM_TIMEOUT', 300))
+    
+    # Ordered LLM backends with weights, e.g. "local@3,gemini:gemini-2.5-pro@1,aipipe@0"
+    # Empty = Gemini primary with AIpipe fallback (or AIpipe primary if USE_AIPIPE)
+    LLM_BACKENDS = os.getenv('LLM_BACKENDS', '')
+
+    # Adaptive routing: simple briefs go to a fast tier, hard ones to LLM_BACKENDS
+    # (opt-in, since the fast tier is a different model from the configured primary)
+    ROUTING_ENABLED = os.getenv('ROUTING_ENABLED', 'False').lower() == 'true'
+    FAST_LLM_BACKENDS = os.getenv(
+        'FAST_LLM_BACKENDS',
+        'gemini:gemini-2.5-flash' if GEMINI_API_KEY else ''
+    )
+    ROUTING_COMPLEXITY_THRESHOLD = float(os.getenv('ROUTING_COMPLEXITY_THRESHOLD', 3.0))
+    
+    # Best-of-N generation: number of concurrent candidates (1 = disabled)
+    BEST_OF_N = max(1, int(os.getenv('BEST_OF_N', 1)))
+    # Stop waiting as soon as one candidate passes every check
+    BEST_OF_N_EARLY_EXIT = os.getenv('BEST_OF_N_EARLY_EXIT', 'True').lower() == 'true'
+    # Spread candidates across all configured providers instead of primary only
+    BEST_OF_N_MIXED_PROVIDERS = os.getenv('BEST_OF_N_MIXED_PROVIDERS', 'True').lower() == 'true'
+
+    # Near-duplicate brief cache: reuse prior apps for near-identical briefs
+    BRIEF_CACHE_ENABLED = os.getenv('BRIEF_CACHE_ENABLED', 'True').lower() == 'true'
+    BRIEF_CACHE_MAX_ENTRIES = int(os.getenv('BRIEF_CACHE_MAX_ENTRIES', 200))
+    BRIEF_CACHE_THRESHOLD = float(os.getenv('BRIEF_CACHE_THRESHOLD', 0.9))  # SimHash similarity 0-1
+    
+    # Logging: level (DEBUG shows per-file detail) and format ('json' or 'text')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+    
+    # Admin endpoints (/admin/profile/*, /admin/memory/*); disabled when unset
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+    PROFILER_INTERVAL = float(os.getenv('PROFILER_INTERVAL', 0.005))  # Seconds between stack samples
+    PROFILER_MAX_DURATION = float(os.getenv('PROFILER_MAX_DURATION', 300))
     
     # Server settings
     PORT = int(os.getenv('PORT', 5000))
     DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
     
+    # Production serving (gunicorn.conf.py)
+    WEB_WORKERS = int(os.getenv('WEB_WORKERS', 0))  # 0 = one per CPU core
+    WEB_THREADS = int(os.getenv('WEB_THREADS', 8))  # Above ADMISSION_MAX_IN_FLIGHT, so excess load is shed
+    GRACEFUL_TIMEOUT = int(os.getenv('GRACEFUL_TIMEOUT', 300))  # Seconds to drain in-flight work
+    
+    # Minify the generated index.html before deploying (keeps src/index.html for edits)
+    MINIFY_OUTPUT = os.getenv('MINIFY_OUTPUT', 'False').lower() == 'true'
+    
+    # Ask for separate app.js/styles.css/data files instead of one inline index.html
+    MULTI_FILE_OUTPUT = os.getenv('MULTI_FILE_OUTPUT', 'False').lower() == 'true'
+    
+    # Prepare round 2 (files, repo, prompt cache) in the background after each deploy
+    ROUND2_PREP_ENABLED = os.getenv('ROUND2_PREP_ENABLED', 'False').lower() == 'true'
+    ROUND2_PREP_TTL = int(os.getenv('ROUND2_PREP_TTL', 21600))  # seconds
+    
+    # Per-model prices for cost accounting: model=input:output[:cached] USD per 1M tokens
+    LLM_PRICING = os.getenv('LLM_PRICING', '')
+    # Per-stage latency budgets flagged in responses: stage=seconds (e.g. generate=90,total=150)
+    STAGE_BUDGETS = os.getenv('STAGE_BUDGETS', '')
+    
+    # Shared state for all worker processes (processed tasks, caches, outbox)
+    STATE_DB_PATH = os.getenv('STATE_DB_PATH', 'state.db')
+    
+    # Repo write backend: 'api' (REST contents/tree API) or 'git' (local bare mirrors + git push)
+    GITHUB_BACKEND = os.getenv('GITHUB_BACKEND', 'api').lower()
+    GIT_MIRROR_DIR = os.getenv('GIT_MIRROR_DIR', 'mirrors')
+    GIT_TIMEOUT = int(os.getenv('GIT_TIMEOUT', 120))
+    
+    # GitHub read cache: seconds to reuse a repo object before revalidating by ETag
+    GITHUB_CACHE_TTL = float(os.getenv('GITHUB_CACHE_TTL', 60))
+    GITHUB_CACHE_MAX_ENTRIES = int(os.getenv('GITHUB_CACHE_MAX_ENTRIES', 256))
+    
+    # Provider-side prompt prefix caching (Gemini cached content, OpenRouter cache_control)
+    PROMPT_CACHE_ENABLED = os.getenv('PROMPT_CACHE_ENABLED', 'True').lower() == 'true'
+    PROMPT_CACHE_TTL = int(os.getenv('PROMPT_CACHE_TTL', 900))
+    PROMPT_CACHE_MIN_TOKENS = int(os.getenv('PROMPT_CACHE_MIN_TOKENS', 4096))  # Gemini explicit cache minimum
+    PROMPT_CACHE_EMULATE = os.getenv('PROMPT_CACHE_EMULATE', 'False').lower() == 'true'
+    
+    # Record/replay outbound traffic: off, record or replay ({pid} = per-worker file)
+    CASSETTE_MODE = os.getenv('CASSETTE_MODE', 'off')
+    CASSETTE_PATH = os.getenv('CASSETTE_PATH', 'cassettes/session-{pid}.jsonl.gz')
+    CASSETTE_SPEED = float(os.getenv('CASSETTE_SPEED', 1.0))  # 0 = replay without delays
+    
+    # google-generativeai transport; 'rest' is fork-safe for preloaded workers
+    GEMINI_TRANSPORT = os.getenv('GEMINI_TRANSPORT') or None
+    
+    # Request ingestion limits
+    MAX_REQUEST_BYTES = int(os.getenv('MAX_REQUEST_BYTES', 32 * 1024 * 1024))
+    # Decoded attachments larger than this spill from memory to a temp file
+    ATTACHMENT_SPOOL_MEMORY = int(os.getenv('ATTACHMENT_SPOOL_MEMORY', 1024 * 1024))
+    
+    # Batch submissions (/api-endpoint/batch)
+    BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 4))
+    BATCH_MAX_TASKS = int(os.getenv('BATCH_MAX_TASKS', 100))
+    MAX_BATCH_REQUEST_BYTES = int(os.getenv('MAX_BATCH_REQUEST_BYTES', 128 * 1024 * 1024))
+    
+    # Admission control: tasks per worker before queueing, EWMA of task duration,
+    # and GitHub API calls budgeted per task
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'True').lower() == 'true'
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', 4))
+    ADMISSION_INITIAL_ESTIMATE = float(os.getenv('ADMISSION_INITIAL_ESTIMATE', 120))
+    ADMISSION_EWMA_ALPHA = float(os.getenv('ADMISSION_EWMA_ALPHA', 0.2))
+    GITHUB_CALLS_PER_TASK = int(os.getenv('GITHUB_CALLS_PER_TASK', 10))
+    # Seconds to treat an LLM backend as unavailable after it is rate limited
+    LLM_COOLDOWN_SECONDS = float(os.getenv('LLM_COOLDOWN_SECONDS', 60))
+    
     # Timeouts and retries
     EVALUATION_TIMEOUT = 600  # 10 minutes in seconds
     RETRY_DELAYS = [1, 2, 4, 8]  # Exponential backoff in seconds
@@ -42,9 +151,9 @@ class Config:
             'GITHUB_USERNAME'
         ]
         
-        # Either Gemini or AIpipe must be configured
-        if not cls.GEMINI_API_KEY and not cls.AIPIPE_TOKEN:
-            required.append('GEMINI_API_KEY or AIPIPE_TOKEN')
+        # At least one LLM backend must be configured
+        if not cls.GEMINI_API_KEY and not cls.AIPIPE_TOKEN and not cls.LOCAL_LLM_BASE_URL:
+            required.append('GEMINI_API_KEY or AIPIPE_TOKEN or LOCAL_LLM_BASE_URL')
         
         missing = []
         for var in required:
@@ -0,0 +1,294 @@
+"""
+Git Mirror Backend
+Deploys through local bare mirrors and the git CLI instead of the
+contents API
+
+Files are written into a mirror with a temporary index and commit-tree,
+so a deploy of any number (or size) of files is one local commit and one
+push over a single smart-HTTP connection. Round 2 reads files from the
+mirror. Repo creation and Pages still go through the REST API.
+
+Select it with GITHUB_BACKEND=git.
+"""
+from github_manager import GitHubManager
+from config import Config
+from contextlib import contextmanager
+import accounting
+import base64
+import fcntl
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
+
+BRANCH = 'main'
+
+
+class GitMirrorError(RuntimeError):
+    """A git command failed"""
+
+
+class GitMirrorManager(GitHubManager):
+    """GitHubManager that writes and reads repo contents through local bare mirrors"""
+
+    def __init__(self, mirror_dir=None):
+        super().__init__()
+        self.mirror_dir = mirror_dir or Config.GIT_MIRROR_DIR
+        os.makedirs(self.mirror_dir, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._synced = {}  # repo_name -> monotonic time of the last fetch
+        logger.info(f"✓ Git mirror backend: {os.path.abspath(self.mirror_dir)}")
+
+    # -- git plumbing --------------------------------------------------
+
+    def _git(self, repo_name, *args, input=None, env=None, network=False, raw=False, git_dir=None):
+        """Run a git command against a repo's mirror (or git_dir) and return its stdout (stripped unless raw)"""
+        command = ['git', '--git-dir', git_dir or self._mirror_path(repo_name)]
+        env = {**os.environ, 'GIT_TERMINAL_PROMPT': '0', **(env or {})}
+        if network:
+            accounting.record_github_call()
+            # Token goes in a header for this command only, passed through the
+            # environment so it's neither in the mirror config nor visible in ps
+            credentials = base64.b64encode(f"x-access-token:{Config.GITHUB_TOKEN}".encode()).decode()
+            env.update({
+                'GIT_CONFIG_COUNT': '1',
+                'GIT_CONFIG_KEY_0': 'http.extraHeader',
+                'GIT_CONFIG_VALUE_0': f"Authorization: Basic {credentials}",
+            })
+        result = subprocess.run(
+            command + list(args),
+            input=input,
+            capture_output=True,
+            env=env,
+            timeout=Config.GIT_TIMEOUT
+        )
+        if result.returncode != 0:
+            stderr = result.stderr.decode('utf-8', 'replace').strip()
+            raise GitMirrorError(f"git {args[0]} failed: {stderr}")
+        output = result.stdout.decode('utf-8')
+        return output if raw else output.strip()
+
+    def _mirror_path(self, repo_name):
+        return os.path.join(self.mirror_dir, f"{repo_name}.git")
+
+    def _remote_url(self, repo_name):
+        return f"https://github.com/{self.user.login}/{repo_name}.git"
+
+    @contextmanager
+    def _locked(self, repo_name):
+        """Serialise work on one mirror across threads and worker processes"""
+        with self._locks_guard:
+            lock = self._locks.setdefault(repo_name, threading.Lock())
+        with lock, open(self._mirror_path(repo_name) + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _init_bare(self, path):
+        subprocess.run(
+            ['git', 'init', '--quiet', '--bare', path],
+            check=True, capture_output=True, timeout=Config.GIT_TIMEOUT
+        )
+
+    def _ensure_mirror(self, repo_name):
+        if not os.path.isdir(self._mirror_path(repo_name)):
+            self._init_bare(self._mirror_path(repo_name))
+
+    def _fetch(self, repo_name, git_dir=None):
+        self._git(
+            repo_name, 'fetch', '--quiet', '--prune', self._remote_url(repo_name),
+            '+refs/heads/*:refs/heads/*', network=True, git_dir=git_dir
+        )
+
+    def _sync(self, repo_name, max_age=0):
+        """
+        Fetch the remote branches into the mirror unless fetched within max_age seconds
+
+        A new mirror is built in a staging directory and only moved into
+        place once its first fetch succeeds, so looking up a repo that
+        doesn't exist leaves no empty mirror behind to pass as a cache.
+        """
+        last = self._synced.get(repo_name)
+        if last is not None and time.monotonic() - last < max_age:
+            return
+        if os.path.isdir(self._mirror_path(repo_name)):
+            self._fetch(repo_name)
+        else:
+            staging = tempfile.mkdtemp(prefix=f".{repo_name}-", suffix='.tmp', dir=self.mirror_dir)
+            try:
+                self._init_bare(staging)
+                self._fetch(repo_name, git_dir=staging)
+                os.rename(staging, self._mirror_path(repo_name))
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+        self._synced[repo_name] = time.monotonic()
+
+    def _head(self, repo_name):
+        try:
+            return self._git(repo_name, 'rev-parse', '--verify', '--quiet', f"refs/heads/{BRANCH}")
+        except GitMirrorError:
+            return None
+
+    def _commit_files(self, repo_name, files, parent, message):
+        """
+        Write files on top of `parent` as one commit, without a working tree
+
+        Returns:
+            str: new commit SHA, or `parent` if nothing changed
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                'GIT_INDEX_FILE': os.path.join(tmp, 'index'),
+                'GIT_AUTHOR_NAME': self.user.login,
+                'GIT_AUTHOR_EMAIL': f"{self.user.login}@users.noreply.github.com",
+                'GIT_COMMITTER_NAME': self.user.login,
+                'GIT_COMMITTER_EMAIL': f"{self.user.login}@users.noreply.github.com",
+            }
+            if parent:
+                self._git(repo_name, 'read-tree', parent, env=env)
+            else:
+                self._git(repo_name, 'read-tree', '--empty', env=env)
+
+            entries = []
+            for filename, content in files.items():
+                data = content.encode('utf-8') if isinstance(content, str) else content
+                blob = self._git(repo_name, 'hash-object', '-w', '--stdin', input=data)
+                entries.append(f"100644 {blob}\t{filename}\n")
+            # All index entries in one process
+            self._git(repo_name, 'update-index', '--index-info', input=''.join(entries).encode('utf-8'), env=env)
+
+            tree = self._git(repo_name, 'write-tree', env=env)
+            if parent and tree == self._git(repo_name, 'rev-parse', f"{parent}^{{tree}}"):
+                return parent
+
+            parent_args = ['-p', parent] if parent else []
+            return self._git(repo_name, 'commit-tree', tree, *parent_args, '-m', message, env=env)
+
+    def _push(self, repo_name, commit_sha):
+        self._git(
+            repo_name, 'push', '--quiet', self._remote_url(repo_name),
+            f"{commit_sha}:refs/heads/{BRANCH}", network=True
+        )
+        self._git(repo_name, 'update-ref', f"refs/heads/{BRANCH}", commit_sha)
+
+    # -- GitHubManager interface ---------------------------------------
+
+    def create_and_deploy_repo(self, task_id, files):
+        """
+        Create a repository, push all files in one commit, and enable GitHub Pages
+
+        Returns:
+            dict with repo_url, commit_sha, pages_url
+        """
+        repo_name = self._generate_repo_name(task_id)
+        logger.info(f"📦 Creating repository: {repo_name}")
+
+        repo = self.user.create_repo(
+            repo_name,
+            description=f"Auto-generated app for task {task_id}",
+            private=False,  # Must be public
+            auto_init=False  # We'll push our own files
+        )
+        logger.info(f"✓ Repository created: {repo.html_url}")
+
+        logger.info(f"📤 Pushing {len(files)} files in one commit...")
+        with self._locked(repo_name):
+            self._ensure_mirror(repo_name)
+            commit_sha = self._commit_files(repo_name, files, None, f"Add {', '.join(files)}")
+            self._push(repo_name, commit_sha)
+            self._synced[repo_name] = time.monotonic()
+        logger.info(f"✓ Latest commit: {commit_sha[:7]}")
+
+        pages_url = self._enable_github_pages(repo)
+        return {
+            'repo_url': repo.html_url,
+            'commit_sha': commit_sha,
+            'pages_url': pages_url
+        }
+
+    def update_repo(self, repo_name, files):
+        """
+        Commit changed files on top of the remote head and push once
+
+        Returns:
+            dict with repo_url, commit_sha, pages_url
+        """
+        logger.info(f"🔄 Updating repository: {repo_name}")
+
+        with self._locked(repo_name):
+            self._sync(repo_name, max_age=Config.GITHUB_CACHE_TTL)
+            for attempt in range(2):
+                parent = self._head(repo_name)
+                commit_sha = self._commit_files(repo_name, files, parent, f"Update {', '.join(files)}")
+                if commit_sha == parent:
+                    logger.info(f"✓ All {len(files)} files unchanged, skipping commit")
+                    break
+                try:
+                    self._push(repo_name, commit_sha)
+                    break
+                except GitMirrorError:
+                    if attempt:
+                        raise
+                    # Someone else pushed since our fetch; rebuild on the new head
+                    logger.warning("⚠ Push rejected, refetching and retrying...")
+                    self._sync(repo_name)
+        logger.info(f"✓ Updated commit: {commit_sha[:7]}")
+
+        return {
+            'repo_url': f"https://github.com/{self.user.login}/{repo_name}",
+            'commit_sha': commit_sha,
+            'pages_url': f"https://{self.user.login}.github.io/{repo_name}/"
+        }
+
+    def get_repo_file_content(self, repo_name, filename):
+        """
+        Read a file from the mirror's branch head
+
+        Returns:
+            str: Content of the file, or None if it doesn't exist
+        """
+        try:
+            with self._locked(repo_name):
+                self._sync(repo_name, max_age=Config.GITHUB_CACHE_TTL)
+                return self._git(repo_name, 'show', f"refs/heads/{BRANCH}:{filename}", raw=True)
+        except GitMirrorError as e:
+            logger.error(f"✗ Could not retrieve {filename} from mirror: {e}")
+            return None
+
+    def list_repo_files(self, repo_name):
+        """
+        List every file path at the mirror's branch head
+
+        Returns:
+            list of paths, or None if the mirror can't be read
+        """
+        try:
+            with self._locked(repo_name):
+                self._sync(repo_name, max_age=Config.GITHUB_CACHE_TTL)
+                return self._git(repo_name, 'ls-tree', '-r', '--name-only', f"refs/heads/{BRANCH}").splitlines()
+        except GitMirrorError as e:
+            logger.error(f"✗ Could not list files in mirror: {e}")
+            return None
+
+    def prefetch_repo(self, repo_name):
+        """Bring the mirror up to date ahead of a later update"""
+        with self._locked(repo_name):
+            self._sync(repo_name, max_age=Config.GITHUB_CACHE_TTL)
+
+    def repo_exists(self, repo_name):
+        """Check if a repository exists by fetching it into the mirror"""
+        try:
+            with self._locked(repo_name):
+                self._sync(repo_name)
+            return self._head(repo_name) is not None
+        except GitMirrorError:
+            return False
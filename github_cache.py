@@ -0,0 +1,136 @@
+"""
+GitHub Read-Through Cache
+Caches repository objects and file contents, revalidating with ETags
+
+Within GITHUB_CACHE_TTL seconds a cached repo is reused without any API call;
+after that it is revalidated with a conditional request. GitHub does
+not count 304 Not Modified responses against the primary rate limit, so
+repeat reads of unchanged repos and files are effectively free.
+"""
+from github import GithubException
+from collections import OrderedDict
+from config import Config
+import requests
+import threading
+import time
+
+
+class GitHubCache:
+    """ETag-aware cache of Repository objects and file contents"""
+
+    def __init__(self, github, user, ttl=None, max_entries=None):
+        self.github = github
+        self.user = user
+        self.ttl = Config.GITHUB_CACHE_TTL if ttl is None else ttl
+        self.max_entries = max_entries or Config.GITHUB_CACHE_MAX_ENTRIES
+        self._repos = OrderedDict()   # repo_name -> (repo, fetched_at)
+        self._files = OrderedDict()   # (full_name, path, ref) -> (etag, content)
+        self._heads = OrderedDict()   # full_name -> (commit_sha, tree_sha, {path: blob_sha}, fetched_at)
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"token {Config.GITHUB_TOKEN}",
+            "Accept": "application/vnd.github.raw",
+            "X-GitHub-Api-Version": "2022-11-28"
+        })
+        self.stats = {'hits': 0, 'revalidated': 0, 'misses': 0}
+
+    def _remember(self, cache, key, value):
+        with self._lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.max_entries:
+                cache.popitem(last=False)
+
+    def get_repo(self, repo_name):
+        """
+        Get a Repository, reusing a cached one when possible
+
+        Raises:
+            GithubException: if the repo does not exist
+        """
+        with self._lock:
+            cached = self._repos.get(repo_name)
+
+        if cached:
+            repo, fetched_at = cached
+            if time.monotonic() - fetched_at < self.ttl:
+                self.stats['hits'] += 1
+                return repo
+            try:
+                # Conditional GET; a 304 leaves the object untouched
+                repo.update()
+                self.stats['revalidated'] += 1
+                self._remember(self._repos, repo_name, (repo, time.monotonic()))
+                return repo
+            except GithubException:
+                self.invalidate(repo_name)
+                raise
+
+        self.stats['misses'] += 1
+        repo = self.user.get_repo(repo_name)
+        self._remember(self._repos, repo_name, (repo, time.monotonic()))
+        return repo
+
+    def get_file(self, repo, path, ref=None):
+        """
+        Get a file's decoded content, revalidating a cached copy by ETag
+
+        Returns:
+            str content, or None if the file does not exist
+        """
+        key = (repo.full_name, path, ref)
+        with self._lock:
+            cached = self._files.get(key)
+
+        headers = {"If-None-Match": cached[0]} if cached and cached[0] else {}
+        params = {"ref": ref} if ref else None
+        response = self.session.get(
+            f"https://api.github.com/repos/{repo.full_name}/contents/{path}",
+            headers=headers,
+            params=params,
+            timeout=30
+        )
+
+        if response.status_code == 304 and cached:
+            self.stats['revalidated'] += 1
+            return cached[1]
+        if response.status_code == 404:
+            self.invalidate_files(repo.full_name, [path])
+            return None
+        if response.status_code != 200:
+            raise GithubException(response.status_code, {'message': response.text[:200]}, None)
+
+        self.stats['misses'] += 1
+        content = response.content.decode('utf-8')
+        self._remember(self._files, key, (response.headers.get('ETag'), content))
+        return content
+
+    def remember_head(self, full_name, commit_sha, tree_sha, blobs):
+        """Keep the branch head read for a round 2, so its update needn't read it again"""
+        self._remember(self._heads, full_name, (commit_sha, tree_sha, blobs, time.monotonic()))
+
+    def take_head(self, full_name):
+        """
+        Use up a remembered branch head (it is stale once anything is committed)
+
+        Returns:
+            (commit_sha, tree_sha, {path: blob_sha}), or None if none is fresh
+        """
+        with self._lock:
+            head = self._heads.pop(full_name, None)
+        if head is None or time.monotonic() - head[3] >= self.ttl:
+            return None
+        return head[:3]
+
+    def invalidate(self, repo_name):
+        """Forget a cached repo object"""
+        with self._lock:
+            self._repos.pop(repo_name, None)
+
+    def invalidate_files(self, full_name, paths=None):
+        """Forget cached contents for some (or all) files of a repo"""
+        with self._lock:
+            for key in list(self._files):
+                if key[0] == full_name and (paths is None or key[1] in paths):
+                    del self._files[key]
@@ -3,8 +3,24 @@ GitHub Repository Manager
 Handles repo creation, pushing code, and enabling GitHub Pages
 """
 from github import Github, GithubException
+from github_cache import GitHubCache
 from config import Config
+import hashlib
+import requests
 import time
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
+
+# Initial pushes with more files than this go out as one tree commit
+INITIAL_TREE_MIN_FILES = 3
+
+
+def git_blob_sha(content):
+    """Compute the git blob SHA-1 of file content, as GitHub reports it"""
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
 
 class GitHubManager:
     """Manages GitHub repository operations"""
@@ -12,7 +28,15 @@ class GitHubManager:
     def __init__(self):
         self.github = Github(Config.GITHUB_TOKEN)
         self.user = self.github.get_user()
-        print(f"✓ Connected to GitHub as: {self.user.login}")
+        self.cache = GitHubCache(self.github, self.user)
+        logger.info(f"✓ Connected to GitHub as: {self.user.login}")
+    
+    def reconnect(self):
+        """Start a fresh client (new connection pool) for a forked worker process"""
+        self.github = Github(Config.GITHUB_TOKEN)
+        self.user = self.github.get_user()
+        # Cached repo objects hold the old client, so start a fresh cache too
+        self.cache = GitHubCache(self.github, self.user)
     
     def create_and_deploy_repo(self, task_id, files):
         """
@@ -27,7 +51,7 @@ class GitHubManager:
         """
         # Generate unique repo name
         repo_name = self._generate_repo_name(task_id)
-        print(f"\n📦 Creating repository: {repo_name}")
+        logger.info(f"📦 Creating repository: {repo_name}")
         
         try:
             # Create the repository
@@ -37,14 +61,11 @@ class GitHubManager:
                 private=False,  # Must be public
                 auto_init=False  # We'll push our own files
             )
-            print(f"✓ Repository created: {repo.html_url}")
-            
-            # Push files
-            self._push_files(repo, files)
+            logger.info(f"✓ Repository created: {repo.html_url}")
             
-            # Get the commit SHA
-            commit_sha = repo.get_commits()[0].sha
-            print(f"✓ Latest commit: {commit_sha[:7]}")
+            # Push files; the final commit is the head we report
+            commit_sha = self._push_files(repo, files)
+            logger.info(f"✓ Latest commit: {commit_sha[:7]}")
             
             # Enable GitHub Pages
             pages_url = self._enable_github_pages(repo)
@@ -56,7 +77,7 @@ class GitHubManager:
             }
             
         except GithubException as e:
-            print(f"✗ GitHub error: {e.status} - {e.data.get('message', 'Unknown error')}")
+            logger.error(f"✗ GitHub error: {e.status} - {e.data.get('message', 'Unknown error')}")
             raise
     
     def update_repo(self, repo_name, files):
@@ -70,18 +91,16 @@ class GitHubManager:
         Returns:
             dict with repo_url, commit_sha, pages_url
         """
-        print(f"\n🔄 Updating repository: {repo_name}")
+        logger.info(f"🔄 Updating repository: {repo_name}")
         
         try:
-            # Get the existing repository
-            repo = self.user.get_repo(repo_name)
-            
-            # Update files
-            self._update_files(repo, files)
+            # Get the existing repository (usually cached from the round 2 lookup)
+            repo = self.cache.get_repo(repo_name)
             
-            # Get the new commit SHA
-            commit_sha = repo.get_commits()[0].sha
-            print(f"✓ Updated commit: {commit_sha[:7]}")
+            # Update changed files in one commit
+            commit_sha = self._update_files(repo, files)
+            self.cache.invalidate_files(repo.full_name, list(files))
+            logger.info(f"✓ Updated commit: {commit_sha[:7]}")
             
             # Pages URL remains the same
             pages_url = f"https://{self.user.login}.github.io/{repo_name}/"
@@ -93,7 +112,7 @@ class GitHubManager:
             }
             
         except GithubException as e:
-            print(f"✗ GitHub error: {e.status} - {e.data.get('message', 'Unknown error')}")
+            logger.error(f"✗ GitHub error: {e.status} - {e.data.get('message', 'Unknown error')}")
             raise
     
     def _generate_repo_name(self, task_id):
@@ -106,56 +125,128 @@ class GitHubManager:
         return repo_name
     
     def _push_files(self, repo, files):
-        """Push multiple files to the repository"""
-        print(f"📤 Pushing {len(files)} files...")
+        """
+        Push multiple files to a new, empty repository
+        
+        The git data API can't write to an empty repository, so the first
+        file is created through the contents API. With more than
+        INITIAL_TREE_MIN_FILES files, the rest follow as one tree commit
+        built on the SHAs that call returns (3 more calls however many
+        files there are); smaller sets are cheaper as one create_file each.
         
-        for filename, content in files.items():
+        Returns:
+            str: SHA of the final commit
+        
+        Raises:
+            ValueError: if there are no files, as there would be no commit
+        """
+        if not files:
+            raise ValueError(f"No files to push to {repo.full_name}")
+        logger.info(f"📤 Pushing {len(files)} files...")
+        
+        items = list(files.items())
+        batched = len(items) > INITIAL_TREE_MIN_FILES
+        for filename, content in items[:1] if batched else items:
             try:
-                repo.create_file(
+                result = repo.create_file(
                     path=filename,
                     message=f"Add {filename}",
                     content=content
                 )
-                print(f"  ✓ {filename}")
             except GithubException as e:
-                print(f"  ✗ Failed to create {filename}: {e.data.get('message', 'Unknown error')}")
+                logger.error(f"✗ Failed to create {filename}: {e.data.get('message', 'Unknown error')}")
                 raise
+            logger.debug(f"✓ {filename}")
+        
+        commit = result['commit'].raw_data
+        if not batched:
+            return commit['sha']
+        
+        rest = dict(items[1:])
+        try:
+            return self._commit_tree(repo, rest, commit['sha'], commit['tree']['sha'], f"Add {', '.join(rest)}")
+        except requests.HTTPError as e:
+            logger.error(f"✗ Failed to add files: {e.response.status_code} {e.response.text[:200]}")
+            raise
     
-    def _update_files(self, repo, files):
-        """Update existing files in the repository"""
-        print(f"📤 Updating {len(files)} files...")
+    def _commit_tree(self, repo, files, parent_sha, base_tree_sha, message):
+        """
+        Commit files on top of a known head without reading it back first
         
-        for filename, content in files.items():
-            try:
-                # Try to get existing file
-                try:
-                    existing_file = repo.get_contents(filename)
-                    # Update existing file
-                    repo.update_file(
-                        path=filename,
-                        message=f"Update {filename}",
-                        content=content,
-                        sha=existing_file.sha
-                    )
-                    print(f"  ✓ Updated {filename}")
-                except GithubException as e:
-                    if e.status == 404:
-                        # File doesn't exist, create it
-                        repo.create_file(
-                            path=filename,
-                            message=f"Add {filename}",
-                            content=content
-                        )
-                        print(f"  ✓ Created {filename}")
-                    else:
-                        raise
-            except GithubException as e:
-                print(f"  ✗ Failed to update {filename}: {e.data.get('message', 'Unknown error')}")
+        Returns:
+            str: SHA of the new commit
+        """
+        session = self.cache.session
+        headers = {"Accept": "application/vnd.github+json"}
+        
+        def call(method, path, payload):
+            response = session.request(method, f"{repo.url}/git/{path}", json=payload, headers=headers, timeout=30)
+            response.raise_for_status()
+            return response.json()
+        
+        tree = call('POST', 'trees', {
+            'base_tree': base_tree_sha,
+            'tree': [
+                {'path': filename, 'mode': '100644', 'type': 'blob', 'content': content}
+                for filename, content in files.items()
+            ]
+        })
+        commit = call('POST', 'commits', {'message': message, 'tree': tree['sha'], 'parents': [parent_sha]})
+        call('PATCH', f"refs/heads/{repo.default_branch or 'main'}", {'sha': commit['sha']})
+        for filename in files:
+            logger.debug(f"✓ {filename}")
+        return commit['sha']
+    
+    def _update_files(self, repo, files, message=None):
+        """
+        Commit only the files whose content changed, as a single commit
+        
+        The current tree is compared against blob SHAs computed locally, so
+        unchanged files cost no API calls at all. The head read by
+        list_repo_files is reused when there is one; if the branch moved
+        since, the ref update is refused and the head is read again.
+        
+        Returns:
+            str: SHA of the new commit, or of the current head if nothing changed
+        """
+        head = self.cache.take_head(repo.full_name)
+        try:
+            return self._commit_changes(repo, files, message, head or self._read_head(repo))
+        except requests.HTTPError as e:
+            if head is None or e.response.status_code != 422:
+                logger.error(f"✗ Failed to update files: {e.response.status_code} {e.response.text[:200]}")
                 raise
+            logger.info("🔄 Branch moved since it was read, retrying on the current head")
+        try:
+            return self._commit_changes(repo, files, message, self._read_head(repo))
+        except requests.HTTPError as e:
+            logger.error(f"✗ Failed to update files: {e.response.status_code} {e.response.text[:200]}")
+            raise
+    
+    def _read_head(self, repo):
+        """(commit_sha, tree_sha, {path: blob_sha}) of the default branch"""
+        ref = repo.get_git_ref(f"heads/{repo.default_branch or 'main'}")
+        head_commit = repo.get_git_commit(ref.object.sha)
+        tree = repo.get_git_tree(head_commit.tree.sha, recursive=True)
+        blobs = {element.path: element.sha for element in tree.tree if element.type == 'blob'}
+        return head_commit.sha, tree.sha, blobs
+    
+    def _commit_changes(self, repo, files, message, head):
+        commit_sha, tree_sha, current = head
+        changed = {
+            filename: content for filename, content in files.items()
+            if current.get(filename) != git_blob_sha(content)
+        }
+        if not changed:
+            logger.info(f"✓ All {len(files)} files unchanged, skipping commit")
+            return commit_sha
+        
+        logger.info(f"📤 Updating {len(changed)} of {len(files)} files...")
+        return self._commit_tree(repo, changed, commit_sha, tree_sha, message or f"Update {', '.join(changed)}")
     
     def _enable_github_pages(self, repo):
         """Enable GitHub Pages for the repository"""
-        print("🌐 Enabling GitHub Pages...")
+        logger.info("🌐 Enabling GitHub Pages...")
         
         try:
             # Enable Pages using the main branch via API
@@ -177,20 +268,20 @@ class GitHubManager:
             response = requests.post(url, json=data, headers=headers)
             
             if response.status_code == 201:
-                print("✓ GitHub Pages enabled")
+                logger.info("✓ GitHub Pages enabled")
             elif response.status_code == 409:
-                print("✓ GitHub Pages already enabled")
+                logger.info("✓ GitHub Pages already enabled")
             else:
-                print(f"⚠ Warning: Pages API returned {response.status_code}: {response.text}")
+                logger.warning(f"⚠ Warning: Pages API returned {response.status_code}: {response.text}")
         except Exception as e:
-            print(f"⚠ Warning: Could not enable Pages via API: {e}")
+            logger.warning(f"⚠ Warning: Could not enable Pages via API: {e}")
         
         # Construct the Pages URL
         pages_url = f"https://{self.user.login}.github.io/{repo.name}/"
-        print(f"✓ Pages URL: {pages_url}")
+        logger.info(f"✓ Pages URL: {pages_url}")
         
         # Wait a moment for Pages to be ready
-        print("⏳ Waiting for GitHub Pages to deploy...")
+        logger.info("⏳ Waiting for GitHub Pages to deploy...")
         time.sleep(5)
         
         return pages_url
@@ -207,17 +298,45 @@ class GitHubManager:
             str: Content of the file
         """
         try:
-            repo = self.user.get_repo(repo_name)
-            file_content = repo.get_contents(filename)
-            return file_content.decoded_content.decode('utf-8')
+            repo = self.cache.get_repo(repo_name)
+            content = self.cache.get_file(repo, filename)
+            if content is None:
+                logger.error(f"✗ Could not retrieve {filename}: Not Found")
+            return content
+        except GithubException as e:
+            logger.error(f"✗ Could not retrieve {filename}: {e.data.get('message', 'Unknown error')}")
+            return None
+        except Exception as e:
+            logger.error(f"✗ Could not retrieve {filename}: {e}")
+            return None
+    
+    def list_repo_files(self, repo_name):
+        """
+        List every file path on the repository's default branch
+        
+        Returns:
+            list of paths, or None if the tree could not be read
+        """
+        try:
+            repo = self.cache.get_repo(repo_name)
+            head = repo.get_branch(repo.default_branch or 'main').commit
+            tree = repo.get_git_tree(head.commit.tree.sha, recursive=True)
+            blobs = {element.path: element.sha for element in tree.tree if element.type == 'blob'}
+            # The round 2 update that follows commits on top of this head
+            self.cache.remember_head(repo.full_name, head.sha, tree.sha, blobs)
+            return list(blobs)
         except GithubException as e:
-            print(f"✗ Could not retrieve {filename}: {e.data.get('message', 'Unknown error')}")
+            logger.error(f"✗ Could not list files: {e.data.get('message', 'Unknown error')}")
             return None
     
+    def prefetch_repo(self, repo_name):
+        """Load a repository into the cache ahead of a later update"""
+        self.cache.get_repo(repo_name)
+    
     def repo_exists(self, repo_name):
         """Check if a repository exists"""
         try:
-            self.user.get_repo(repo_name)
+            self.cache.get_repo(repo_name)
             return True
         except GithubException:
             return False
@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for production serving
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Pre-forks one worker per CPU core (WEB_WORKERS to override), each with
+WEB_THREADS threads. The app is preloaded in the master so imports and
+client setup happen once; workers drop inherited connections after fork.
+On SIGTERM, workers stop accepting requests and get GRACEFUL_TIMEOUT
+seconds to finish in-flight deploys and flush queued notifications.
+"""
+import multiprocessing
+import os
+
+# The REST transport is fork-safe; gRPC channels created in the master are not
+os.environ.setdefault('GEMINI_TRANSPORT', 'rest')
+
+from config import Config
+
+bind = f"0.0.0.0:{Config.PORT}"
+workers = Config.WEB_WORKERS or multiprocessing.cpu_count()
+worker_class = 'gthread'
+threads = Config.WEB_THREADS
+preload_app = True
+
+# A deploy can legitimately take most of the evaluation window
+timeout = Config.EVALUATION_TIMEOUT
+graceful_timeout = Config.GRACEFUL_TIMEOUT
+keepalive = 5
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    import app
+    app.after_fork()
+
+
+def worker_exit(server, worker):
+    import app
+    app.shutdown()
@@ -0,0 +1,238 @@
+"""
+HTML Post-Processing
+Minifies generated pages before deployment and adds loading hints for
+CDN resources
+
+Only transformations that can't change behaviour are applied: comments
+and redundant whitespace are removed outside <pre>/<textarea> and
+attribute values, CSS is compacted outside string literals, and
+JavaScript is only trimmed line by line (and left alone entirely when it
+contains template literals). The readable original is
+kept next to the minified page so round 2 edits the source, not the
+minified output.
+"""
+import re
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
+
+# Unminified copy of index.html that round 2 reads back
+SOURCE_PATH = 'src/index.html'
+
+# Preconnecting to more origins than this costs more than it saves
+MAX_PRECONNECT = 4
+
+# Raw-text elements whose content must not be treated as markup
+_RAW_PATTERN = re.compile(
+    r'(<(script|style|pre|textarea)\b[^>]*>)(.*?)(</\2\s*>)',
+    re.IGNORECASE | re.DOTALL
+)
+_COMMENT_PATTERN = re.compile(r'<!--(?!\s*\[if)(?!>).*?-->', re.DOTALL)
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+# A start or end tag; quoted attribute values may contain '>'
+_TAG_PATTERN = re.compile(r"""<[^<>"']*(?:(?:"[^"]*"|'[^']*')[^<>"']*)*>""")
+_TAG_PART_PATTERN = re.compile(r"""("[^"]*"|'[^']*')|\s+""")
+
+# Strings are matched first so comment markers and whitespace inside them survive
+_CSS_TOKEN_PATTERN = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|/\*.*?\*/""", re.DOTALL)
+# Whitespace before ':' is kept: in a selector it's a descendant combinator
+# (`.nav :hover` is not `.nav:hover`)
+_CSS_PUNCTUATION_PATTERN = re.compile(r'\s*([{};,>])\s*|(:)\s*')
+
+_SCRIPT_TAG_PATTERN = re.compile(r'<script\b([^>]*)>', re.IGNORECASE)
+_SRC_PATTERN = re.compile(r"""\bsrc\s*=\s*["']?(https?:)?//([^"'\s>]+)""", re.IGNORECASE)
+_ANY_SRC_PATTERN = re.compile(r'\bsrc\s*=', re.IGNORECASE)
+_DEFER_PATTERN = re.compile(r'\b(defer|async)\b', re.IGNORECASE)
+_TYPE_PATTERN = re.compile(r"""\btype\s*=\s*["']?([^"'\s>]+)""", re.IGNORECASE)
+_LINK_HOST_PATTERN = re.compile(
+    r"""<link\b[^>]*\bhref\s*=\s*["']?(?:https?:)?//([^"'\s>/]+)""",
+    re.IGNORECASE
+)
+_HEAD_PATTERN = re.compile(r'<head\b[^>]*>', re.IGNORECASE)
+_CHARSET_PATTERN = re.compile(r'<meta\b[^>]*charset[^>]*>', re.IGNORECASE)
+
+
+def _minify_css_code(css):
+    css = _WHITESPACE_PATTERN.sub(' ', css)
+    css = _CSS_PUNCTUATION_PATTERN.sub(lambda m: m.group(1) or m.group(2), css)
+    return css.replace(';}', '}')
+
+
+def minify_css(css):
+    """Strip comments and whitespace around CSS punctuation, leaving strings intact"""
+    parts = []
+    position = 0
+    for match in _CSS_TOKEN_PATTERN.finditer(css):
+        parts.append(_minify_css_code(css[position:match.start()]))
+        # A comment is dropped, a string kept verbatim
+        parts.append(match.group(1) or '')
+        position = match.end()
+    parts.append(_minify_css_code(css[position:]))
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    """
+    Drop indentation, blank lines and whole-line // comments
+
+    Statements are never joined, so automatic semicolon insertion and
+    regex literals are unaffected. Scripts with template literals are
+    returned unchanged because their whitespace is significant.
+    """
+    if '`' in js:
+        return js
+    lines = []
+    for line in js.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def _collapse(text):
+    # Keep one newline or space wherever there was whitespace, so inline
+    # elements keep their separation
+    return _WHITESPACE_PATTERN.sub(lambda m: '\n' if '\n' in m.group(0) else ' ', text)
+
+
+def _collapse_tag(tag):
+    # Attribute values (title, placeholder, value...) are kept verbatim
+    return _TAG_PART_PATTERN.sub(lambda m: m.group(1) or _collapse(m.group(0)), tag)
+
+
+def _minify_markup(markup):
+    markup = _COMMENT_PATTERN.sub('', markup)
+    parts = []
+    position = 0
+    for match in _TAG_PATTERN.finditer(markup):
+        parts.append(_collapse(markup[position:match.start()]))
+        parts.append(_collapse_tag(match.group(0)))
+        position = match.end()
+    parts.append(_collapse(markup[position:]))
+    return ''.join(parts)
+
+
+def _is_classic_script(attrs):
+    type_match = _TYPE_PATTERN.search(attrs)
+    script_type = type_match.group(1).lower() if type_match else 'text/javascript'
+    return script_type in ('text/javascript', 'application/javascript', 'javascript')
+
+
+def minify_html(html):
+    """
+    Minify an HTML document
+
+    Returns:
+        str: minified HTML
+    """
+    parts = []
+    position = 0
+    for match in _RAW_PATTERN.finditer(html):
+        parts.append(_minify_markup(html[position:match.start()]))
+        open_tag, tag, body, close_tag = match.group(1), match.group(2).lower(), match.group(3), match.group(4)
+        if tag == 'style':
+            body = minify_css(body)
+        elif tag == 'script' and _is_classic_script(open_tag) and not _SRC_PATTERN.search(open_tag):
+            body = minify_js(body)
+        elif tag == 'script' and 'json' in open_tag.lower():
+            body = body.strip()
+        parts.append(_minify_markup(open_tag) + body + close_tag)
+        position = match.end()
+    parts.append(_minify_markup(html[position:]))
+    return ''.join(parts).strip()
+
+
+def _has_dependent_script(html):
+    # A classic script that runs during parsing after a CDN script may use
+    # that library immediately, whether it is inline or a local file
+    seen_cdn = False
+    for match in _RAW_PATTERN.finditer(html):
+        open_tag = match.group(1)
+        if match.group(2).lower() != 'script' or not _is_classic_script(open_tag) \
+                or _DEFER_PATTERN.search(open_tag):
+            continue
+        if _SRC_PATTERN.search(open_tag):
+            seen_cdn = True
+        elif seen_cdn and (_ANY_SRC_PATTERN.search(open_tag) or match.group(3).strip()):
+            return True
+    return False
+
+
+def defer_cdn_scripts(html):
+    """
+    Add `defer` to external classic scripts
+
+    Only safe when no later classic script (inline or local, such as a
+    split app.js) runs during parsing, since it may use the library
+    immediately; otherwise unchanged.
+    """
+    if _has_dependent_script(html):
+        return html
+
+    def add_defer(match):
+        attrs = match.group(1)
+        if not _SRC_PATTERN.search(attrs) or not _is_classic_script(attrs) \
+                or _DEFER_PATTERN.search(attrs):
+            return match.group(0)
+        return f"<script{attrs.rstrip()} defer>"
+
+    return _SCRIPT_TAG_PATTERN.sub(add_defer, html)
+
+
+def external_origins(html, limit=MAX_PRECONNECT):
+    """Origins of external scripts, images and stylesheets, in document order"""
+    origins = []
+    hosts = [m.group(2).split('/')[0] for m in _SRC_PATTERN.finditer(html)]
+    hosts += _LINK_HOST_PATTERN.findall(html)
+    for host in hosts:
+        origin = 'https://' + host
+        if origin not in origins:
+            origins.append(origin)
+    return origins[:limit]
+
+
+def add_preconnect_hints(html):
+    """Insert <link rel="preconnect"> for each CDN origin not already hinted"""
+    # No crossorigin: the hinted scripts, images and stylesheets are plain
+    # (non-CORS) loads, which can't reuse a CORS-mode preconnect
+    hints = [
+        f'<link rel="preconnect" href="{origin}">'
+        for origin in external_origins(html)
+        if f'rel="preconnect" href="{origin}"' not in html
+    ]
+    if not hints:
+        return html
+    # After <meta charset>, which must stay within the first 1024 bytes
+    anchor = _CHARSET_PATTERN.search(html) or _HEAD_PATTERN.search(html)
+    if not anchor:
+        return html
+    return html[:anchor.end()] + ''.join(hints) + html[anchor.end():]
+
+
+def optimise_html(html):
+    """Minify, defer CDN scripts where safe and add preconnect hints"""
+    return add_preconnect_hints(defer_cdn_scripts(minify_html(html)))
+
+
+def postprocess_files(files):
+    """
+    Optimise index.html for serving, keeping the readable original
+
+    Returns:
+        dict of files with the optimised index.html and SOURCE_PATH added
+    """
+    html = files.get('index.html')
+    if not html:
+        return files
+    try:
+        optimised = optimise_html(html)
+    except Exception as e:
+        logger.warning(f"⚠ Warning: HTML post-processing failed, deploying unmodified page: {e}")
+        return files
+    logger.info(f"✓ Minified index.html: {len(html)} → {len(optimised)} bytes")
+    return {**files, 'index.html': optimised, SOURCE_PATH: html}
+
+
+def source_html(files):
+    """The readable index.html from a file set (the original when minified)"""
+    return files.get(SOURCE_PATH) or files.get('index.html')
@@ -5,116 +5,251 @@ Automatically falls back to AIpipe if Gemini fails
 """
 import google.generativeai as genai
 from config import Config
+from candidate_scorer import score_candidate
+import prompt_templates
+from request_ingest import SpooledDataUrl
+from brief_cache import BriefCache
+from provider_registry import build_backends, order_backends
+from model_router import ModelRouter, score_complexity
+import html_postprocess
+import response_parser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextvars
+import threading
+import time
 import json
 import base64
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
+
+# Errors that mean a backend is rate limited rather than broken
+RATE_LIMIT_KEYWORDS = ['429', 'quota', 'resource_exhausted']
 
 # Always configure both if available
 if Config.GEMINI_API_KEY:
-    genai.configure(api_key=Config.GEMINI_API_KEY)
-    print("✓ Gemini configured (primary)")
+    if Config.GEMINI_TRANSPORT:
+        genai.configure(api_key=Config.GEMINI_API_KEY, transport=Config.GEMINI_TRANSPORT)
+    else:
+        genai.configure(api_key=Config.GEMINI_API_KEY)
+    logger.info("✓ Gemini configured (primary)")
 
 if Config.AIPIPE_TOKEN:
-    from aipipe_generator import AIpipeGenerator
-    print("✓ AIpipe configured (fallback)")
+    logger.info("✓ AIpipe configured (fallback)")
 
 if Config.USE_AIPIPE:
-    print("⚠ AIpipe set as primary in config")
+    logger.warning("⚠ AIpipe set as primary in config")
 
 class LLMGenerator:
     """Generates code using Google Gemini Pro with AIpipe fallback"""
     
     def __init__(self):
-        # Initialize both models if available
-        self.gemini_model = None
-        self.aipipe_model = None
-        self.last_provider_used = None  # Track which provider was actually used
-        
-        if Config.GEMINI_API_KEY:
-            self.gemini_model = genai.GenerativeModel('gemini-2.5-pro')
-        
-        if Config.AIPIPE_TOKEN:
-            self.aipipe_model = AIpipeGenerator()
-        
-        # Determine primary model
-        if Config.USE_AIPIPE and self.aipipe_model:
-            self.primary = "aipipe"
-            print("🔄 Using AIpipe as primary LLM")
-        elif self.gemini_model:
-            self.primary = "gemini"
-            print("🔄 Using Gemini as primary LLM")
-        elif self.aipipe_model:
-            self.primary = "aipipe"
-            print("🔄 Using AIpipe (Gemini not available)")
+        # Ordered backends from Config (LLM_BACKENDS, or legacy Gemini/AIpipe settings)
+        self.backends = build_backends()
+        # Optional fast tier for simple briefs (see model_router)
+        self.fast_backends = build_backends(Config.FAST_LLM_BACKENDS) if Config.ROUTING_ENABLED and Config.FAST_LLM_BACKENDS else []
+        self.router = ModelRouter() if self.fast_backends else None
+        self._local = threading.local()  # Per-thread last provider: each task runs on one thread
+        self.brief_cache = BriefCache() if Config.BRIEF_CACHE_ENABLED else None
+        self._cooldowns = {}  # Provider -> monotonic time its rate limit cooldown ends
+        
+        if not self.backends:
+            raise ValueError("No LLM provider configured! Need GEMINI_API_KEY, AIPIPE_TOKEN or LOCAL_LLM_BASE_URL")
+        
+        for backend in self.backends:
+            role = f"weight {backend.weight:g}" if backend.weight > 0 else "fallback only"
+            logger.info(f"🔄 LLM backend {backend.provider.name} ({backend.provider.model}): {role}")
+        for backend in self.fast_backends:
+            logger.info(f"🔄 Fast tier backend {backend.provider.name} ({backend.provider.model})")
+    
+    @property
+    def last_provider_used(self):
+        """Label of the provider that served this thread's last generation"""
+        return getattr(self._local, 'last_provider_used', None)
+    
+    @last_provider_used.setter
+    def last_provider_used(self, value):
+        self._local.last_provider_used = value
+    
+    def llm_retry_after(self):
+        """Seconds until a primary backend is out of rate limit cooldown (0 if one is available now)"""
+        now = time.monotonic()
+        waits = [self._cooldowns.get(backend.provider, 0) - now for backend in self.backends]
+        return max(0.0, min(waits)) if waits else 0.0
+    
+    def _cooling_down(self, provider):
+        return self._cooldowns.get(provider, 0) > time.monotonic()
+    
+    def _order_backends(self, backends, first=None):
+        """Backends in attempt order, with rate limited ones moved to the end"""
+        if first is not None:
+            ordered = [first] + [b for b in backends if b is not first]
         else:
-            raise ValueError("No LLM provider configured! Need either GEMINI_API_KEY or AIPIPE_TOKEN")
+            ordered = order_backends(backends)
+        return sorted(ordered, key=lambda backend: self._cooling_down(backend.provider))
     
-    def _generate_with_fallback(self, prompt, generation_config=None):
+    def _generate_with_fallback(self, prompt, generation_config=None, backends=None, first=None):
         """
         Try to generate content with automatic fallback
-        Tries primary model first, falls back to secondary on failure
+        Tries the weighted first choice (or `first`), then the remaining
+        backends in order; backends cooling down after a rate limit go last
+        
+        Returns:
+            LLMResult
         """
         errors = []
-        
-        # Try primary model first
-        if self.primary == "gemini" and self.gemini_model:
+        for attempt, backend in enumerate(self._order_backends(backends or self.backends, first)):
+            provider = backend.provider
             try:
-                print("🤖 Trying Gemini...")
-                if generation_config:
-                    response = self.gemini_model.generate_content(prompt, generation_config=generation_config)
+                if attempt == 0:
+                    logger.info(f"🤖 Trying {provider.name} ({provider.model})...")
                 else:
-                    response = self.gemini_model.generate_content(prompt)
-                print("✓ Gemini successful")
-                self.last_provider_used = "Gemini"  # Track successful provider
-                return response
+                    logger.info(f"🤖 Falling back to {provider.name} ({provider.model})...")
+                result = provider.generate(prompt, generation_config)
+                logger.info(f"✓ {provider.name} successful ({result.latency:.1f}s)")
+                self._cooldowns.pop(provider, None)
+                # Track which provider actually served the request
+                self.last_provider_used = provider.name if attempt == 0 else f"{provider.name} (fallback)"
+                return result
             except Exception as e:
-                error_msg = str(e)
-                errors.append(f"Gemini failed: {error_msg}")
-                print(f"⚠ Gemini failed: {error_msg}")
+                errors.append(f"{provider.name} failed: {str(e)}")
+                logger.warning(f"⚠ {provider.name} failed: {str(e)}")
+                if any(keyword in str(e).lower() for keyword in RATE_LIMIT_KEYWORDS):
+                    self._cooldowns[provider] = time.monotonic() + Config.LLM_COOLDOWN_SECONDS
+                if not provider.should_fall_back(e):
+                    break
+        
+        raise Exception(f"All providers failed: {'; '.join(errors)}")
+    
+    def _candidate_backends(self, n, backends):
+        """Assign a first-choice backend to each of the N candidates"""
+        if Config.BEST_OF_N_MIXED_PROVIDERS:
+            # Weight 0 backends are fallback only, and rate limited ones sit out
+            available = [b for b in backends if b.weight > 0] or list(backends)
+            available = [b for b in available if not self._cooling_down(b.provider)] or available
+        else:
+            available = [self._order_backends(backends)[0]]
+        # Round-robin in configured order
+        return [available[i % len(available)] for i in range(n)]
+    
+    def _score_files(self, files, checks, base_files=None):
+        """Score parsed files locally, as the deployed site (base files plus the new ones) would look"""
+        return score_candidate(response_parser.combined_html({**(base_files or {}), **files}), checks)
+    
+    def _generate_best_of_n(self, prompt, generation_config, checks, n, backends, base_files=None):
+        """
+        Generate N candidates concurrently and keep the best-scoring one
+
+        Each candidate is parsed and scored locally against the checks.
+        With early exit enabled, the first candidate that passes every
+        check wins without waiting for the rest.
+
+        Returns:
+            (files, score) of the winning candidate
+        """
+        candidates = self._candidate_backends(n, backends)
+        logger.info(f"🎯 Best-of-{n}: generating candidates with {', '.join(b.provider.name for b in candidates)}")
+        
+        best = None
+        errors = []
+        executor = ThreadPoolExecutor(max_workers=n)
+        try:
+            futures = {
+                executor.submit(
+                    # Each candidate thread keeps the request's log context, and
+                    # falls back past failing or rate limited backends like a single call
+                    contextvars.copy_context().run, self._generate_with_fallback,
+                    prompt, generation_config, backends, backend
+                ): (index, backend.provider.name)
+                for index, backend in enumerate(candidates, 1)
+            }
+            for future in as_completed(futures):
+                index, provider = futures[future]
+                try:
+                    result = future.result()
+                    provider = result.provider
+                    files = self._parse_response(result.text, require_index=base_files is None)
+                except Exception as e:
+                    errors.append(f"candidate {index} ({provider}): {e}")
+                    logger.warning(f"✗ Candidate {index} ({provider}) failed: {e}")
+                    continue
+                
+                score = self._score_files(files, checks, base_files)
+                logger.debug(f"• Candidate {index} ({provider}): score {score['score']:.2f}, "
+                             f"{score['passed']}/{len(checks or [])} checks verified")
+                if best is None or score['score'] > best[0]['score']:
+                    best = (score, files, provider, index)
                 
-                # Check if it's a quota or timeout error
-                if any(keyword in error_msg.lower() for keyword in ['quota', 'timeout', '429', '504', 'exceeded']):
-                    print("💡 Quota/timeout error detected, trying AIpipe fallback...")
-                    if self.aipipe_model:
-                        try:
-                            print("🤖 Falling back to AIpipe...")
-                            response = self.aipipe_model.generate_content(prompt)
-                            print("✓ AIpipe fallback successful")
-                            self.last_provider_used = "AIpipe (fallback)"  # Track fallback
-                            return response
-                        except Exception as e2:
-                            errors.append(f"AIpipe fallback failed: {str(e2)}")
-                            print(f"✗ AIpipe fallback failed: {str(e2)}")
-                raise Exception(f"Both providers failed: {'; '.join(errors)}")
-        
-        elif self.primary == "aipipe" and self.aipipe_model:
+                if Config.BEST_OF_N_EARLY_EXIT and score['all_passed']:
+                    logger.debug(f"⚡ Candidate {index} passes all checks, skipping the rest")
+                    break
+        finally:
+            # Don't block on stragglers once we have a winner
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        if best is None:
+            raise Exception(f"All {n} candidates failed: {'; '.join(errors)}")
+        
+        score, files, provider, index = best
+        self.last_provider_used = f"{provider} (best of {n})"
+        logger.info(f"✓ Selected candidate {index} ({provider}) with score {score['score']:.2f}")
+        return files, score
+    
+    def _generate_scored(self, prompt, generation_config, checks, backends, base_files=None):
+        """Generate and parse files on the given backends, scoring them locally"""
+        if Config.BEST_OF_N > 1:
+            return self._generate_best_of_n(prompt, generation_config, checks, Config.BEST_OF_N, backends, base_files)
+        
+        result = self._generate_with_fallback(
+            prompt,
+            generation_config=generation_config,
+            backends=backends
+        )
+        
+        # Parse the response
+        files = self._parse_response(result.text, require_index=base_files is None)
+        return files, self._score_files(files, checks, base_files)
+    
+    def _generate_files(self, prompt, generation_config, checks, complexity=None, base_files=None):
+        """
+        Generate and parse files, routing by brief complexity
+        
+        Simple briefs go to the fast tier first; if its output fails local
+        validation (or the fast tier errors) the pro tier is used instead.
+        With base_files (a multi-file round 2), the model may return only
+        the files it changed; scoring sees them merged over base_files.
+        """
+        tier = 'pro'
+        if self.router and complexity is not None:
+            tier = self.router.choose_tier(complexity)
+            logger.info(f"🧭 Complexity {complexity:.1f} → {tier} tier")
+        
+        if tier == 'fast':
+            start = time.perf_counter()
             try:
-                print("🤖 Trying AIpipe...")
-                response = self.aipipe_model.generate_content(prompt)
-                print("✓ AIpipe successful")
-                self.last_provider_used = "AIpipe"  # Track successful provider
-                return response
+                files, score = self._generate_scored(prompt, generation_config, checks, self.fast_backends, base_files)
             except Exception as e:
-                error_msg = str(e)
-                errors.append(f"AIpipe failed: {error_msg}")
-                print(f"⚠ AIpipe failed: {error_msg}")
-                
-                # Try Gemini fallback
-                if self.gemini_model:
-                    try:
-                        print("🤖 Falling back to Gemini...")
-                        if generation_config:
-                            response = self.gemini_model.generate_content(prompt, generation_config=generation_config)
-                        else:
-                            response = self.gemini_model.generate_content(prompt)
-                        print("✓ Gemini fallback successful")
-                        self.last_provider_used = "Gemini (fallback)"  # Track fallback
-                        return response
-                    except Exception as e2:
-                        errors.append(f"Gemini fallback failed: {str(e2)}")
-                        print(f"✗ Gemini fallback failed: {str(e2)}")
-                raise Exception(f"Both providers failed: {'; '.join(errors)}")
-        
-        raise Exception("No LLM provider available")
+                logger.warning(f"⚠ Fast tier failed, escalating: {e}")
+                self.router.record('fast', time.perf_counter() - start, passed=False, escalated=True, failed=True)
+            else:
+                if score['all_passed']:
+                    self.router.record('fast', time.perf_counter() - start, passed=True)
+                    return files
+                logger.warning(f"⚠ Fast tier output failed validation ({score['failed']} checks), escalating to pro tier")
+                self.router.record('fast', time.perf_counter() - start, passed=False, escalated=True)
+        
+        start = time.perf_counter()
+        try:
+            files, score = self._generate_scored(prompt, generation_config, checks, self.backends, base_files)
+        except Exception:
+            if self.router:
+                self.router.record('pro', time.perf_counter() - start, passed=False, failed=True)
+            raise
+        if self.router:
+            self.router.record('pro', time.perf_counter() - start, passed=score['all_passed'])
+        if tier == 'fast':
+            self.last_provider_used = f"{self.last_provider_used} (escalated)"
+        return files
     
     def generate_app(self, brief, checks, attachments=None, task_id=None):
         """
@@ -129,14 +264,24 @@ class LLMGenerator:
         Returns:
             dict with 'index.html' and 'README.md' content
         """
-        print(f"\n🤖 Generating code for task: {task_id}")
-        print(f"📝 Brief: {brief[:100]}...")
+        logger.info(f"🤖 Generating code for task: {task_id}")
+        logger.info(f"📝 Brief: {brief[:100]}...")
+        # Batch threads run many tasks; never report a previous task's provider
+        self.last_provider_used = None
         
         # Decode attachments if present
         attachment_info = self._process_attachments(attachments)
         
+        # Start from the closest prior success if one is similar enough
+        starting_code = None
+        if self.brief_cache:
+            similar, score = self.brief_cache.find_similar(brief, checks)
+            if similar:
+                logger.info(f"♻ Reusing app from similar brief ({similar.get('task_id')}, similarity {score:.2f})")
+                starting_code = similar['html']
+        
         # Build the prompt
-        prompt = self._build_prompt(brief, checks, attachment_info)
+        prompt = self._build_prompt(brief, checks, attachment_info, starting_code)
         
         # Generate code with configuration
         generation_config = {
@@ -146,16 +291,8 @@ class LLMGenerator:
             'max_output_tokens': 8192,
         }
         
-        response = self._generate_with_fallback(
-            prompt,
-            generation_config=generation_config
-        )
-        
-        # Extract text from response properly
-        response_text = self._extract_response_text(response)
-        
-        # Parse the response
-        generated_files = self._parse_response(response_text)
+        complexity = score_complexity(brief, checks, attachment_info)
+        generated_files = self._generate_files(prompt, generation_config, checks, complexity)
         
         # Add README
         generated_files['README.md'] = self._generate_readme(
@@ -165,9 +302,21 @@ class LLMGenerator:
         # Add LICENSE
         generated_files['LICENSE'] = self._generate_mit_license()
         
-        print(f"✓ Generated {len(generated_files)} files")
+        if Config.MINIFY_OUTPUT:
+            generated_files = html_postprocess.postprocess_files(generated_files)
+        
+        logger.info(f"✓ Generated {len(generated_files)} files")
         return generated_files
     
+    def remember_success(self, brief, checks, generated_files, task_id=None):
+        """Index a successfully deployed app so similar briefs can start from it"""
+        html = html_postprocess.source_html(generated_files)
+        if html:
+            # Keep split assets with the page so it works as a standalone starting point
+            html = response_parser.combined_html({**generated_files, 'index.html': html})
+        if self.brief_cache and html:
+            self.brief_cache.add(brief, checks, html, task_id)
+    
     def _process_attachments(self, attachments):
         """Process and decode attachments"""
         if not attachments:
@@ -178,6 +327,11 @@ class LLMGenerator:
             name = att.get('name', 'attachment')
             data_url = att.get('url', '')
             
+            # Already decoded into a spool while the request streamed in
+            if isinstance(data_url, SpooledDataUrl):
+                attachment_info.append(self._spooled_attachment_info(name, data_url))
+                continue
+            
             # Parse data URI
             if data_url.startswith('data:'):
                 try:
@@ -196,7 +350,7 @@ class LLMGenerator:
                         'preview': decoded[:100].decode('utf-8', errors='ignore') if mime_type.startswith('text') else None
                     })
                 except Exception as e:
-                    print(f"⚠ Warning: Could not decode attachment {name}: {e}")
+                    logger.warning(f"⚠ Warning: Could not decode attachment {name}: {e}")
                     attachment_info.append({
                         'name': name,
                         'data_url': data_url,
@@ -205,8 +359,32 @@ class LLMGenerator:
         
         return attachment_info
     
-    def _build_prompt(self, brief, checks, attachment_info):
-        """Build the prompt for Gemini"""
+    def _spooled_attachment_info(self, name, spool):
+        """Describe a streamed attachment without materialising its payload"""
+        if spool.error or not spool.is_data_url:
+            error = spool.error or 'Not a data URL'
+            logger.warning(f"⚠ Warning: Could not decode attachment {name}: {error}")
+            return {
+                'name': name,
+                'data_url': spool.prefix,
+                'error': error
+            }
+        
+        return {
+            'name': name,
+            'mime_type': spool.mime_type,
+            'size': spool.size,
+            'data_url': spool.prefix,  # Leading part only; full payload stays in the spool
+            'preview': spool.head(100).decode('utf-8', errors='ignore') if spool.mime_type.startswith('text') else None
+        }
+    
+    def _build_prompt(self, brief, checks, attachment_info, starting_code=None):
+        """
+        Build the prompt for Gemini
+        
+        With starting_code (a prior app for a near-identical brief), the
+        model is asked to adapt that code instead of starting from scratch
+        """
         
         attachment_section = ""
         if attachment_info:
@@ -217,91 +395,23 @@ class LLMGenerator:
                     attachment_section += f"  Preview: {att['preview'][:50]}...\n"
                 attachment_section += f"  Data URL available: {att['data_url'][:50]}...\n"
         
-        checks_section = "\n".join([f"- {check}" for check in checks])
-        
-        prompt = f"""You are an expert web developer. Generate a complete, production-ready single-page web application.
-
-**REQUIREMENTS:**
-{brief}
-
-**EVALUATION CHECKS (your code must pass these):**
-{checks_section}
-{attachment_section}
-
-**INSTRUCTIONS:**
-1. Generate a complete, working HTML file (index.html)
-2. Use Bootstrap 5 from CDN for styling
-3. Include all necessary JavaScript inline
-4. Handle attachments by embedding data URLs directly in the code
-5. Make sure all element IDs and checks are satisfied
-6. Use modern, clean, professional code
-7. Add proper error handling
-8. Include comments explaining key functionality
-9. Ensure the page is responsive and accessible
-
-**OUTPUT FORMAT:**
-Provide your response in this exact format:
-
-```html
-<!-- index.html -->
-[Your complete HTML code here]
-```
-
-Only provide the HTML code. Make it complete and ready to deploy.
-"""
-        
-        return prompt
+        multi_file = Config.MULTI_FILE_OUTPUT
+        if starting_code:
+            return prompt_templates.render_reuse_prompt(starting_code, brief, checks, attachment_section, multi_file)
+        return prompt_templates.render_generate_prompt(brief, checks, attachment_section, multi_file)
     
-    def _extract_response_text(self, response):
-        """
-        Extract text from Gemini response, handling both simple and complex responses
+    def _parse_response(self, response_text, require_index=True):
         """
-        try:
-            # Try simple text accessor first
-            return response.text
-        except:
-            # If that fails, extract from parts
-            if hasattr(response, 'parts'):
-                text_parts = []
-                for part in response.parts:
-                    if hasattr(part, 'text'):
-                        text_parts.append(part.text)
-                return ''.join(text_parts)
-            elif hasattr(response, 'candidates') and len(response.candidates) > 0:
-                candidate = response.candidates[0]
-                if hasattr(candidate.content, 'parts'):
-                    text_parts = []
-                    for part in candidate.content.parts:
-                        if hasattr(part, 'text'):
-                            text_parts.append(part.text)
-                    return ''.join(text_parts)
-            
-            # Fallback
-            return str(response)
-    
-    def _parse_response(self, response_text):
-        """Parse the LLM response to extract code files"""
-        files = {}
-        
-        # Extract HTML code from markdown code blocks
-        if '```html' in response_text:
-            # Find the HTML block
-            start = response_text.find('```html') + 7
-            end = response_text.find('```', start)
-            html_code = response_text[start:end].strip()
-            files['index.html'] = html_code
-        elif '```' in response_text:
-            # Try generic code block
-            start = response_text.find('```') + 3
-            # Skip language identifier if present
-            newline = response_text.find('\n', start)
-            end = response_text.find('```', newline)
-            html_code = response_text[newline:end].strip()
-            files['index.html'] = html_code
-        else:
-            # Use the whole response as HTML
-            files['index.html'] = response_text.strip()
+        Parse the LLM response to extract code files
         
+        Every named fenced block becomes a file (see response_parser);
+        a plain single-page answer becomes index.html as before.
+        """
+        files = response_parser.parse_files(response_text)
+        if require_index and not files.get('index.html'):
+            raise ValueError(f"Response has no index.html (files: {', '.join(files) or 'none'})")
+        if not files:
+            raise ValueError("Response contains no files")
         return files
     
     def _generate_readme(self, brief, checks, task_id, attachment_info):
@@ -313,101 +423,37 @@ Only provide the HTML code. Make it complete and ready to deploy.
             for att in attachment_info:
                 attachments_section += f"- `{att['name']}` - {att.get('mime_type', 'unknown type')}\n"
         
-        checks_list = "\n".join([f"- {check}" for check in checks])
-        
-        readme = f"""# {task_id or 'Web Application'}
-
-## Summary
-
-{brief}
-
-## Features
-
-This application was automatically generated to meet the following requirements:
-
-{checks_list}
-
-## Setup
-
-This is a static web application that requires no build process.
-
-### Local Development
-
-1. Clone this repository
-2. Open `index.html` in a web browser
-3. Or serve with a local server:
-   ```bash
-   python -m http.server 8000
-   ```
-{attachments_section}
-
-## Usage
-
-Simply open the `index.html` file in a modern web browser. The application includes:
-- Bootstrap 5 for responsive design
-- Inline JavaScript for functionality
-- Embedded data for attachments
-
-## Code Explanation
-
-### HTML Structure
-- Uses semantic HTML5 elements
-- Bootstrap components for UI
-- Responsive design that works on all devices
-
-### JavaScript Functionality
-- Handles user interactions
-- Processes data from attachments
-- Updates DOM elements dynamically
-- Includes error handling
-
-### Styling
-- Bootstrap 5 framework
-- Custom CSS for specific requirements
-- Mobile-first responsive design
-
-## Deployment
-
-This application is deployed on GitHub Pages and accessible at the URL provided in the repository settings.
-
-## License
-
-MIT License - See LICENSE file for details
-
-## Auto-Generated
-
-This application was automatically generated using AI-powered code generation.
-Generated on: {task_id}
-"""
-        
-        return readme
+        return prompt_templates.render_readme(brief, checks, task_id, attachments_section)
     
     def _generate_mit_license(self):
         """Generate MIT License text"""
-        return """MIT License
-
-Copyright (c) 2025
-
-Permission is hereby granted, free of charge, to any person obtaining a copy
-of this software and associated documentation files (the "Software"), to deal
-in the Software without restriction, including without limitation the rights
-to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
-copies of the Software, and to permit persons to whom the Software is
-furnished to do so, subject to the following conditions:
-
-The above copyright notice and this permission notice shall be included in all
-copies or substantial portions of the Software.
-
-THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
-IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
-FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
-AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
-LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
-OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
-SOFTWARE.
-"""
+        return prompt_templates.MIT_LICENSE
+    
+    def _build_update_prompt(self, existing_files, brief, checks, attachment_section):
+        """
+        Build the round 2 prompt for the current site files
+        
+        Returns:
+            (prompt, base files the answer is merged over, or None for a single-file rewrite)
+        """
+        if Config.MULTI_FILE_OUTPUT or len(existing_files) > 1:
+            prompt = prompt_templates.render_update_files_prompt(
+                existing_files, brief, checks, attachment_section
+            )
+            return prompt, existing_files
+        prompt = prompt_templates.render_update_prompt(
+            existing_files['index.html'], brief, checks, attachment_section
+        )
+        return prompt, None
+    
+    def warm_update_prefix(self, existing_files):
+        """Register the round 2 prompt prefix for these files with each first-choice backend's prompt cache"""
+        prompt, _ = self._build_update_prompt(existing_files, '', [], '')
+        for backend in self.backends + self.fast_backends:
+            if backend.weight > 0:
+                backend.provider.warm_prefix(prompt.prefix)
     
-    def update_app(self, existing_code, brief, checks, attachments=None):
+    def update_app(self, existing_code, brief, checks, attachments=None, attachment_info=None, existing_files=None):
         """
         Update an existing application based on new requirements
         
@@ -416,53 +462,28 @@ SOFTWARE.
             brief: New requirements or modifications needed
             checks: Updated evaluation criteria
             attachments: New attachments if any
+            attachment_info: Already-decoded attachments (skips decoding again)
+            existing_files: All current site files (index.html, app.js, ...);
+                for a multi-file app only the changed files are regenerated
         
         Returns:
-            dict with updated files
+            dict with updated files (for a multi-file app, only those that changed)
         """
-        print(f"\n🔄 Updating existing app")
-        print(f"📝 Update brief: {brief[:100]}...")
+        logger.info(f"🔄 Updating existing app")
+        logger.info(f"📝 Update brief: {brief[:100]}...")
+        self.last_provider_used = None
         
-        attachment_info = self._process_attachments(attachments)
+        if attachment_info is None:
+            attachment_info = self._process_attachments(attachments)
         attachment_section = ""
         if attachment_info:
             attachment_section = "\n\n**NEW ATTACHMENTS:**\n"
             for att in attachment_info:
                 attachment_section += f"- {att['name']}: {att['data_url'][:50]}...\n"
         
-        checks_section = "\n".join([f"- {check}" for check in checks])
-        
-        prompt = f"""You are updating an existing web application. Here is the current code:
-
-```html
-{existing_code}
-```
-
-**UPDATE REQUIREMENTS:**
-{brief}
-
-**NEW EVALUATION CHECKS (code must pass these):**
-{checks_section}
-{attachment_section}
-
-**INSTRUCTIONS:**
-1. Modify the existing code to meet the new requirements
-2. Keep all existing functionality that still applies
-3. Add new features as specified
-4. Ensure all new checks pass
-5. Maintain code quality and comments
-6. Keep using Bootstrap 5 and inline JavaScript
-
-**OUTPUT FORMAT:**
-Provide the complete updated HTML:
-
-```html
-<!-- index.html -->
-[Your updated HTML code here]
-```
-
-Provide only the complete, updated HTML code.
-"""
+        prompt, base_files = self._build_update_prompt(
+            existing_files or {'index.html': existing_code}, brief, checks, attachment_section
+        )
         
         generation_config = {
             'temperature': 0.7,
@@ -471,12 +492,11 @@ Provide only the complete, updated HTML code.
             'max_output_tokens': 8192,
         }
         
-        response = self._generate_with_fallback(
-            prompt,
-            generation_config=generation_config
-        )
-        response_text = self._extract_response_text(response)
-        updated_files = self._parse_response(response_text)
+        complexity = score_complexity(brief, checks, attachment_info, is_update=True)
+        updated_files = self._generate_files(prompt, generation_config, checks, complexity, base_files)
+        
+        if Config.MINIFY_OUTPUT:
+            updated_files = html_postprocess.postprocess_files(updated_files)
         
-        print(f"✓ Updated {len(updated_files)} files")
+        logger.info(f"✓ Updated {len(updated_files)} files")
         return updated_files
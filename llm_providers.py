@@ -0,0 +1,289 @@
+"""
+LLM Provider Interface
+Common interface for LLM backends, returning compact immutable results
+"""
+from dataclasses import dataclass, replace
+from datetime import timedelta
+from config import Config
+from prompt_cache import estimate_tokens
+import prompt_cache
+import accounting
+import cassette
+import time
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class TokenUsage:
+    """Token counts reported by the provider (None when not reported)"""
+    input_tokens: int | None = None
+    output_tokens: int | None = None
+    cached_tokens: int | None = None  # Input tokens served from a prompt cache
+    estimated: bool = False  # Counts estimated locally because the provider reported none
+
+
+@dataclass(frozen=True, slots=True)
+class Prompt:
+    """A prompt split into a stable, cacheable prefix and a per-request suffix"""
+    prefix: str
+    suffix: str
+
+    def __str__(self):
+        return self.prefix + self.suffix
+
+
+@dataclass(frozen=True, slots=True)
+class LLMResult:
+    """Result of a single generation call"""
+    text: str
+    provider: str
+    model: str
+    latency: float
+    usage: TokenUsage = TokenUsage()
+
+
+class LLMProvider:
+    """
+    Base class for LLM backends
+
+    Subclasses implement _generate(prompt, generation_config) and return
+    (text, TokenUsage); generate() adds timing and wraps it in an LLMResult.
+    """
+
+    name = 'base'
+    # Error substrings that allow falling back to the next backend (None = any error)
+    fallback_keywords = None
+
+    def __init__(self, model, name=None):
+        self.model = model
+        if name:
+            self.name = name
+
+    def warm_prefix(self, prefix):
+        """Prepare a provider-side cache for a prompt prefix (no-op unless supported)"""
+
+    def should_fall_back(self, error):
+        """Whether a failure from this backend should be retried on the next one"""
+        if self.fallback_keywords is None:
+            return True
+        return any(keyword in str(error).lower() for keyword in self.fallback_keywords)
+
+    def generate(self, prompt, generation_config=None):
+        """
+        Generate a completion for the prompt
+
+        Args:
+            prompt: The prompt text
+            generation_config: Optional dict with temperature, top_p,
+                top_k and max_output_tokens (Gemini naming)
+
+        Returns:
+            LLMResult
+        """
+        generation_config = generation_config or {}
+        start = time.perf_counter()
+        if cassette.active is not None:
+            text, usage = cassette.active.call_llm(
+                self, str(prompt), generation_config,
+                lambda: self._generate_prompt(prompt, generation_config)
+            )
+        else:
+            text, usage = self._generate_prompt(prompt, generation_config)
+        if usage.input_tokens is None and usage.output_tokens is None:
+            usage = replace(
+                usage,
+                input_tokens=estimate_tokens(str(prompt)),
+                output_tokens=estimate_tokens(text),
+                estimated=True
+            )
+        result = LLMResult(
+            text=text,
+            provider=self.name,
+            model=self.model,
+            latency=round(time.perf_counter() - start, 3),
+            usage=usage
+        )
+        accounting.record_llm(result)
+        return result
+
+    def _generate_prompt(self, prompt, generation_config):
+        """Send a plain string as-is; route a Prompt through prefix caching"""
+        registry = prompt_cache.registry
+        if not isinstance(prompt, Prompt) or not prompt.prefix or not registry.enabled:
+            return self._generate(str(prompt), generation_config)
+
+        if registry.emulate:
+            # Local stand-in: same key/TTL semantics, no provider API involved
+            _, hit = registry.get_or_create(registry.key(self, prompt.prefix), lambda: 'emulated')
+            text, usage = self._generate(str(prompt), generation_config)
+            return text, replace(usage, cached_tokens=estimate_tokens(prompt.prefix) if hit else 0)
+
+        return self._generate_with_prefix(prompt.prefix, prompt.suffix, generation_config)
+
+    def _generate_with_prefix(self, prefix, suffix, generation_config):
+        """Providers with prompt caching override this; by default send the whole prompt"""
+        return self._generate(prefix + suffix, generation_config)
+
+    def _generate(self, prompt, generation_config):
+        raise NotImplementedError
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini via the google-generativeai SDK"""
+
+    name = 'Gemini'
+    # Only quota/timeout errors are worth retrying on another backend
+    fallback_keywords = ['quota', 'timeout', '429', '504', 'exceeded']
+
+    def __init__(self, model='gemini-2.5-pro', name=None):
+        import google.generativeai as genai
+        super().__init__(model, name)
+        self.client = genai.GenerativeModel(model)
+        self._cached_clients = {}  # Cached content name -> GenerativeModel bound to it
+
+    def _generate(self, prompt, generation_config):
+        return self._call(self.client, prompt, generation_config)
+
+    def _call(self, client, contents, generation_config):
+        if generation_config:
+            response = client.generate_content(contents, generation_config=generation_config)
+        else:
+            response = client.generate_content(contents)
+
+        metadata = getattr(response, 'usage_metadata', None)
+        usage = TokenUsage(
+            input_tokens=getattr(metadata, 'prompt_token_count', None),
+            output_tokens=getattr(metadata, 'candidates_token_count', None),
+            cached_tokens=getattr(metadata, 'cached_content_token_count', None)
+        )
+        return self._response_text(response), usage
+
+    def _generate_with_prefix(self, prefix, suffix, generation_config):
+        # Explicit caches below the model's minimum size are rejected by the API
+        if estimate_tokens(prefix) < Config.PROMPT_CACHE_MIN_TOKENS:
+            return self._generate(prefix + suffix, generation_config)
+
+        client = self._cached_client(prefix)
+        if client is None:
+            return self._generate(prefix + suffix, generation_config)
+        try:
+            return self._call(client, suffix, generation_config)
+        except Exception as e:
+            if 'cache' not in str(e).lower():
+                raise
+            # Cache expired or was deleted early; the next call recreates it
+            logger.warning(f"⚠ Gemini cached content unusable, sending full prompt: {e}")
+            self._cached_clients.clear()
+            prompt_cache.registry.invalidate(prompt_cache.registry.key(self, prefix))
+            return self._generate(prefix + suffix, generation_config)
+
+    def warm_prefix(self, prefix):
+        """Create (or refresh) the cached content for a prefix ahead of use"""
+        if prompt_cache.registry.enabled and not prompt_cache.registry.emulate \
+                and estimate_tokens(prefix) >= Config.PROMPT_CACHE_MIN_TOKENS:
+            self._cached_client(prefix)
+
+    def _cached_client(self, prefix):
+        """GenerativeModel bound to the cached content for this prefix, or None"""
+        import google.generativeai as genai
+        registry = prompt_cache.registry
+
+        def create():
+            from google.generativeai import caching
+            cached = caching.CachedContent.create(
+                model=self.model,
+                contents=[prefix],
+                ttl=timedelta(seconds=registry.ttl)
+            )
+            logger.info(f"✓ Created Gemini context cache ({estimate_tokens(prefix)} tokens est.)")
+            return cached.name
+
+        name, _ = registry.get_or_create(registry.key(self, prefix), create)
+        if name is None:
+            return None
+        client = self._cached_clients.get(name)
+        if client is None:
+            client = genai.GenerativeModel.from_cached_content(name)
+            self._cached_clients[name] = client
+        return client
+
+    @staticmethod
+    def _response_text(response):
+        """Extract text, handling both simple and multi-part responses"""
+        try:
+            # Try simple text accessor first
+            return response.text
+        except Exception:
+            # If that fails, join the text parts of the first candidate
+            parts = getattr(response, 'parts', None)
+            if not parts and getattr(response, 'candidates', None):
+                parts = getattr(response.candidates[0].content, 'parts', [])
+            return ''.join(getattr(part, 'text', '') for part in parts or [])
+
+
+class OpenAICompatibleProvider(LLMProvider):
+    """
+    Any OpenAI-compatible chat completions endpoint
+
+    Works with OpenRouter-style proxies as well as local inference
+    servers such as llama.cpp (llama-server), vLLM or Ollama.
+    """
+
+    name = 'OpenAI-compatible'
+    # Mark the prompt prefix with cache_control breakpoints (OpenRouter/Anthropic style)
+    cache_control = False
+
+    def __init__(self, model, base_url, api_key=None, name=None, timeout=120):
+        import requests
+        super().__init__(model, name)
+        self.api_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json"}
+        if api_key:
+            self.headers["Authorization"] = f"Bearer {api_key}"
+        # Reuse connections across calls (and across batch worker threads)
+        self.session = requests.Session()
+
+    def _generate_with_prefix(self, prefix, suffix, generation_config):
+        if not self.cache_control:
+            # OpenAI-style servers cache identical prefixes automatically
+            return self._generate(prefix + suffix, generation_config)
+        content = [
+            {"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}},
+            {"type": "text", "text": suffix}
+        ]
+        return self._generate(content, generation_config)
+
+    def _generate(self, prompt, generation_config):
+        payload = {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": generation_config.get('temperature', 0.7),
+            "max_tokens": generation_config.get('max_output_tokens', 8192)
+        }
+
+        response = self.session.post(
+            f"{self.api_url}/chat/completions",
+            json=payload,
+            headers=self.headers,
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        result = response.json()
+
+        # Keep only what we need from the OpenAI-style response
+        choices = result.get('choices') or [{}]
+        text = (choices[0].get('message') or {}).get('content') or ""
+        usage = result.get('usage') or {}
+        return text, TokenUsage(
+            input_tokens=usage.get('prompt_tokens'),
+            output_tokens=usage.get('completion_tokens'),
+            cached_tokens=(usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+        )
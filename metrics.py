@@ -0,0 +1,45 @@
+"""
+Pipeline Metrics
+Per-request stage timing for the round 1 / round 2 pipelines
+"""
+from contextlib import contextmanager
+import structured_logging
+import time
+import tracemalloc
+
+# Allocation sites reported per stage while memory tracing is on
+TOP_ALLOCATIONS = 5
+
+
+class StageTimer:
+    """Records wall-clock duration (and, while tracemalloc runs, memory growth) of each named pipeline stage"""
+
+    def __init__(self):
+        self.timings = {}
+        self.memory = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage `name` (seconds, ms precision), tagging its log records"""
+        before = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+        start = time.perf_counter()
+        try:
+            with structured_logging.bind(stage=name):
+                yield
+        finally:
+            self.timings[name] = round(time.perf_counter() - start, 3)
+            if before is not None and tracemalloc.is_tracing():
+                self._record_memory(name, before)
+
+    def _record_memory(self, name, before):
+        # Heap-wide diff: allocations by concurrent requests are included too
+        stats = tracemalloc.take_snapshot().compare_to(before, 'lineno')
+        self.memory[name] = {
+            'size_diff': sum(stat.size_diff for stat in stats),
+            'top': [f"{stat.traceback} {stat.size_diff:+d}B" for stat in stats[:TOP_ALLOCATIONS]]
+        }
+
+    def summary(self):
+        """Stage timings plus the total elapsed time so far"""
+        return {**self.timings, 'total': round(time.perf_counter() - self._start, 3)}
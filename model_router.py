@@ -0,0 +1,82 @@
+"""
+Adaptive Model Router
+Scores each brief's complexity locally and routes simple tasks to a fast
+model tier, escalating to the pro tier when needed
+"""
+from config import Config
+import re
+import threading
+
+# Brief features that usually need more than a fast model
+COMPLEX_KEYWORDS = [
+    'chart', 'api', 'fetch', 'github', 'canvas', 'drag', 'markdown',
+    'sort', 'filter', 'localstorage', 'svg', 'animation', 'parse', 'regex'
+]
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+
+def score_complexity(brief, checks, attachment_info=None, is_update=False):
+    """
+    Estimate how hard a brief is to get right in one shot
+
+    Returns:
+        float, roughly 0 (trivial) to 10 (hard)
+    """
+    lowered = (brief or '').lower()
+    score = len(_WORD_PATTERN.findall(lowered)) / 60
+    score += 0.4 * len(checks or [])
+
+    for att in attachment_info or []:
+        mime_type = att.get('mime_type') or ''
+        score += 0.75 if mime_type.startswith('text') or mime_type.endswith('json') else 1.0
+
+    score += min(2.0, 0.5 * sum(1 for keyword in COMPLEX_KEYWORDS if keyword in lowered))
+
+    if is_update:
+        # Edits to existing code must preserve behaviour the model can't see tested
+        score += 1.5
+
+    return round(score, 2)
+
+
+class ModelRouter:
+    """Chooses a model tier per request and keeps per-tier statistics"""
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold if threshold is not None else Config.ROUTING_COMPLEXITY_THRESHOLD
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def choose_tier(self, complexity):
+        """'fast' for briefs under the threshold, otherwise 'pro'"""
+        return 'fast' if complexity < self.threshold else 'pro'
+
+    def record(self, tier, latency, passed, escalated=False, failed=False):
+        """Record the outcome of one generation on a tier"""
+        with self._lock:
+            stats = self._stats.setdefault(tier, {
+                'requests': 0,
+                'passed_validation': 0,
+                'escalated': 0,
+                'failed': 0,
+                'total_latency': 0.0
+            })
+            stats['requests'] += 1
+            stats['total_latency'] += latency
+            if passed:
+                stats['passed_validation'] += 1
+            if escalated:
+                stats['escalated'] += 1
+            if failed:
+                stats['failed'] += 1
+
+    def stats(self):
+        """Per-tier counts, success rate and mean latency"""
+        with self._lock:
+            snapshot = {tier: dict(stats) for tier, stats in self._stats.items()}
+        for stats in snapshot.values():
+            requests = stats['requests'] or 1
+            stats['success_rate'] = round(stats['passed_validation'] / requests, 3)
+            stats['avg_latency'] = round(stats.pop('total_latency') / requests, 3)
+        return snapshot
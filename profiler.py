@@ -0,0 +1,159 @@
+"""
+Live Profiling
+On-demand sampling CPU profiler and tracemalloc memory tracing for a
+running worker process
+
+The sampler walks sys._current_frames() on a background thread and
+aggregates stacks in the folded format used by flamegraph.pl and
+speedscope ("frame;frame;frame count"). Nothing is installed in the
+request path, so overhead is only the sampling thread while it runs.
+"""
+from collections import Counter, deque
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# Stage memory diffs kept for /admin/memory/snapshot
+RECENT_STAGE_MEMORY = 50
+
+# Sampling faster than this mostly profiles the sampler itself
+MIN_INTERVAL = 0.001
+
+# Upper bounds for /admin/memory/* query parameters
+MAX_TRACE_FRAMES = 64
+MAX_SNAPSHOT_LIMIT = 500
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+
+class SamplingProfiler:
+    """Periodically samples every thread's stack into folded-stack counts"""
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.samples = 0
+        self.interval = None
+        self.started = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.005, duration=60):
+        """
+        Start sampling in the background
+
+        Args:
+            interval: Seconds between samples
+            duration: Stop automatically after this many seconds
+
+        Returns:
+            bool: False if a profile is already running
+        """
+        with self._lock:
+            if self.running:
+                return False
+            self.stacks = Counter()
+            self.samples = 0
+            self.interval = interval
+            self.started = time.time()
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, args=(interval, duration), name='sampling-profiler', daemon=True
+            )
+            self._thread.start()
+            return True
+
+    def _run(self, interval, duration):
+        own_id = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + duration
+        while not self._stop.wait(interval) and time.monotonic() < deadline:
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        """
+        Stop sampling
+
+        Returns:
+            str: folded stacks, one "stack count" line each, hottest first
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        return self.folded()
+
+    def folded(self):
+        return '\n'.join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + '\n'
+
+
+class MemoryTracer:
+    """tracemalloc snapshots diffed against the previous snapshot"""
+
+    def __init__(self):
+        self._last = None
+        self.stage_memory = deque(maxlen=RECENT_STAGE_MEMORY)
+        self._lock = threading.Lock()
+
+    def start(self, frames=10):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        with self._lock:
+            self._last = tracemalloc.take_snapshot()
+
+    def stop(self):
+        tracemalloc.stop()
+        with self._lock:
+            self._last = None
+            self.stage_memory.clear()
+
+    def snapshot(self, limit=25):
+        """
+        Diff the heap against the previous snapshot
+
+        Returns:
+            dict with current/peak traced bytes and the top growing allocation sites
+        """
+        if not tracemalloc.is_tracing():
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        with self._lock:
+            previous, self._last = self._last, snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        top = snapshot.compare_to(previous, 'lineno')[:limit] if previous else []
+        return {
+            'current_bytes': current,
+            'peak_bytes': peak,
+            'top_growth': [
+                {'site': str(stat.traceback), 'size_diff': stat.size_diff, 'size': stat.size, 'count_diff': stat.count_diff}
+                for stat in top
+            ],
+            'stages': list(self.stage_memory)
+        }
+
+    def record_stages(self, task_id, round_num, memory):
+        """Keep the per-stage diffs from one pipeline run"""
+        self.stage_memory.append({'task': task_id, 'round': round_num, 'stages': memory})
+
+
+cpu = SamplingProfiler()
+memory = MemoryTracer()
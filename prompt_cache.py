@@ -0,0 +1,127 @@
+"""
+Prompt Prefix Cache
+Tracks provider-side cached prompt prefixes (e.g. Gemini cached content)
+so repeated instruction blocks and round 2 code are sent only once
+
+Handles live in the shared state store, so a cache created by one worker
+process is reused by the others until it expires. With emulate=True no
+provider caching API is called; hits are simulated and reported as
+cached tokens, which lets the cache be exercised locally or on replay.
+"""
+from config import Config
+import shared_state
+import hashlib
+import threading
+import time
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
+
+# Retry creating a cache for a prefix that failed (e.g. below the provider's minimum) after this long
+NEGATIVE_TTL = 300
+
+# Stop using a handle this many seconds before the provider expires it
+EXPIRY_MARGIN = 30
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token)"""
+    return len(text) // 4
+
+
+class PromptCache:
+    """Registry of cached prompt prefixes per provider and model"""
+
+    NAMESPACE = 'prompt_cache'
+
+    def __init__(self, store=None, ttl=None, enabled=None, emulate=None, max_entries=1000):
+        self.store = store or shared_state.store
+        self.ttl = ttl or Config.PROMPT_CACHE_TTL
+        self.enabled = Config.PROMPT_CACHE_ENABLED if enabled is None else enabled
+        self.emulate = Config.PROMPT_CACHE_EMULATE if emulate is None else emulate
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    @staticmethod
+    def key(provider, prefix):
+        """Cache key for a prefix on one provider/model"""
+        digest = hashlib.sha256(f"{provider.name}|{provider.model}|".encode('utf-8'))
+        digest.update(prefix.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _lookup(self, key):
+        try:
+            entry = self.store.get(self.NAMESPACE, key)
+        except Exception as e:
+            logger.warning(f"⚠ Warning: Could not read prompt cache: {e}")
+            return None
+        if entry and entry['expires'] > time.time():
+            return entry
+        return None
+
+    def get_or_create(self, key, create):
+        """
+        Return the live handle for a prefix, creating it at most once at a time
+
+        Args:
+            key: From PromptCache.key()
+            create: Zero-argument function creating the provider cache and
+                returning a JSON-serialisable handle (e.g. a cache name)
+
+        Returns:
+            (handle or None if caching isn't possible, whether it was a hit)
+        """
+        entry = self._lookup(key)
+        if entry:
+            if entry['handle'] is not None:
+                self.hits += 1
+            return entry['handle'], entry['handle'] is not None
+
+        with self._guard:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            # Another thread may have created it while we waited
+            entry = self._lookup(key)
+            if entry:
+                if entry['handle'] is not None:
+                    self.hits += 1
+                return entry['handle'], entry['handle'] is not None
+
+            self.misses += 1
+            try:
+                handle = create()
+                expires = time.time() + self.ttl - EXPIRY_MARGIN
+            except Exception as e:
+                logger.warning(f"⚠ Prompt caching unavailable, sending full prompt: {e}")
+                handle, expires = None, time.time() + NEGATIVE_TTL
+            try:
+                self.store.set(self.NAMESPACE, key, {'handle': handle, 'expires': expires})
+                self.store.trim(self.NAMESPACE, self.max_entries)
+            except Exception as e:
+                logger.warning(f"⚠ Warning: Could not save prompt cache entry: {e}")
+            return handle, False
+
+    def invalidate(self, key):
+        """Forget a handle the provider no longer honours"""
+        try:
+            self.store.delete(self.NAMESPACE, key)
+        except Exception as e:
+            logger.warning(f"⚠ Warning: Could not update prompt cache: {e}")
+
+    def stats(self):
+        """Hit and miss counts for this process"""
+        total = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'emulated': self.emulate,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else None
+        }
+
+
+# Process-wide registry used by the LLM providers
+registry = PromptCache()
@@ -0,0 +1,321 @@
+"""
+Prompt and Static File Templates
+Immutable template parts are compiled once at import time; only the
+per-request sections are substituted on each call
+"""
+from llm_providers import Prompt
+from string import Template
+import os
+
+# Prompts are split into a stable prefix (instructions, plus the code being
+# edited) and a per-request suffix, so providers can cache the prefix
+
+# Rules and output formats that differ between single-file pages and split assets
+INLINE_SCRIPT_RULE = "Include all necessary JavaScript inline"
+
+SPLIT_ASSETS_RULE = "Put the JavaScript in app.js and any custom CSS in styles.css, linked from index.html with relative paths; put larger static data in its own file (e.g. data.json)"
+
+SINGLE_FILE_FORMAT = """Provide your response in this exact format:
+
+```html
+<!-- index.html -->
+[Your complete HTML code here]
+```
+
+Only provide the HTML code. Make it complete and ready to deploy."""
+
+MULTI_FILE_FORMAT = """Provide each file as its own fenced code block, with the language and the file name on the opening fence:
+
+```html index.html
+[Your complete HTML code here]
+```
+
+```javascript app.js
+[Your complete JavaScript here]
+```
+
+```css styles.css
+[Your complete CSS here]
+```
+
+Only provide the code blocks. Every file must be complete and ready to deploy."""
+
+UPDATE_SINGLE_FILE_FORMAT = """Provide the complete updated HTML:
+
+```html
+<!-- index.html -->
+[Your updated HTML code here]
+```
+
+Provide only the complete, updated HTML code."""
+
+UPDATE_MULTI_FILE_FORMAT = """Provide only the files that need to change, each one complete, as its own fenced code block with the language and the file name on the opening fence:
+
+```javascript app.js
+[The complete updated file here]
+```
+
+Leave out files that stay the same; they are kept as they are. New files use the same format."""
+
+GENERATE = Template("""You are an expert web developer. Generate a complete, production-ready single-page web application for the requirements given at the end of this prompt.
+
+**INSTRUCTIONS:**
+1. Generate a complete, working HTML file (index.html)
+2. Use Bootstrap 5 from CDN for styling
+3. $script_rule
+4. Handle attachments by embedding data URLs directly in the code
+5. Make sure all element IDs and checks are satisfied
+6. Use modern, clean, professional code
+7. Add proper error handling
+8. Include comments explaining key functionality
+9. Ensure the page is responsive and accessible
+
+**OUTPUT FORMAT:**
+$output_format
+""")
+
+UPDATE = Template("""You are updating an existing web application. The current code is below, followed by the update requirements.
+
+**INSTRUCTIONS:**
+1. Modify the existing code to meet the new requirements
+2. Keep all existing functionality that still applies
+3. Add new features as specified
+4. Ensure all new checks pass
+5. Maintain code quality and comments
+6. $layout_rule
+
+**OUTPUT FORMAT:**
+$output_format
+
+**CURRENT CODE:**
+""")
+
+REUSE = Template("""You are an expert web developer. Below is a working single-page application that was built for a very similar brief. Use it as your starting point and adapt it to the requirements given at the end of this prompt. Change ids, titles, text and data as required; reuse structure and logic that still applies.
+
+**INSTRUCTIONS:**
+1. Generate a complete, working HTML file (index.html)
+2. Use Bootstrap 5 from CDN for styling
+3. $script_rule
+4. Handle attachments by embedding data URLs directly in the code
+5. Make sure all element IDs and checks are satisfied
+6. Remove anything from the starting code that this brief does not ask for
+
+**OUTPUT FORMAT:**
+$output_format
+
+**STARTING CODE:**
+""")
+
+GENERATE_INSTRUCTIONS = GENERATE.substitute(script_rule=INLINE_SCRIPT_RULE, output_format=SINGLE_FILE_FORMAT)
+UPDATE_INSTRUCTIONS = UPDATE.substitute(
+    layout_rule="Keep using Bootstrap 5 and inline JavaScript", output_format=UPDATE_SINGLE_FILE_FORMAT
+)
+REUSE_INSTRUCTIONS = REUSE.substitute(script_rule=INLINE_SCRIPT_RULE, output_format=SINGLE_FILE_FORMAT)
+
+MULTI_FILE_GENERATE_INSTRUCTIONS = GENERATE.substitute(script_rule=SPLIT_ASSETS_RULE, output_format=MULTI_FILE_FORMAT)
+MULTI_FILE_UPDATE_INSTRUCTIONS = UPDATE.substitute(
+    layout_rule="Keep using Bootstrap 5 and the existing file layout", output_format=UPDATE_MULTI_FILE_FORMAT
+)
+MULTI_FILE_REUSE_INSTRUCTIONS = REUSE.substitute(script_rule=SPLIT_ASSETS_RULE, output_format=MULTI_FILE_FORMAT)
+
+CODE_BLOCK = Template("""
+```html
+$code
+```
+""")
+
+# Named block for one file of a multi-file app (same format the model answers in)
+FILE_BLOCK = Template("""
+```$language $name
+$code
+```
+""")
+
+# Fence languages by extension for FILE_BLOCK
+FILE_LANGUAGES = {'.html': 'html', '.css': 'css', '.js': 'javascript', '.mjs': 'javascript', '.json': 'json', '.svg': 'svg', '.md': 'markdown'}
+
+REQUEST = Template("""
+**REQUIREMENTS:**
+$brief
+
+**EVALUATION CHECKS (your code must pass these):**
+$checks_section
+$attachment_section
+""")
+
+UPDATE_REQUEST = Template("""
+**UPDATE REQUIREMENTS:**
+$brief
+
+**NEW EVALUATION CHECKS (code must pass these):**
+$checks_section
+$attachment_section
+""")
+
+README_HEADER = Template("""# $title
+
+## Summary
+
+$brief
+
+## Features
+
+This application was automatically generated to meet the following requirements:
+
+$checks_list
+""")
+
+# Static README sections on either side of the per-request attachment list
+README_SETUP = """
+## Setup
+
+This is a static web application that requires no build process.
+
+### Local Development
+
+1. Clone this repository
+2. Open `index.html` in a web browser
+3. Or serve with a local server:
+   ```bash
+   python -m http.server 8000
+   ```
+"""
+
+README_BODY = """
+
+## Usage
+
+Simply open the `index.html` file in a modern web browser. The application includes:
+- Bootstrap 5 for responsive design
+- Inline JavaScript for functionality
+- Embedded data for attachments
+
+## Code Explanation
+
+### HTML Structure
+- Uses semantic HTML5 elements
+- Bootstrap components for UI
+- Responsive design that works on all devices
+
+### JavaScript Functionality
+- Handles user interactions
+- Processes data from attachments
+- Updates DOM elements dynamically
+- Includes error handling
+
+### Styling
+- Bootstrap 5 framework
+- Custom CSS for specific requirements
+- Mobile-first responsive design
+
+## Deployment
+
+This application is deployed on GitHub Pages and accessible at the URL provided in the repository settings.
+
+## License
+
+MIT License - See LICENSE file for details
+
+## Auto-Generated
+
+This application was automatically generated using AI-powered code generation.
+"""
+
+MIT_LICENSE = """MIT License
+
+Copyright (c) 2025
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+
+def bullet_list(items):
+    """Render a list of strings as markdown bullets"""
+    return "\n".join(f"- {item}" for item in items or [])
+
+
+def _request(template, brief, checks, attachment_section):
+    return template.substitute(
+        brief=brief,
+        checks_section=bullet_list(checks),
+        attachment_section=attachment_section
+    )
+
+
+def code_prefix(instructions, code):
+    """Stable prompt prefix: fixed instructions followed by the code to work from"""
+    return instructions + CODE_BLOCK.substitute(code=code)
+
+
+def files_prefix(instructions, files):
+    """Stable prompt prefix: fixed instructions followed by every file of the app, as named blocks"""
+    return instructions + "".join(
+        FILE_BLOCK.substitute(
+            language=FILE_LANGUAGES.get(os.path.splitext(name)[1].lower(), ''),
+            name=name,
+            code=code.rstrip('\n')
+        )
+        for name, code in files.items()
+    )
+
+
+def render_generate_prompt(brief, checks, attachment_section, multi_file=False):
+    """Render the round 1 generation prompt"""
+    instructions = MULTI_FILE_GENERATE_INSTRUCTIONS if multi_file else GENERATE_INSTRUCTIONS
+    return Prompt(instructions, _request(REQUEST, brief, checks, attachment_section))
+
+
+def render_update_prompt(existing_code, brief, checks, attachment_section):
+    """Render the round 2 update prompt; the existing code is part of the cacheable prefix"""
+    return Prompt(
+        code_prefix(UPDATE_INSTRUCTIONS, existing_code),
+        _request(UPDATE_REQUEST, brief, checks, attachment_section)
+    )
+
+
+def render_update_files_prompt(existing_files, brief, checks, attachment_section):
+    """Render the round 2 update prompt for a multi-file app; the model answers with changed files only"""
+    return Prompt(
+        files_prefix(MULTI_FILE_UPDATE_INSTRUCTIONS, existing_files),
+        _request(UPDATE_REQUEST, brief, checks, attachment_section)
+    )
+
+
+def render_reuse_prompt(starting_code, brief, checks, attachment_section, multi_file=False):
+    """Render the generation prompt seeded with a prior similar app"""
+    instructions = MULTI_FILE_REUSE_INSTRUCTIONS if multi_file else REUSE_INSTRUCTIONS
+    return Prompt(
+        code_prefix(instructions, starting_code),
+        _request(REQUEST, brief, checks, attachment_section)
+    )
+
+
+def render_readme(brief, checks, task_id, attachments_section):
+    """Render README.md around the cached static sections"""
+    return "".join((
+        README_HEADER.substitute(
+            title=task_id or 'Web Application',
+            brief=brief,
+            checks_list=bullet_list(checks)
+        ),
+        README_SETUP,
+        attachments_section,
+        README_BODY,
+        f"Generated on: {task_id}\n"
+    ))
@@ -0,0 +1,135 @@
+"""
+LLM Provider Registry
+Builds the ordered list of LLM backends from configuration
+
+LLM_BACKENDS is a comma-separated list of `kind[:model][@weight]`
+entries, in fallback order, e.g.
+
+    LLM_BACKENDS=local:qwen2.5-coder-7b@3,gemini:gemini-2.5-pro@1,aipipe@0
+
+Weights decide how often each backend is tried first; a weight of 0
+makes a backend fallback-only. When LLM_BACKENDS is not set, the list
+is derived from GEMINI_API_KEY / AIPIPE_TOKEN / USE_AIPIPE as before.
+"""
+from config import Config
+from dataclasses import dataclass
+import random
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class Backend:
+    """A configured provider and its routing weight"""
+    key: str
+    provider: object
+    weight: float
+
+
+def _make_gemini(model):
+    from llm_providers import GeminiProvider
+    return GeminiProvider(model or Config.GEMINI_MODEL)
+
+
+def _make_aipipe(model):
+    from aipipe_generator import AIpipeGenerator
+    return AIpipeGenerator(model or Config.AIPIPE_MODEL)
+
+
+def _make_local(model):
+    from llm_providers import OpenAICompatibleProvider
+    return OpenAICompatibleProvider(
+        model=model or Config.LOCAL_LLM_MODEL,
+        base_url=Config.LOCAL_LLM_BASE_URL,
+        api_key=Config.LOCAL_LLM_API_KEY,
+        name='Local',
+        timeout=Config.LOCAL_LLM_TIMEOUT
+    )
+
+
+# Backend kind -> (factory, is it configured?)
+PROVIDER_FACTORIES = {
+    'gemini': (_make_gemini, lambda: bool(Config.GEMINI_API_KEY)),
+    'aipipe': (_make_aipipe, lambda: bool(Config.AIPIPE_TOKEN)),
+    'local': (_make_local, lambda: bool(Config.LOCAL_LLM_BASE_URL)),
+}
+
+
+def parse_backend_spec(spec):
+    """
+    Parse an LLM_BACKENDS string
+
+    Returns:
+        list of (kind, model or None, weight) tuples
+    """
+    entries = []
+    for raw in spec.split(','):
+        raw = raw.strip()
+        if not raw:
+            continue
+        weight = 1.0
+        if '@' in raw:
+            raw, weight_text = raw.rsplit('@', 1)
+            try:
+                weight = float(weight_text)
+            except ValueError:
+                raise ValueError(f"Invalid weight in LLM_BACKENDS entry: {raw}@{weight_text}")
+        kind, _, model = raw.partition(':')
+        kind = kind.strip().lower()
+        if kind not in PROVIDER_FACTORIES:
+            raise ValueError(f"Unknown LLM backend '{kind}' (expected one of {', '.join(PROVIDER_FACTORIES)})")
+        entries.append((kind, model.strip() or None, max(0.0, weight)))
+    return entries
+
+
+def default_backend_spec():
+    """Backend list equivalent to the legacy Gemini/AIpipe/local server settings"""
+    entries = []
+    if Config.GEMINI_API_KEY:
+        entries.append(('gemini', None, 1.0))
+    if Config.AIPIPE_TOKEN:
+        if Config.USE_AIPIPE or not entries:
+            entries.insert(0, ('aipipe', None, 1.0))
+            entries[1:] = [(kind, model, 0.0) for kind, model, _ in entries[1:]]
+        else:
+            entries.append(('aipipe', None, 0.0))
+    if Config.LOCAL_LLM_BASE_URL:
+        # Primary when it's the only backend, otherwise a last-resort fallback
+        entries.append(('local', None, 0.0 if entries else 1.0))
+    return entries
+
+
+def build_backends(spec=None):
+    """
+    Instantiate the configured backends, skipping ones without credentials
+
+    Returns:
+        list of Backend in fallback order
+    """
+    spec = Config.LLM_BACKENDS if spec is None else spec
+    entries = parse_backend_spec(spec) if spec else default_backend_spec()
+
+    backends = []
+    for kind, model, weight in entries:
+        factory, configured = PROVIDER_FACTORIES[kind]
+        if not configured():
+            logger.warning(f"⚠ Skipping LLM backend '{kind}': not configured")
+            continue
+        # Unique key per entry so the same kind can appear with different models
+        key = kind if all(b.key != kind for b in backends) else f"{kind}-{len(backends)}"
+        backends.append(Backend(key=key, provider=factory(model), weight=weight))
+    return backends
+
+
+def order_backends(backends, rng=random):
+    """
+    Pick the first backend by weight; the rest follow in configured order
+
+    If every weight is 0, the configured order is used as-is.
+    """
+    weighted = [b for b in backends if b.weight > 0]
+    if not weighted:
+        return list(backends)
+    first = rng.choices(weighted, weights=[b.weight for b in weighted])[0]
+    return [first] + [b for b in backends if b is not first]
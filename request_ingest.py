@@ -0,0 +1,416 @@
+"""
+Streaming Request Ingestion
+Parses /api-endpoint task payloads incrementally from the request stream
+
+Large base64 attachments never become Python strings: each attachment
+`url` is decoded chunk by chunk into a spool file (memory first, disk
+once it grows). The secret is verified the moment it is parsed, so an
+unauthenticated request stops being read as soon as its secret is seen.
+"""
+from config import Config
+from tempfile import SpooledTemporaryFile
+from urllib.parse import unquote_to_bytes
+import base64
+import codecs
+import json
+import re
+
+CHUNK_SIZE = 64 * 1024
+
+# Characters kept from the start of each attachment URL for prompts and logs
+PREFIX_CHARS = 100
+
+_STRING_SPECIAL = re.compile(r'["\\]')
+_LITERAL_CHARS = set('0123456789+-.eEtrufalsn')
+
+
+class IngestError(ValueError):
+    """Request rejected during ingestion, with the HTTP status to return"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class SpooledDataUrl:
+    """
+    An attachment URL whose payload was decoded into a spool while streaming
+
+    Only the first PREFIX_CHARS of the original URL are kept as text;
+    the decoded bytes live in a SpooledTemporaryFile.
+    """
+
+    def __init__(self, max_memory=None):
+        self.prefix = ''
+        self.mime_type = None
+        self.is_data_url = False
+        self.is_base64 = False
+        self.size = 0
+        self.error = None
+        self._header = ''
+        self._header_done = False
+        self._pending = ''
+        self._spool = SpooledTemporaryFile(max_size=max_memory or Config.ATTACHMENT_SPOOL_MEMORY)
+
+    def write(self, text):
+        """Feed the next piece of the URL string"""
+        if len(self.prefix) < PREFIX_CHARS:
+            self.prefix += text[:PREFIX_CHARS - len(self.prefix)]
+
+        if not self._header_done:
+            self._header += text
+            if not self._header.startswith('data:'[:len(self._header)]):
+                # Plain URL (http://...), keep it as-is
+                self._header_done = True
+                text, self._header = self._header, ''
+            elif ',' in self._header:
+                header, text = self._header.split(',', 1)
+                self._parse_header(header)
+                self._header = ''
+            else:
+                return
+        self._write_payload(text)
+
+    def _parse_header(self, header):
+        # Format: data:mime/type;base64,<data>
+        self._header_done = True
+        self.is_data_url = True
+        params = header[len('data:'):].split(';')
+        self.mime_type = params[0] or 'text/plain'
+        self.is_base64 = 'base64' in params[1:]
+
+    def _write_payload(self, text):
+        if self.error or not text:
+            return
+        if not self.is_base64:
+            # Percent-encoded or plain payloads are decoded once at finish()
+            self._spool.write(text.encode('utf-8'))
+            return
+
+        self._pending += text
+        if any(ch.isspace() for ch in self._pending[-len(text):]):
+            self._pending = ''.join(self._pending.split())
+        usable = len(self._pending) - len(self._pending) % 4
+        if not usable:
+            return
+        try:
+            decoded = base64.b64decode(self._pending[:usable])
+        except Exception as e:
+            self.error = f"Invalid base64 data: {e}"
+            return
+        self._spool.write(decoded)
+        self.size += len(decoded)
+        self._pending = self._pending[usable:]
+
+    def finish(self):
+        """Flush remaining input once the closing quote has been read"""
+        if not self._header_done:
+            # Never saw a comma: not a usable data URL
+            self._header_done = True
+            self._spool.write(self._header.encode('utf-8'))
+            self._header = ''
+        if self.is_base64 and self._pending and not self.error:
+            self.error = "Invalid base64 data: truncated input"
+        if not self.is_base64 and not self.error:
+            raw = self.read_bytes()
+            decoded = unquote_to_bytes(raw) if self.is_data_url else raw
+            self._spool.seek(0)
+            self._spool.truncate()
+            self._spool.write(decoded)
+            self.size = len(decoded)
+        return self
+
+    def head(self, n):
+        """First n decoded bytes"""
+        self._spool.seek(0)
+        return self._spool.read(n)
+
+    def read_bytes(self):
+        """All decoded bytes (materialises the payload)"""
+        self._spool.seek(0)
+        return self._spool.read()
+
+    def close(self):
+        self._spool.close()
+
+
+class _JsonStream:
+    """Minimal incremental JSON reader over a binary stream"""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.read_total = 0
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def _fill(self):
+        """Load the next chunk into the buffer; False once the stream is exhausted"""
+        if self.eof:
+            return False
+        chunk = self.stream.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            text = self._decoder.decode(b'', final=True)
+        else:
+            self.read_total += len(chunk)
+            if self.read_total > self.limit:
+                raise IngestError(413, f"Request body exceeds {self.limit} bytes")
+            try:
+                text = self._decoder.decode(chunk)
+            except UnicodeDecodeError:
+                raise IngestError(400, "Request body is not valid UTF-8")
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return bool(text) or not self.eof
+
+    def peek(self):
+        """Next non-whitespace character without consuming it ('' at EOF)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise IngestError(400, f"Invalid JSON: expected '{char}' at byte {self.read_total}")
+        self.pos += 1
+
+    def _next_char(self):
+        if self.pos >= len(self.buf) and not self._fill():
+            raise IngestError(400, "Invalid JSON: unexpected end of input")
+        if self.pos >= len(self.buf):
+            return self._next_char()
+        char = self.buf[self.pos]
+        self.pos += 1
+        return char
+
+    def _lookahead(self, n):
+        """The next n characters without consuming them (fewer at EOF)"""
+        while len(self.buf) - self.pos < n and self._fill():
+            pass
+        return self.buf[self.pos:self.pos + n]
+
+    def iter_string(self):
+        """Yield decoded pieces of the JSON string at the cursor"""
+        self.expect('"')
+        while True:
+            match = _STRING_SPECIAL.search(self.buf, self.pos)
+            if match is None:
+                if self.pos < len(self.buf):
+                    yield self.buf[self.pos:]
+                    self.pos = len(self.buf)
+                if not self._fill():
+                    raise IngestError(400, "Invalid JSON: unterminated string")
+                continue
+            if match.start() > self.pos:
+                yield self.buf[self.pos:match.start()]
+            self.pos = match.end()
+            if match.group() == '"':
+                return
+            yield self._read_escape()
+
+    def _read_escape(self):
+        escape = '\\' + self._next_char()
+        if escape == '\\u':
+            escape += ''.join(self._next_char() for _ in range(4))
+            # High surrogate: the low half usually follows as another \uXXXX
+            if 0xD800 <= int(escape[2:], 16) < 0xDC00 and self._lookahead(2) == '\\u':
+                escape += ''.join(self._next_char() for _ in range(6))
+        try:
+            return json.loads(f'"{escape}"')
+        except (ValueError, json.JSONDecodeError):
+            raise IngestError(400, f"Invalid JSON: bad escape {escape!r}")
+
+    def read_string(self):
+        return ''.join(self.iter_string())
+
+    def read_value(self):
+        """Parse any JSON value at the cursor into Python objects"""
+        char = self.peek()
+        if char == '"':
+            return self.read_string()
+        if char == '{':
+            self.pos += 1
+            obj = {}
+            for key in self.iter_keys():
+                obj[key] = self.read_value()
+            return obj
+        if char == '[':
+            return list(self.iter_array(self.read_value))
+        if char in _LITERAL_CHARS:
+            token = ''
+            while True:
+                if self.pos >= len(self.buf) and not self._fill():
+                    break
+                if self.pos >= len(self.buf) or self.buf[self.pos] not in _LITERAL_CHARS:
+                    break
+                token += self.buf[self.pos]
+                self.pos += 1
+            try:
+                return json.loads(token)
+            except json.JSONDecodeError:
+                raise IngestError(400, f"Invalid JSON literal: {token[:20]!r}")
+        raise IngestError(400, f"Invalid JSON: unexpected {char!r}" if char else "Invalid JSON: unexpected end of input")
+
+    def iter_keys(self):
+        """Yield object keys after '{' has been consumed; caller reads each value"""
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.read_string()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise IngestError(400, "Invalid JSON: expected ',' or '}' in object")
+
+    def iter_array(self, read_item):
+        """Yield read_item() for each element of the array at the cursor"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield read_item()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise IngestError(400, "Invalid JSON: expected ',' or ']' in array")
+
+
+def _read_attachment(reader, spools):
+    """Read one attachment object, spooling its url instead of building a string"""
+    if reader.peek() != '{':
+        return reader.read_value()
+    reader.pos += 1
+    attachment = {}
+    for key in reader.iter_keys():
+        if key == 'url' and reader.peek() == '"':
+            spool = SpooledDataUrl()
+            spools.append(spool)
+            attachment['url'] = spool
+            for piece in reader.iter_string():
+                spool.write(piece)
+            spool.finish()
+        else:
+            attachment[key] = reader.read_value()
+    return attachment
+
+
+def close_attachments(data):
+    """Release any spool files held by an ingested payload"""
+    for att in (data or {}).get('attachments') or []:
+        if isinstance(att, dict) and isinstance(att.get('url'), SpooledDataUrl):
+            att['url'].close()
+
+
+def ingest_task_payload(stream, content_length, verify_secret):
+    """
+    Parse a task payload from a request body stream
+
+    Args:
+        stream: Binary file-like request body
+        content_length: Declared Content-Length (None if not sent)
+        verify_secret: Callable returning True for a valid secret
+
+    Returns:
+        dict payload; attachment urls are SpooledDataUrl objects
+
+    Raises:
+        IngestError: with the HTTP status to respond with
+    """
+    limit = Config.MAX_REQUEST_BYTES
+    if content_length is not None and content_length > limit:
+        raise IngestError(413, f"Request body exceeds {limit} bytes")
+
+    reader = _JsonStream(stream, limit)
+    spools = []
+    try:
+        if reader.peek() != '{':
+            raise IngestError(400, "No JSON payload provided")
+        data = _read_task(reader, spools, verify_secret)
+        if reader.peek() != '':
+            raise IngestError(400, "Invalid JSON: trailing data after payload")
+    except Exception:
+        for spool in spools:
+            spool.close()
+        raise
+
+    return data
+
+
+def _read_task(reader, spools, verify_secret):
+    """Read one task object at the cursor, stopping at the first invalid secret"""
+    reader.expect('{')
+    data = {}
+    for key in reader.iter_keys():
+        if key == 'attachments' and reader.peek() == '[':
+            data[key] = list(reader.iter_array(lambda: _read_attachment(reader, spools)))
+        else:
+            data[key] = reader.read_value()
+        if key == 'secret' and not verify_secret(data[key]):
+            # Stop reading right here: the rest of the body is never parsed
+            raise IngestError(403, "Invalid secret")
+
+    if 'secret' not in data or not verify_secret(data['secret']):
+        raise IngestError(403, "Invalid secret")
+    return data
+
+
+def ingest_batch_payload(stream, content_length, verify_secret, max_tasks):
+    """
+    Parse a batch body (a JSON array or NDJSON task payloads) from a request stream
+
+    Reading is bounded by MAX_BATCH_REQUEST_BYTES whether or not a
+    Content-Length was sent, and stops at the first task whose secret
+    is missing or invalid, or once the batch has more than max_tasks.
+
+    Returns:
+        list of task payload dicts; attachment urls are SpooledDataUrl objects
+
+    Raises:
+        IngestError: with the HTTP status to respond with
+    """
+    limit = Config.MAX_BATCH_REQUEST_BYTES
+    if content_length is not None and content_length > limit:
+        raise IngestError(413, f"Request body exceeds {limit} bytes")
+
+    reader = _JsonStream(stream, limit)
+    tasks = []
+    spools = []
+
+    def read_item():
+        if len(tasks) >= max_tasks:
+            raise IngestError(413, f"Batch too large: more than {max_tasks} tasks (max {max_tasks})")
+        if reader.peek() != '{':
+            raise IngestError(400, f"Task {len(tasks)} is not a JSON object")
+        return _read_task(reader, spools, verify_secret)
+
+    try:
+        if reader.peek() == '[':
+            for task in reader.iter_array(read_item):
+                tasks.append(task)
+            if reader.peek() != '':
+                raise IngestError(400, "Invalid JSON: trailing data after batch")
+        else:
+            # NDJSON: payloads one after another, separated by newlines
+            while reader.peek() != '':
+                tasks.append(read_item())
+    except Exception:
+        for spool in spools:
+            spool.close()
+        raise
+
+    return tasks
@@ -0,0 +1,134 @@
+"""
+LLM Response Parser
+Extracts every named fenced code block from a model response in a single
+pass over its lines
+
+A block's filename comes from the fence info string (```js app.js) or,
+failing that, from a filename comment on its first line
+(<!-- index.html -->, /* styles.css */, // app.js). The first unnamed
+HTML block is index.html, and a response without any fence is taken to
+be index.html as a whole.
+"""
+import html_postprocess
+import posixpath
+import re
+
+# File types the generated site may contain
+ALLOWED_EXTENSIONS = {'.html', '.css', '.js', '.mjs', '.json', '.csv', '.txt', '.svg', '.md'}
+
+# Files generated by the pipeline itself, never taken from the model
+RESERVED_FILES = {'README.md', 'LICENSE', html_postprocess.SOURCE_PATH}
+
+MAX_PATH_DEPTH = 3
+
+_FENCE_PATTERN = re.compile(r'^\s*(`{3,}|~{3,})\s*([^\s`]*)\s*(.*)$')
+_FILENAME_PATTERN = re.compile(r'^[\w\-./]+\.[A-Za-z0-9]+$')
+_TITLE_ATTR_PATTERN = re.compile(r"""(?:title|file(?:name)?)\s*=\s*["']?([^"'\s]+)""")
+_MARKER_PATTERN = re.compile(r'^\s*(?:<!--\s*(\S+?)\s*-->|/\*\s*(\S+?)\s*\*/|//\s*(\S+)\s*)$')
+
+# Languages that identify an unnamed block as the page itself
+_HTML_LANGUAGES = {'html', 'htm', 'xhtml'}
+
+
+def safe_filename(name):
+    """
+    Normalise a model-supplied path, or return None if it isn't acceptable
+
+    Paths must be relative, stay inside the repo and use an allowed extension.
+    """
+    if not name or not _FILENAME_PATTERN.match(name):
+        return None
+    path = posixpath.normpath(name)
+    if path.startswith(('/', '../')) or path == '..' or path.count('/') >= MAX_PATH_DEPTH:
+        return None
+    if posixpath.splitext(path)[1].lower() not in ALLOWED_EXTENSIONS or path in RESERVED_FILES:
+        return None
+    return path
+
+
+def _name_from_info(language, info):
+    # ```app.js, ```js app.js, ```js title="app.js"
+    for candidate in (language, info.split()[0] if info.split() else ''):
+        if '.' in candidate and safe_filename(candidate):
+            return safe_filename(candidate)
+    match = _TITLE_ATTR_PATTERN.search(info)
+    return safe_filename(match.group(1)) if match else None
+
+
+def parse_files(text):
+    """
+    Split a response into files
+
+    Returns:
+        dict of filename -> content, in the order the blocks appear
+    """
+    files = {}
+    lines = text.splitlines()
+    fence = None        # The opening fence string while inside a block
+    language = name = None
+    body = []
+    first_block = None  # Fallback page when no block could be named
+
+    for line in lines:
+        if fence is None:
+            match = _FENCE_PATTERN.match(line)
+            if match:
+                fence, language, info = match.group(1), match.group(2).lower(), match.group(3)
+                name = _name_from_info(language, info)
+                body = []
+            continue
+
+        stripped = line.strip()
+        if stripped.startswith(fence[0] * len(fence)) and not stripped.strip(fence[0]):
+            _close_block(files, language, name, body)
+            first_block = body if first_block is None else first_block
+            fence = None
+            continue
+        body.append(line)
+
+    if fence is not None:
+        # Unterminated final block (truncated output): keep what we have
+        _close_block(files, language, name, body)
+        first_block = body if first_block is None else first_block
+
+    if not files:
+        # Old single-page answers: the first block, or the whole text without one
+        files['index.html'] = '\n'.join(first_block).strip() if first_block is not None else text.strip()
+    return files
+
+
+def _close_block(files, language, name, body):
+    if name is None and body:
+        marker = _MARKER_PATTERN.match(body[0])
+        if marker:
+            name = safe_filename(next(group for group in marker.groups() if group))
+            if name and name.endswith('.json'):
+                # JSON has no comments; drop the marker line
+                body = body[1:]
+    if name is None and (language in _HTML_LANGUAGES or (not language and _looks_like_html(body))):
+        name = 'index.html'
+    if name is None or name in files:
+        return
+    files[name] = '\n'.join(body).strip() + ('\n' if not name.endswith('.html') else '')
+
+
+def _looks_like_html(body):
+    head = '\n'.join(body[:5]).lower()
+    return '<!doctype' in head or '<html' in head
+
+
+def combined_html(files):
+    """
+    index.html with the generated CSS/JS files inlined, for local scoring
+
+    Lets checks that look for ids or behaviour see code that lives in
+    separate asset files.
+    """
+    html = files.get('index.html', '')
+    extras = []
+    for name, content in files.items():
+        if name.endswith('.css'):
+            extras.append(f"<style>\n{content}\n</style>")
+        elif name.endswith(('.js', '.mjs')):
+            extras.append(f"<script>\n{content}\n</script>")
+    return html + '\n' + '\n'.join(extras) if extras else html
@@ -0,0 +1,103 @@
+"""
+Speculative Round 2 Preparation
+After a deploy, prepares in the background everything a round 2 for the
+same task would otherwise fetch first
+
+The deployed site files are saved in the shared state store (so any
+worker can skip the repo lookup and content fetch), the repo object is
+cached in this process, and the round 2 prompt prefix is registered with
+the providers' prompt caches. A round 2 that finds a prepared entry
+starts straight at the LLM call.
+"""
+from config import Config
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import html_postprocess
+import response_parser
+import shared_state
+import time
+import structured_logging
+
+logger = structured_logging.get_logger(__name__)
+
+
+def site_files(files):
+    """The editable files of a deployed file set: the readable index.html plus split assets"""
+    site = {'index.html': html_postprocess.source_html(files)}
+    site.update(
+        (name, content) for name, content in files.items()
+        if name != 'index.html' and response_parser.safe_filename(name) == name
+    )
+    return site
+
+
+class Round2Preparer:
+    """Background preparation of round 2 inputs after each deploy"""
+
+    NAMESPACE = 'round2_prep'
+
+    def __init__(self, github_manager, llm_generator, store=None, ttl=None, max_entries=200):
+        self.github_manager = github_manager
+        self.llm_generator = llm_generator
+        self.store = store or shared_state.store
+        self.ttl = ttl or Config.ROUND2_PREP_TTL
+        self.max_entries = max_entries
+        self.prepared = 0
+        self.hits = 0
+        self.misses = 0
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='round2-prep')
+
+    def schedule(self, repo_name, files, commit_sha):
+        """
+        Prepare round 2 for a repo in the background
+
+        Args:
+            repo_name: Repository that was just deployed
+            files: The files as deployed
+            commit_sha: Head commit after the deploy
+        """
+        entry = {'files': site_files(files), 'commit_sha': commit_sha, 'expires': time.time() + self.ttl}
+        # Keep the task's log context on the background thread
+        self._executor.submit(contextvars.copy_context().run, self._prepare, repo_name, entry)
+
+    def _prepare(self, repo_name, entry):
+        start = time.perf_counter()
+        try:
+            self.store.set(self.NAMESPACE, repo_name, entry)
+            self.store.trim(self.NAMESPACE, self.max_entries)
+        except Exception as e:
+            logger.warning(f"⚠ Warning: Could not save round 2 preparation: {e}")
+            return
+        try:
+            self.github_manager.prefetch_repo(repo_name)
+            self.llm_generator.warm_update_prefix(entry['files'])
+        except Exception as e:
+            # The saved files are still useful without a warm cache
+            logger.warning(f"⚠ Warning: Round 2 warm-up incomplete: {e}")
+        self.prepared += 1
+        logger.info(f"⚡ Prepared round 2 for {repo_name} in {time.perf_counter() - start:.1f}s")
+
+    def take(self, repo_name):
+        """
+        Get the prepared site files for a repo
+
+        Returns:
+            dict of path -> content, or None if nothing fresh was prepared
+        """
+        try:
+            entry = self.store.get(self.NAMESPACE, repo_name)
+        except Exception as e:
+            logger.warning(f"⚠ Warning: Could not read round 2 preparation: {e}")
+            entry = None
+        if entry and entry['expires'] > time.time() and entry['files'].get('index.html'):
+            self.hits += 1
+            return entry['files']
+        self.misses += 1
+        return None
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        """Preparation and use counts for this process"""
+        return {'prepared': self.prepared, 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,128 @@
+"""
+Shared State Store
+SQLite-backed key/value store shared by all worker processes on a host
+
+Each process (and thread) opens its own connection lazily, so the store
+is safe to create before gunicorn forks its workers.
+"""
+from config import Config
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class SharedStore:
+    """Namespaced JSON key/value store in a local SQLite database"""
+
+    def __init__(self, path=None):
+        self.path = path or Config.STATE_DB_PATH
+        self._local = threading.local()
+
+    def _connection(self):
+        # New connection per process and thread; never reuse one across fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS kv ('
+                ' namespace TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' value TEXT NOT NULL,'
+                ' updated REAL NOT NULL,'
+                ' PRIMARY KEY (namespace, key))'
+            )
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, namespace, key, default=None):
+        row = self._connection().execute(
+            'SELECT value FROM kv WHERE namespace = ? AND key = ?', (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace, key, value):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO kv (namespace, key, value, updated) VALUES (?, ?, ?, ?)',
+            (namespace, key, json.dumps(value), time.time())
+        )
+
+    def delete(self, namespace, key):
+        self._connection().execute('DELETE FROM kv WHERE namespace = ? AND key = ?', (namespace, key))
+
+    def pop(self, namespace, key, default=None):
+        """
+        Delete a key and return its value, atomically across processes
+
+        Of several processes popping the same key, exactly one gets the value.
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value FROM kv WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+            if row:
+                conn.execute('DELETE FROM kv WHERE namespace = ? AND key = ?', (namespace, key))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return json.loads(row[0]) if row else default
+
+    def items(self, namespace):
+        """All (key, value) pairs in a namespace, oldest first"""
+        rows = self._connection().execute(
+            'SELECT key, value FROM kv WHERE namespace = ? ORDER BY updated', (namespace,)
+        ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def trim(self, namespace, keep):
+        """Delete all but the `keep` most recently updated keys in a namespace"""
+        self._connection().execute(
+            'DELETE FROM kv WHERE namespace = ? AND key NOT IN ('
+            ' SELECT key FROM kv WHERE namespace = ? ORDER BY updated DESC LIMIT ?)',
+            (namespace, namespace, keep)
+        )
+
+
+class SharedDict:
+    """dict-like view of one namespace of a SharedStore"""
+
+    def __init__(self, store, namespace):
+        self.store = store
+        self.namespace = namespace
+
+    def __getitem__(self, key):
+        value = self.store.get(self.namespace, key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self.store.set(self.namespace, key, value)
+
+    def __delitem__(self, key):
+        self.store.delete(self.namespace, key)
+
+    def __contains__(self, key):
+        return self.store.get(self.namespace, key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        return self.store.get(self.namespace, key, default)
+
+    def pop(self, key, default=None):
+        return self.store.pop(self.namespace, key, default)
+
+    def items(self):
+        return self.store.items(self.namespace)
+
+
+_MISSING = object()
+
+# Process-wide default store
+store = SharedStore()
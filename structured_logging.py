@@ -0,0 +1,144 @@
+"""
+Structured Logging
+Queue-backed logging with JSON records tagged by task, nonce, round and
+pipeline stage
+
+Request threads only put records on an in-memory queue; a background
+listener thread formats them and writes to stdout, so a slow log pipeline
+never blocks a request. The task/nonce/stage tags come from contextvars
+set with bind() and StageTimer.stage().
+"""
+from config import Config
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+import contextvars
+import atexit
+import json
+import logging
+import queue
+import sys
+import time
+
+task_var = contextvars.ContextVar('task', default=None)
+nonce_var = contextvars.ContextVar('nonce', default=None)
+round_var = contextvars.ContextVar('round', default=None)
+stage_var = contextvars.ContextVar('stage', default=None)
+
+_CONTEXT_FIELDS = (('task', task_var), ('nonce', nonce_var), ('round', round_var), ('stage', stage_var))
+
+_handler = None
+_listener = None
+
+
+class ContextFilter(logging.Filter):
+    """Copy the request context onto the record in the calling thread, before it is queued"""
+
+    def filter(self, record):
+        for name, var in _CONTEXT_FIELDS:
+            setattr(record, name, var.get())
+        return True
+
+
+class _ContextQueueHandler(QueueHandler):
+    """QueueHandler that keeps the traceback apart from the message"""
+
+    def prepare(self, record):
+        # Resolve arguments and the traceback in the calling thread (they may
+        # change later), but leave formatting to the listener thread
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        for name, _ in _CONTEXT_FIELDS:
+            value = getattr(record, name, None)
+            if value is not None:
+                entry[name] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for local development"""
+
+    def format(self, record):
+        tags = ' '.join(
+            f"{name}={getattr(record, name)}" for name, _ in _CONTEXT_FIELDS
+            if getattr(record, name, None) is not None
+        )
+        line = f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname[0]} {record.getMessage()}"
+        if tags:
+            line += f"  [{tags}]"
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        return line
+
+
+def _start_listener():
+    global _listener
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if Config.LOG_FORMAT == 'json' else TextFormatter())
+    _listener = QueueListener(_handler.queue, output, respect_handler_level=False)
+    _listener.start()
+
+
+def setup():
+    """Route the root logger through the queue (idempotent)"""
+    global _handler
+    if _handler is not None:
+        return
+    _handler = _ContextQueueHandler(queue.SimpleQueue())
+    _handler.addFilter(ContextFilter())
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(Config.LOG_LEVEL)
+    _start_listener()
+    atexit.register(shutdown)
+
+
+def after_fork():
+    """The listener thread doesn't survive fork(); start a fresh queue and listener"""
+    if _handler is not None:
+        _handler.queue = queue.SimpleQueue()
+        _start_listener()
+
+
+def shutdown():
+    """Flush queued records and stop the listener"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name):
+    setup()
+    return logging.getLogger(name)
+
+
+@contextmanager
+def bind(**fields):
+    """Tag every record logged inside the block (task, nonce, round, stage)"""
+    variables = dict(_CONTEXT_FIELDS)
+    tokens = [(variables[name], variables[name].set(value)) for name, value in fields.items()]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
@@ -0,0 +1,39 @@
+"""
+Test configuration
+Points the app at the recorded sample traffic before any module reads Config
+
+Every outbound exchange is replayed from a cassette (CASSETTE_MODE=replay),
+so no test touches GitHub, an LLM or the evaluation API. The defaults match
+tests/fixtures/sample.jsonl.gz; to check a production recording, set
+CASSETTE_PATH, PERF_TASKS (its task payloads), PERF_GITHUB_CALLS (GitHub
+API calls allowed per round, as `round=calls`) and the LLM backend settings
+it was recorded with.
+"""
+import os
+import sys
+import tempfile
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ['CASSETTE_MODE'] = 'replay'
+os.environ['STATE_DB_PATH'] = os.path.join(tempfile.mkdtemp(prefix='perf-state-'), 'state.db')
+for name, value in {
+    'CASSETTE_PATH': os.path.join(FIXTURES, 'sample.jsonl.gz'),
+    'CASSETTE_SPEED': '1',
+    'PERF_TASKS': os.path.join(FIXTURES, 'sample_tasks.jsonl'),
+    'PERF_GITHUB_CALLS': '1=6,2=7',
+    'STAGE_BUDGETS': 'lookup=5,fetch=5,generate=30,deploy=20,notify=5,total=60',
+    'STUDENT_SECRET': 'perf-secret',
+    'GITHUB_TOKEN': 'perf-token',
+    'GITHUB_USERNAME': 'perf-bot',
+    'LOCAL_LLM_BASE_URL': 'http://llm.test/v1',
+    'LOCAL_LLM_MODEL': 'recorded-model',
+    'LLM_BACKENDS': 'local',
+    'ROUTING_ENABLED': 'False',
+    'BRIEF_CACHE_ENABLED': 'False',
+    'ROUND2_PREP_ENABLED': 'False',
+    'LOG_FORMAT': 'text',
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,45 @@
+"""
+Cassette Tests
+Recording and replaying provider-level generations, and per-worker
+recording files after a fork
+"""
+import os
+import pytest
+import cassette
+from llm_providers import LLMProvider, TokenUsage
+
+
+@pytest.fixture
+def isolated():
+    """Run with no cassette active, restoring the session's one afterwards"""
+    previous = cassette.active
+    cassette.active = None
+    yield
+    cassette.stop()
+    cassette.active = previous
+
+
+def test_llm_round_trip(tmp_path, isolated):
+    provider = LLMProvider('test-model', name='Test')
+    path = str(tmp_path / 'llm.jsonl.gz')
+
+    recorder = cassette.start('record', path=path)
+    text, usage = recorder.call_llm(provider, 'prompt', {'temperature': 0}, lambda: ('page', TokenUsage(10, 20, 0)))
+    cassette.stop()
+
+    player = cassette.start('replay', path=path, speed=0)
+    assert player.call_llm(provider, 'prompt', {'temperature': 0}, None) == (text, usage)
+    with pytest.raises(cassette.CassetteMiss):
+        player.call_llm(provider, 'prompt', {'temperature': 0}, None)
+
+
+def test_after_fork_keeps_start_path(tmp_path, isolated):
+    template = str(tmp_path / 'session-{pid}.jsonl.gz')
+    parent = cassette.start('record', path=template)
+    parent_file = parent._file
+
+    cassette.after_fork()
+    parent_file.close()
+
+    assert cassette.active is not parent
+    assert cassette.active.path == template.replace('{pid}', str(os.getpid()))
@@ -0,0 +1,56 @@
+"""
+Git Mirror Tests
+Looking up a repo must only leave a mirror behind when the fetch succeeded
+"""
+import os
+import subprocess
+import threading
+import pytest
+from git_mirror import GitMirrorManager
+
+
+class LocalMirrorManager(GitMirrorManager):
+    """Mirrors repos from a local directory instead of github.com"""
+
+    def __init__(self, mirror_dir, remotes):
+        # Skip the GitHub connection; only the mirror plumbing is under test
+        self.mirror_dir = mirror_dir
+        self.remotes = remotes
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        self._synced = {}
+
+    def _remote_url(self, repo_name):
+        return os.path.join(self.remotes, f"{repo_name}.git")
+
+
+@pytest.fixture
+def manager(tmp_path):
+    mirrors, remotes = tmp_path / 'mirrors', tmp_path / 'remotes'
+    mirrors.mkdir()
+    remotes.mkdir()
+    return LocalMirrorManager(str(mirrors), str(remotes))
+
+
+def git(*args, cwd):
+    subprocess.run(['git', *args], cwd=cwd, check=True, capture_output=True)
+
+
+def test_missing_repo_leaves_no_mirror(manager):
+    assert manager.repo_exists('missing') is False
+    assert os.listdir(manager.mirror_dir) == ['missing.git.lock']
+    assert manager.list_repo_files('missing') is None
+    assert os.listdir(manager.mirror_dir) == ['missing.git.lock']
+
+
+def test_existing_repo_is_mirrored(manager, tmp_path):
+    work = tmp_path / 'work'
+    git('init', '--quiet', '--initial-branch=main', str(work), cwd=tmp_path)
+    (work / 'index.html').write_text('<p>hi</p>')
+    git('add', 'index.html', cwd=work)
+    git('-c', 'user.name=t', '-c', 'user.email=t@t', 'commit', '--quiet', '-m', 'add', cwd=work)
+    git('clone', '--quiet', '--bare', str(work), os.path.join(manager.remotes, 'present.git'), cwd=tmp_path)
+
+    assert manager.repo_exists('present') is True
+    assert sorted(os.listdir(manager.mirror_dir)) == ['present.git', 'present.git.lock']
+    assert manager.list_repo_files('present') == ['index.html']
@@ -0,0 +1,19 @@
+"""
+GitHub Manager Tests
+An empty deploy must fail clearly instead of tripping over an unset result
+"""
+import pytest
+from github_manager import GitHubManager
+
+
+class FakeRepo:
+    full_name = 'perf-bot/empty'
+
+    def create_file(self, **kwargs):
+        raise AssertionError("nothing should be written")
+
+
+def test_push_files_rejects_empty_file_set():
+    manager = GitHubManager.__new__(GitHubManager)
+    with pytest.raises(ValueError, match='No files to push'):
+        manager._push_files(FakeRepo(), {})
@@ -0,0 +1,35 @@
+"""
+HTML Post-Processing Tests
+Minification must never change what a page does
+"""
+import html_postprocess
+
+
+def test_css_keeps_descendant_pseudo_class():
+    assert html_postprocess.minify_css('.a :first-child { color: red; }') == '.a :first-child{color:red}'
+    assert html_postprocess.minify_css('.nav :hover{x:y}') == '.nav :hover{x:y}'
+
+
+def test_css_compacts_declarations():
+    css = 'a:hover , b > c {\n  color : red ;\n  margin: 0 auto;\n}\n'
+    assert html_postprocess.minify_css(css) == 'a:hover,b>c{color :red;margin:0 auto}'
+
+
+def test_css_keeps_strings():
+    css = '.x::before { content: " >  /* a */ ; } "; }'
+    assert html_postprocess.minify_css(css) == '.x::before{content:" >  /* a */ ; } "}'
+
+
+def test_markup_keeps_attribute_values():
+    html = '<input   placeholder="Type   here"  title="a > b">\n  <p>Hello   world</p>'
+    assert html_postprocess.minify_html(html) == '<input placeholder="Type   here" title="a > b">\n<p>Hello world</p>'
+
+
+def test_no_defer_when_a_local_script_follows():
+    html = '<script src="https://cdn.example.com/lib.js"></script><script src="app.js"></script>'
+    assert html_postprocess.defer_cdn_scripts(html) == html
+
+
+def test_defer_cdn_scripts_without_dependents():
+    html = '<script src="https://cdn.example.com/lib.js"></script><script type="module" src="app.js"></script>'
+    assert html_postprocess.defer_cdn_scripts(html).startswith('<script src="https://cdn.example.com/lib.js" defer>')
@@ -0,0 +1,183 @@
+"""
+Request Ingestion Tests
+The streaming JSON reader must agree with json.loads wherever chunk
+boundaries fall, and must stop reading as soon as a request is rejected
+"""
+import base64
+import io
+import json
+import pytest
+import request_ingest
+from config import Config
+from request_ingest import IngestError, SpooledDataUrl, _JsonStream, ingest_batch_payload, ingest_task_payload
+
+SECRET = 'good-secret'
+
+
+def verify_secret(secret):
+    return secret == SECRET
+
+
+class ChunkedStream(io.RawIOBase):
+    """Serves a body in fixed-size chunks, whatever size is asked for"""
+
+    def __init__(self, data, chunk=1):
+        self.data = data
+        self.chunk = chunk
+        self.offset = 0
+
+    def read(self, size=-1):
+        piece = self.data[self.offset:self.offset + self.chunk]
+        self.offset += len(piece)
+        return piece
+
+
+def body(value):
+    return json.dumps(value).encode('utf-8')
+
+
+def data_url(payload):
+    return 'data:text/plain;base64,' + base64.b64encode(payload).decode('ascii')
+
+
+@pytest.fixture
+def spools(monkeypatch):
+    """Every SpooledDataUrl created during the test"""
+    created = []
+
+    class Tracked(SpooledDataUrl):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self)
+
+    monkeypatch.setattr(request_ingest, 'SpooledDataUrl', Tracked)
+    return created
+
+
+DOCUMENTS = [
+    '"plain"',
+    r'"quote \" backslash \\ slash \/ controls \b\f\n\r\t"',
+    r'"bmp \u00e9\u4e2d and pair \ud83d\ude00 end"',
+    r'["lone \ud83d", "\ud83d\n", "\udc00"]',
+    '"raw utf-8: é 中 😀"',
+    '[0, -1, 12.5, -3.25e+10, 1E-3, true, false, null]',
+    '{"a": {"b": [1, {"c": "\\u0041"}]}, "": [], "d": {}}',
+]
+
+
+@pytest.mark.parametrize('chunk', [1, 2, 3, 5, 7])
+@pytest.mark.parametrize('document', DOCUMENTS)
+def test_reader_matches_json_loads_across_chunk_boundaries(document, chunk):
+    reader = _JsonStream(ChunkedStream(document.encode('utf-8'), chunk), limit=1 << 20)
+    assert reader.read_value() == json.loads(document)
+    assert reader.peek() == ''
+
+
+@pytest.mark.parametrize('document', ['"bad \\x escape"', r'"\ud83d\u12"', '"unterminated', '[1, 2', '{"a" 1}', 'tru', '1.2.3'])
+def test_reader_rejects_invalid_json(document):
+    with pytest.raises(IngestError) as error:
+        _JsonStream(ChunkedStream(document.encode('utf-8'), 2), limit=1 << 20).read_value()
+    assert error.value.status == 400
+
+
+def test_task_payload_with_split_attachment():
+    payload = {'secret': SECRET, 'brief': 'b', 'attachments': [{'name': 'a.txt', 'url': data_url(b'hello world' * 50)}]}
+    data = ingest_task_payload(ChunkedStream(body(payload), 3), None, verify_secret)
+    spool = data['attachments'][0]['url']
+    assert spool.mime_type == 'text/plain'
+    assert spool.read_bytes() == b'hello world' * 50
+    request_ingest.close_attachments(data)
+
+
+def test_trailing_garbage_rejected(spools):
+    payload = {'secret': SECRET, 'attachments': [{'name': 'a', 'url': data_url(b'x')}]}
+    with pytest.raises(IngestError) as error:
+        ingest_task_payload(ChunkedStream(body(payload) + b' {}', 4), None, verify_secret)
+    assert error.value.status == 400
+    assert spools and all(spool._spool.closed for spool in spools)
+
+
+def test_declared_length_over_limit_rejected_unread(monkeypatch):
+    monkeypatch.setattr(Config, 'MAX_REQUEST_BYTES', 100)
+    stream = ChunkedStream(body({'secret': SECRET}))
+    with pytest.raises(IngestError) as error:
+        ingest_task_payload(stream, 101, verify_secret)
+    assert error.value.status == 413
+    assert stream.offset == 0
+
+
+def test_undeclared_length_over_limit_rejected(monkeypatch, spools):
+    monkeypatch.setattr(Config, 'MAX_REQUEST_BYTES', 100)
+    payload = {'secret': SECRET, 'attachments': [{'name': 'a', 'url': data_url(b'x' * 200)}]}
+    stream = ChunkedStream(body(payload), 16)
+    with pytest.raises(IngestError) as error:
+        ingest_task_payload(stream, None, verify_secret)
+    assert error.value.status == 413
+    assert stream.offset <= 100 + 16
+    assert all(spool._spool.closed for spool in spools)
+
+
+def test_wrong_secret_first_stops_reading(spools):
+    payload = {'secret': 'wrong', 'attachments': [{'name': 'a', 'url': data_url(b'x' * 10000)}]}
+    stream = ChunkedStream(body(payload), 8)
+    with pytest.raises(IngestError) as error:
+        ingest_task_payload(stream, None, verify_secret)
+    assert error.value.status == 403
+    assert stream.offset < 64
+    assert not spools
+
+
+def test_wrong_secret_after_attachments_closes_spools(spools):
+    payload = {'attachments': [{'name': 'a', 'url': data_url(b'x' * 100)}], 'secret': 'wrong', 'brief': 'y' * 10000}
+    stream = ChunkedStream(body(payload), 8)
+    with pytest.raises(IngestError) as error:
+        ingest_task_payload(stream, None, verify_secret)
+    assert error.value.status == 403
+    assert stream.offset < len(stream.data) - 9000
+    assert spools and all(spool._spool.closed for spool in spools)
+
+
+def test_missing_secret_rejected():
+    with pytest.raises(IngestError) as error:
+        ingest_task_payload(ChunkedStream(body({'brief': 'b'}), 4), None, verify_secret)
+    assert error.value.status == 403
+
+
+TASKS = [{'secret': SECRET, 'task': f"t{i}", 'round': 1, 'attachments': []} for i in range(3)]
+
+
+def test_batch_array_and_ndjson_agree():
+    array = ingest_batch_payload(ChunkedStream(body(TASKS), 5), None, verify_secret, max_tasks=10)
+    ndjson = b'\n'.join(body(task) for task in TASKS) + b'\n'
+    lines = ingest_batch_payload(ChunkedStream(ndjson, 5), None, verify_secret, max_tasks=10)
+    assert array == lines == TASKS
+
+
+def test_batch_over_max_tasks_rejected():
+    with pytest.raises(IngestError) as error:
+        ingest_batch_payload(ChunkedStream(body(TASKS), 5), None, verify_secret, max_tasks=2)
+    assert error.value.status == 413
+
+
+def test_batch_bad_secret_closes_earlier_spools(spools):
+    tasks = [
+        {'secret': SECRET, 'attachments': [{'name': 'a', 'url': data_url(b'first')}]},
+        {'secret': 'wrong', 'attachments': [{'name': 'b', 'url': data_url(b'second')}]},
+    ]
+    with pytest.raises(IngestError) as error:
+        ingest_batch_payload(ChunkedStream(body(tasks), 7), None, verify_secret, max_tasks=10)
+    assert error.value.status == 403
+    assert len(spools) == 1 and spools[0]._spool.closed
+
+
+def test_batch_size_limit_without_content_length(monkeypatch):
+    monkeypatch.setattr(Config, 'MAX_BATCH_REQUEST_BYTES', 64)
+    with pytest.raises(IngestError) as error:
+        ingest_batch_payload(ChunkedStream(body(TASKS), 16), None, verify_secret, max_tasks=10)
+    assert error.value.status == 413
+
+
+def test_batch_trailing_garbage_rejected():
+    with pytest.raises(IngestError) as error:
+        ingest_batch_payload(ChunkedStream(body(TASKS) + b']', 5), None, verify_secret, max_tasks=10)
+    assert error.value.status == 400
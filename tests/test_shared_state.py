@@ -0,0 +1,39 @@
+"""
+Shared State Tests
+Claims on the SQLite store must be exclusive across worker processes
+"""
+import multiprocessing
+from shared_state import SharedDict, SharedStore
+
+
+def _claim_all(path, keys, results):
+    outbox = SharedDict(SharedStore(path), 'outbox')
+    results.put([key for key in keys if outbox.pop(key) is not None])
+
+
+def test_pop_returns_and_removes(tmp_path):
+    outbox = SharedDict(SharedStore(str(tmp_path / 'state.db')), 'outbox')
+    outbox['a'] = {'n': 1}
+    assert outbox.pop('a') == {'n': 1}
+    assert outbox.pop('a') is None
+    assert 'a' not in outbox
+
+
+def test_each_key_claimed_by_one_process(tmp_path):
+    path = str(tmp_path / 'state.db')
+    outbox = SharedDict(SharedStore(path), 'outbox')
+    keys = [f"task-{i}" for i in range(50)]
+    for key in keys:
+        outbox[key] = {'key': key}
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    workers = [context.Process(target=_claim_all, args=(path, keys, results)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    claimed = [key for _ in workers for key in results.get(timeout=30)]
+    for worker in workers:
+        worker.join()
+
+    assert sorted(claimed) == sorted(keys)
+    assert outbox.items() == []
@@ -0,0 +1,64 @@
+"""
+Stage Budget Regression Tests
+Replays recorded traffic through round 1 and round 2 and fails when a
+pipeline stage takes longer than its STAGE_BUDGETS entry
+
+At CASSETTE_SPEED=1 every recorded exchange takes as long as it did when
+it was recorded, so the stage timings compare with production ones; what
+changes between runs is the time the pipeline itself adds.
+"""
+import os
+import pytest
+import accounting
+import batch_runner
+
+
+@pytest.fixture(scope='module')
+def results():
+    """Result lines for every recorded task, all round 1s before any round 2"""
+    payloads = batch_runner.load_payloads(os.environ['PERF_TASKS'])
+    lines = []
+    for data in sorted(payloads, key=lambda data: data.get('round', 1)):
+        with accounting.track() as usage:
+            line = batch_runner.run_task(data)
+        line['usage'] = usage.summary(line['timings'])
+        lines.append(line)
+    return lines
+
+
+def test_budgets_configured():
+    assert accounting.BUDGETS, "STAGE_BUDGETS is empty, so nothing would be checked"
+
+
+def test_replayed_tasks_succeed(results):
+    failed = {line['key']: line.get('error') for line in results if not line.get('success')}
+    assert not failed
+
+
+def test_stages_within_budget(results):
+    over = {line['key']: line['usage']['over_budget'] for line in results if line['usage']['over_budget']}
+    assert not over, f"Stages over STAGE_BUDGETS: {over}"
+
+
+def test_every_round_timed(results):
+    for line in results:
+        expected = {'generate', 'deploy', 'notify', 'total'}
+        if line['round'] > 1:
+            expected |= {'lookup', 'fetch'}
+        assert expected <= set(line['timings']), line['key']
+
+
+def test_llm_usage_replayed(results):
+    for line in results:
+        usage = line['usage']
+        assert usage['llm_calls'] >= 1
+        assert usage['input_tokens'] > 0 and usage['output_tokens'] > 0
+
+
+def test_github_calls_within_budget(results):
+    budgets = accounting.parse_budgets(os.environ.get('PERF_GITHUB_CALLS'))
+    over = {
+        line['key']: line['usage']['github_calls'] for line in results
+        if line['usage']['github_calls'] > budgets.get(str(line['round']), float('inf'))
+    }
+    assert not over, f"GitHub calls over PERF_GITHUB_CALLS: {over}"